@@ -0,0 +1,161 @@
+"""
+Central aggregator: δέχεται uploads από τους shipper.py των κόμβων και τα γράφει σε
+ένα partition (SQLite βάση με το ίδιο schema) ανά κόμβο: <AGGREGATOR_DIR>/<node>.db.
+
+Ενεργοποιείται στο app.py με AUTO_WATERING_AGGREGATOR_DIR (προαιρετικά και
+AUTO_WATERING_INGEST_TOKEN, που πρέπει να στέλνεται στο header X-Ingest-Token).
+
+  POST /api/ingest            zlib JSON (Content-Encoding: deflate):
+                              {node, table, from, to, columns, rows}
+  GET  /api/ingest/cursors    ?node=...  -> {table: acked cursor}
+  GET  /api/nodes             partitions + cursors
+
+Idempotent: τα rows γράφονται με INSERT OR REPLACE και ο cursor του πίνακα γίνεται
+max(acked, to) στο ίδιο transaction, οπότε ένα retry του ίδιου batch δεν αλλάζει τίποτα.
+Batch με from > acked (ο aggregator έχασε δεδομένα ή ο κόμβος ξεκίνησε από λάθος
+cursor) απορρίπτεται με 409 και τον acked cursor, για να συνεχίσει ο shipper από εκεί.
+"""
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from pathlib import Path
+
+from flask import Blueprint, abort, jsonify, request
+
+import metrics
+from db import INGEST_TABLES, SCHEMA_PATH, get_conn, update_rollups
+
+AGGREGATOR_DIR = os.environ.get("AUTO_WATERING_AGGREGATOR_DIR")
+INGEST_TOKEN = os.environ.get("AUTO_WATERING_INGEST_TOKEN")
+INGEST_MAX_BYTES = 64 * 1024 * 1024  # αποσυμπιεσμένο batch (zip bomb guard)
+NODE_RE = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+CURSORS_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_cursors (
+  tbl TEXT PRIMARY KEY,
+  cursor INTEGER NOT NULL,
+  updated INTEGER NOT NULL
+);
+"""
+
+_INGEST_SEC = metrics.histogram("aw_ingest_batch_seconds", "Decode + write of one uploaded batch")
+_REJECTED = metrics.counter("aw_ingest_rejected_total", "Batches answered with 409 (cursor gap)")
+
+bp = Blueprint("aggregator", __name__)
+
+
+class Partition:
+    """Η βάση ενός κόμβου: μία connection, ένα lock (ένας writer ανά partition)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.con = get_conn(path)
+        self.con.executescript(SCHEMA_PATH.read_text(encoding="utf-8") + CURSORS_SQL)
+        self.con.commit()
+
+    def cursors(self) -> dict:
+        with self.lock:
+            rows = self.con.execute("SELECT tbl, cursor FROM ingest_cursors").fetchall()
+        return {r["tbl"]: r["cursor"] for r in rows}
+
+    def ingest(self, table: str, cursor_from: int, cursor_to: int, columns: list, rows: list) -> tuple[bool, int]:
+        """(accepted, acked cursor). Ένα transaction: rows + cursor + rollups."""
+        cursor_col, allowed = INGEST_TABLES[table]
+        if not columns or cursor_col not in columns or set(columns) - set(allowed):
+            raise ValueError(f"bad columns for {table}")
+        sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        with self.lock, self.con:
+            row = self.con.execute("SELECT cursor FROM ingest_cursors WHERE tbl = ?", (table,)).fetchone()
+            acked = row[0] if row else 0
+            if cursor_from > acked:
+                return False, acked
+            if rows:
+                self.con.executemany(sql, rows)
+                if table == "readings":
+                    i = columns.index("ts")
+                    update_rollups(self.con, min(r[i] for r in rows), max(r[i] for r in rows))
+            acked = max(acked, cursor_to)
+            self.con.execute(
+                "INSERT OR REPLACE INTO ingest_cursors(tbl, cursor, updated) VALUES (?, ?, ?)",
+                (table, acked, int(time.time())),
+            )
+        return True, acked
+
+
+_partitions: dict[str, Partition] = {}
+_partitions_lock = threading.Lock()
+
+
+def partition(node: str, create: bool = True) -> Partition | None:
+    if not NODE_RE.fullmatch(node or ""):
+        abort(400, description="bad node id")
+    with _partitions_lock:
+        p = _partitions.get(node)
+        if p is None:
+            path = Path(AGGREGATOR_DIR) / f"{node}.db"
+            if not create and not path.exists():
+                return None
+            p = _partitions[node] = Partition(path)
+        return p
+
+
+def _check_token():
+    if INGEST_TOKEN and request.headers.get("X-Ingest-Token") != INGEST_TOKEN:
+        abort(403)
+
+
+def _decode_body() -> dict:
+    raw = request.get_data(cache=False)
+    if request.headers.get("Content-Encoding", "").lower() == "deflate":
+        d = zlib.decompressobj()
+        raw = d.decompress(raw, INGEST_MAX_BYTES)
+        if d.unconsumed_tail:
+            abort(413)
+    try:
+        return json.loads(raw)
+    except ValueError:
+        abort(400, description="bad JSON")
+
+
+@bp.route("/api/ingest", methods=["POST"])
+def api_ingest():
+    _check_token()
+    with _INGEST_SEC.time():
+        body = _decode_body()
+        table = body.get("table")
+        if table not in INGEST_TABLES:
+            abort(400, description="unknown table")
+        node = body.get("node")
+        try:
+            ok, acked = partition(node).ingest(
+                table, int(body["from"]), int(body["to"]), body.get("columns") or [], body.get("rows") or [],
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            abort(400, description=str(e))
+    if not ok:
+        _REJECTED.inc()
+        return jsonify({"error": "cursor gap", "table": table, "cursor": acked}), 409
+    metrics.counter("aw_ingest_rows_total", "Rows accepted from shippers", node=node, table=table).inc(
+        len(body.get("rows") or ()))
+    return jsonify({"table": table, "cursor": acked})
+
+
+@bp.route("/api/ingest/cursors")
+def api_ingest_cursors():
+    _check_token()
+    p = partition(request.args.get("node", ""), create=False)
+    return jsonify(p.cursors() if p is not None else {})
+
+
+@bp.route("/api/nodes")
+def api_nodes():
+    _check_token()
+    nodes = {}
+    for path in sorted(Path(AGGREGATOR_DIR).glob("*.db")):
+        p = partition(path.stem)
+        nodes[path.stem] = {"bytes": path.stat().st_size, "cursors": p.cursors()}
+    return jsonify(nodes)
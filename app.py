@@ -1,7 +1,42 @@
-from flask import Flask, jsonify, render_template, request
-from db import fetch_history, fetch_watering_events, fetch_system_events
+import time
+
+from flask import Flask, Response, g, jsonify, render_template, request
+
+import metrics
+from aggregator import AGGREGATOR_DIR, bp as aggregator_bp
+from columnar import CONTENT_TYPE as BIN_CONTENT_TYPE, pack_history
+from db import DB_PATH, STORAGE, fetch_history, fetch_watering_events, fetch_system_events
+from downsample import downsample_rows
+from history_cache import HistoryCache, aligned_end
+from stream import StreamHub, sse_messages
+from writer import read_stats
 
 app = Flask(__name__)
+stream_hub = StreamHub()
+history_cache = HistoryCache()
+
+if AGGREGATOR_DIR:  # central mode: uploads from the shipper.py of every node
+    app.register_blueprint(aggregator_bp)
+
+# request latency per endpoint (the histograms are created once per endpoint, not per request)
+_REQUEST_SEC: dict[str, metrics.Histogram] = {}
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    t0 = g.pop("t0", None)
+    endpoint = request.endpoint or "unknown"
+    if t0 is not None and endpoint != "api_stream":  # SSE: the response outlives the handler
+        hist = _REQUEST_SEC.get(endpoint)
+        if hist is None:
+            hist = _REQUEST_SEC[endpoint] = metrics.histogram(
+                "aw_http_request_seconds", "Flask handler duration", endpoint=endpoint)
+        hist.observe(time.perf_counter() - t0)
+    metrics.counter("aw_http_requests_total", "HTTP requests", endpoint=endpoint, status=response.status_code).inc()
+    return response
 
 @app.route("/")
 def dashboard():
@@ -10,21 +45,36 @@ def dashboard():
 @app.route("/api/history")
 def api_history():
     hours = request.args.get("hours", default=24, type=int)
+    resolution = request.args.get("resolution")  # raw/minute/hour/day, default auto
+    max_points = request.args.get("max_points", type=int)  # LTTB downsampling (optional)
 
-    rows = fetch_history(hours=hours)
-    watering = fetch_watering_events(hours=hours)
-    manual = fetch_system_events(hours=hours, code="manual_water_start")
+    # incremental polling: cursor from the previous response (see "cursor" below)
+    since = request.args.get("since", type=int)
+    since_watering = request.args.get("since_watering", type=int)
+    since_event = request.args.get("since_event", type=int)
 
-    return jsonify({
-        "timestamps": [r["ts"] for r in rows],
-        "soil1_raw":  [r["soil1_raw"] for r in rows],
-        "soil2_raw":  [r["soil2_raw"] for r in rows],
-        "soil3_raw":  [r["soil3_raw"] for r in rows],
-        "soil1":      [r["soil1_pct"] for r in rows],
-        "soil2":      [r["soil2_pct"] for r in rows],
-        "soil3":      [r["soil3_pct"] for r in rows],
-        "temp":       [r["temp_c"] for r in rows],
-        "hum":        [r["hum_pct"] for r in rows],
+    # packed typed arrays (?format=bin or Accept: application/octet-stream)
+    binary = request.args.get("format") == "bin" or request.accept_mimetypes.best == BIN_CONTENT_TYPE
+
+    # identical requests in the same HISTORY_ALIGN_SEC slot share one encoded response
+    # (history_cache.py: invalidated on every commit, concurrent misses coalesced)
+    end = aligned_end()
+    key = (hours, resolution, max_points, since, since_watering, since_event, binary, end)
+    body, mimetype = history_cache.get(key, lambda: _render_history(
+        hours, resolution, max_points, since, since_watering, since_event, binary, end
+    ))
+    return Response(body, mimetype=mimetype)
+
+def _render_history(hours, resolution, max_points, since, since_watering, since_event, binary, end):
+    resolution, rows = fetch_history(hours=hours, resolution=resolution, since=since, now=end)
+    if max_points is not None:
+        rows = downsample_rows(rows, max(3, max_points))
+    watering = fetch_watering_events(hours=hours, after_id=since_watering)
+    manual = fetch_system_events(hours=hours, code="manual_water_start", after_id=since_event)
+
+    meta = {
+        "resolution": resolution,
+        "incremental": since is not None,
 
         # clean watering events for markers
         "watering": [{
@@ -39,7 +89,70 @@ def api_history():
             "ts": e["ts"],
             "code": e["code"],
         } for e in manual],
+
+        # pass back as since/since_watering/since_event on the next poll
+        "cursor": {
+            "since": rows[-1]["ts"] if rows else since,
+            "since_watering": max((w["id"] for w in watering), default=since_watering or 0),
+            "since_event": max((e["id"] for e in manual), default=since_event or 0),
+        },
+    }
+
+    if binary:
+        return pack_history(rows, meta), BIN_CONTENT_TYPE
+
+    resp = jsonify({
+        **meta,
+        "timestamps": [r["ts"] for r in rows],
+        "soil1_raw":  [r["soil1_raw"] for r in rows],
+        "soil2_raw":  [r["soil2_raw"] for r in rows],
+        "soil3_raw":  [r["soil3_raw"] for r in rows],
+        "soil1":      [r["soil1_pct"] for r in rows],
+        "soil2":      [r["soil2_pct"] for r in rows],
+        "soil3":      [r["soil3_pct"] for r in rows],
+        "temp":       [r["temp_c"] for r in rows],
+        "hum":        [r["hum_pct"] for r in rows],
     })
+    return resp.get_data(), resp.mimetype
+
+@app.route("/api/stream")
+def api_stream():
+    # EventSource sends Last-Event-ID on reconnect -> replay of missed messages
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    if last_id is None:
+        last_id = request.args.get("last_event_id", type=int)
+
+    q = stream_hub.subscribe(last_id)
+    return Response(
+        sse_messages(stream_hub, q),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/api/storage")
+def api_storage():
+    # durability mode + write counters of every running writer (collector/controller/supervisor)
+    files = {}
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            files[DB_PATH.name + suffix] = (DB_PATH.parent / (DB_PATH.name + suffix)).stat().st_size
+        except OSError:
+            files[DB_PATH.name + suffix] = None
+    writers = read_stats()
+    return jsonify({
+        "storage": {**STORAGE.as_dict(), "loss_window_sec": STORAGE.loss_window_sec},
+        "files": files,
+        "writers": writers,
+        "totals": {
+            k: sum(w.get(k) or 0 for w in writers)
+            for k in ("commits", "jobs", "errors", "busy", "checkpoints", "io_write_bytes", "checkpoint_bytes")
+        },
+    })
+
+@app.route("/metrics")
+def prometheus_metrics():
+    # this process (fresh, from memory) + the exports of collector/controller/indicator/supervisor
+    return Response(metrics.render(metrics.collect("app")), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
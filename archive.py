@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Retention για τα raw sensor_readings.
+
+Rows παλιότερα από `raw_retention_days` (settings_history, default 90) μεταφέρονται σε
+compressed columnar αρχεία ανά ημέρα (db/archive/YYYY-MM/readings-YYYY-MM-DD.awc.z,
+columnar.py + zlib) και σβήνονται από τη βάση. Στη βάση μένουν τα hour/day rollups των
+archived ημερών (τα minute rollups σβήνονται κι αυτά). Ο χώρος επιστρέφεται σταδιακά με
+auto_vacuum=INCREMENTAL αντί για full VACUUM, και το db.fetch_history διαβάζει
+διάφανα από το archive όταν το ζητούμενο raw εύρος είναι παλιότερο από τα live rows.
+
+Τρέχει περιοδικά (π.χ. cron μία φορά τη μέρα):
+  python archive.py
+  python archive.py --days 30 --dry-run
+"""
+import argparse
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from columnar import pack, to_array, unpack
+from db import BASE_DIR, ensure_incremental_vacuum, get_conn, incremental_vacuum, init_db
+from settings import settings
+
+ARCHIVE_DIR = BASE_DIR / "db" / "archive"
+RETENTION_DAYS_DEFAULT = 90
+DELETE_CHUNK_ROWS = 2000
+ZLIB_LEVEL = 6
+
+DAY_SEC = 86400
+
+# (column, dtype) – lossless (τα pct/temp/hum μένουν f8 στο archive)
+ARCHIVE_COLUMNS = (
+    ("ts", "i8"),
+    ("soil1_raw", "i2"), ("soil2_raw", "i2"), ("soil3_raw", "i2"),
+    ("soil1_pct", "f8"), ("soil2_pct", "f8"), ("soil3_pct", "f8"),
+    ("temp_c", "f8"), ("hum_pct", "f8"),
+    ("vin_v", "f8"),
+    ("flags", "i4"),
+)
+
+
+def day_path(day_ts: int) -> Path:
+    d = datetime.fromtimestamp(day_ts, tz=timezone.utc)
+    return ARCHIVE_DIR / d.strftime("%Y-%m") / f"readings-{d:%Y-%m-%d}.awc.z"
+
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_day(path: Path) -> tuple[dict[str, np.ndarray], dict]:
+    return unpack(zlib.decompress(path.read_bytes()))
+
+
+def _pack_day(rows, existing: Path | None = None) -> bytes:
+    values = {name: [r[name] for r in rows] for name, _ in ARCHIVE_COLUMNS}
+    notes = {str(r["ts"]): r["notes"] for r in rows if r["notes"] is not None}
+
+    if existing is not None and existing.exists():
+        # re-run after a crash between file write and delete: merge, live rows win
+        old, old_meta = read_day(existing)
+        live_ts = set(values["ts"])
+        keep = [i for i, t in enumerate(old["ts"].tolist()) if t not in live_ts]
+        for name, _ in ARCHIVE_COLUMNS:
+            col = old[name][keep].astype(np.float64)
+            if old[name].dtype.kind in "iu":
+                col[col == -1] = np.nan
+            values[name] = [None if v != v else v for v in col.tolist()] + values[name]
+        notes = {**old_meta.get("notes", {}), **notes}
+
+    order = np.argsort(np.array(values["ts"], dtype=np.int64), kind="stable")
+    columns = {name: to_array(values[name], dtype)[order] for name, dtype in ARCHIVE_COLUMNS}
+    return zlib.compress(pack(columns, {"notes": notes}), ZLIB_LEVEL)
+
+
+def _delete_day(con, day_ts: int):
+    end = day_ts + DAY_SEC
+    while True:
+        cur = con.execute(
+            """
+            DELETE FROM readings WHERE ts IN (
+                SELECT ts FROM readings WHERE ts >= ? AND ts < ? LIMIT ?
+            )
+            """,
+            (day_ts, end, DELETE_CHUNK_ROWS),
+        )
+        con.commit()
+        if cur.rowcount < DELETE_CHUNK_ROWS:
+            break
+    con.execute("DELETE FROM reading_extras WHERE ts >= ? AND ts < ?", (day_ts, end))
+    con.execute("DELETE FROM sensor_rollup_minute WHERE bucket_ts >= ? AND bucket_ts < ?", (day_ts, end))
+    con.commit()
+
+
+def archive_old_readings(retention_days: int | None = None, dry_run: bool = False) -> int:
+    """Archive + delete ολόκληρων (UTC) ημερών παλιότερων από το retention. Επιστρέφει rows."""
+    if retention_days is None:
+        retention_days = settings.get_int("raw_retention_days", RETENTION_DAYS_DEFAULT)
+    cutoff = ((int(time.time()) - retention_days * DAY_SEC) // DAY_SEC) * DAY_SEC
+
+    con = get_conn()
+    total = 0
+    try:
+        if not dry_run:
+            ensure_incremental_vacuum(con)
+
+        oldest = con.execute("SELECT MIN(ts) FROM readings").fetchone()[0]
+        if oldest is None:
+            return 0
+
+        day = (oldest // DAY_SEC) * DAY_SEC
+        while day < cutoff:
+            rows = con.execute(
+                """
+                SELECT ts, soil1_raw, soil2_raw, soil3_raw,
+                       soil1_pct, soil2_pct, soil3_pct,
+                       temp_c, hum_pct, vin_v, flags, notes
+                FROM sensor_readings
+                WHERE ts >= ? AND ts < ?
+                ORDER BY ts ASC
+                """,
+                (day, day + DAY_SEC),
+            ).fetchall()
+
+            if rows:
+                path = day_path(day)
+                print(f"[archive] {path.name}: {len(rows)} rows")
+                if not dry_run:
+                    _write_atomic(path, _pack_day(rows, existing=path))
+                    _delete_day(con, day)
+                    incremental_vacuum(con)
+                total += len(rows)
+            day += DAY_SEC
+    finally:
+        con.close()
+    return total
+
+
+def read_archived(ts_from: int, ts_to: int, limit: int | None = None) -> list[dict]:
+    """
+    Rows από το archive στο [ts_from, ts_to), με τα ίδια keys που επιστρέφει το
+    raw fetch_history (ts, soilN_raw, soilN_pct, temp_c, hum_pct).
+    """
+    keys = ("ts", "soil1_raw", "soil2_raw", "soil3_raw",
+            "soil1_pct", "soil2_pct", "soil3_pct", "temp_c", "hum_pct")
+    out: list[dict] = []
+    day = (ts_from // DAY_SEC) * DAY_SEC
+    while day < ts_to and (limit is None or len(out) < limit):
+        path = day_path(day)
+        day += DAY_SEC
+        if not path.exists():
+            continue
+        cols, _ = read_day(path)
+        ts = cols["ts"]
+        mask = (ts >= ts_from) & (ts < ts_to)
+        lists = []
+        for k in keys:
+            col = cols[k][mask]
+            if col.dtype.kind == "f":
+                lists.append([None if v != v else v for v in col.tolist()])
+            elif k == "ts":
+                lists.append(col.tolist())
+            else:
+                lists.append([None if v == -1 else v for v in col.tolist()])
+        out.extend(dict(zip(keys, vals)) for vals in zip(*lists))
+    return out if limit is None else out[:limit]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Archive old raw sensor readings")
+    ap.add_argument("--days", type=int, help="retention σε ημέρες (default: setting raw_retention_days)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    init_db()
+    n = archive_old_readings(args.days, dry_run=args.dry_run)
+    print(f"[archive] done, {n} rows archived")
+
+
+if __name__ == "__main__":
+    main()
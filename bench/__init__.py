@@ -0,0 +1,6 @@
+"""
+Benchmarks για το storage/API layer πάνω σε συνθετικές βάσεις διαφόρων μεγεθών.
+
+  python -m bench.run --sizes 7,90,365
+  python -m bench.run --compare bench/results/<old>.json
+"""
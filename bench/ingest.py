@@ -0,0 +1,126 @@
+"""
+Multi-node ingestion: N συνθετικοί κόμβοι (ένας shipper.py ο καθένας, ξεχωριστή βάση
+και RUN_DIR) στέλνουν ταυτόχρονα σε έναν τοπικό aggregator (flask run, ξεχωριστό process).
+
+Ελέγχει ότι κάθε partition έχει ακριβώς τα rows της πηγής και ότι ένα δεύτερο πέρασμα
+(resume από τους acked cursors) δεν στέλνει τίποτα.
+
+  python -m bench.ingest --nodes 4 --days 7
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+import db
+from bench import synth
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _counts(path: Path) -> dict:
+    con = sqlite3.connect(path)
+    try:
+        return {t: con.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in db.INGEST_TABLES}
+    finally:
+        con.close()
+
+
+def _ship_all(tmp: Path, url: str, sources: list[Path], batch: int) -> float:
+    t0 = time.perf_counter()
+    procs = []
+    for i, src in enumerate(sources):
+        env = {
+            **os.environ,
+            "AUTO_WATERING_DB": str(src),
+            "AUTO_WATERING_RUN_DIR": str(tmp / f"run{i}"),
+        }
+        procs.append(subprocess.Popen(
+            [sys.executable, "shipper.py", "--url", url, "--node", src.stem, "--batch", str(batch), "--once"],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        ))
+    for p in procs:
+        out, _ = p.communicate()
+        if p.returncode:
+            raise RuntimeError(f"shipper failed:\n{out}")
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Several local shippers against a local aggregator")
+    ap.add_argument("--nodes", type=int, default=4)
+    ap.add_argument("--days", type=float, default=7)
+    ap.add_argument("--batch", type=int, default=5000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="aw-ingest-") as d:
+        tmp = Path(d)
+        sources = []
+        for i in range(args.nodes):
+            path = tmp / "nodes" / f"node{i}.db"
+            path.parent.mkdir(exist_ok=True)
+            synth.generate(path, args.days, seed=i + 1)
+            sources.append(path)
+        db.close_pool()
+        expected = {p.stem: _counts(p) for p in sources}
+        total = sum(sum(c.values()) for c in expected.values())
+
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        env = {
+            **os.environ,
+            "AUTO_WATERING_AGGREGATOR_DIR": str(tmp / "central"),
+            "AUTO_WATERING_DB": str(tmp / "central.db"),
+            "AUTO_WATERING_RUN_DIR": str(tmp / "run-central"),
+        }
+        agg = subprocess.Popen(
+            [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port)],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            for _ in range(100):
+                try:
+                    urllib.request.urlopen(url + "/api/nodes", timeout=1).read()
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            else:
+                raise RuntimeError("aggregator did not start")
+
+            dt = _ship_all(tmp, url, sources, args.batch)
+            print(f"{args.nodes} nodes x {args.days:g} days: {total} rows in {dt:.2f}s ({total / dt:.0f} rows/s)")
+
+            nodes = json.loads(urllib.request.urlopen(url + "/api/nodes").read())
+            ok = True
+            for node, want in expected.items():
+                got = _counts(tmp / "central" / f"{node}.db")
+                status = "ok" if got == want else f"MISMATCH {got}"
+                ok &= got == want
+                print(f"  {node}: {want} {status} cursors={nodes[node]['cursors']}")
+
+            dt = _ship_all(tmp, url, sources, args.batch)
+            after = {p.stem: _counts(tmp / "central" / f"{p.stem}.db") for p in sources}
+            ok &= after == expected
+            print(f"resume pass: {dt:.2f}s, partitions unchanged: {after == expected}")
+        finally:
+            agg.terminate()
+            agg.wait()
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
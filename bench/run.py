@@ -0,0 +1,225 @@
+"""
+Runner: για κάθε μέγεθος βάσης μετράει inserts, range queries, API serialization και
+WAL checkpoint. Αναφέρει throughput, p50/p99 latency και peak memory (tracemalloc,
+σε ξεχωριστό πέρασμα για να μην αλλοιώνει τους χρόνους) και γράφει JSON για σύγκριση
+ανάμεσα σε commits.
+
+  python -m bench.run --sizes 7,90,365 --repeat 30
+  python -m bench.run --compare bench/results/abc123.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+import db
+from bench import synth
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+HISTORY_WINDOWS_H = (6, 24, 72, 168, 720)
+EVENT_WINDOWS_H = (24, 168)
+API_QUERIES = (
+    "hours=24&max_points=600",
+    "hours=72&max_points=600",
+    "hours=72&max_points=600&format=bin",
+    "hours=720&max_points=600",
+)
+INSERT_BATCHES = 200
+INSERT_BATCH_ROWS = 5  # rows per group commit
+
+
+def _stats(samples_s: list[float]) -> dict:
+    a = np.array(samples_s) * 1000.0
+    return {
+        "n": len(a),
+        "mean_ms": round(float(a.mean()), 3),
+        "p50_ms": round(float(np.percentile(a, 50)), 3),
+        "p99_ms": round(float(np.percentile(a, 99)), 3),
+        "max_ms": round(float(a.max()), 3),
+    }
+
+
+def _time(fn, repeat: int, setup=None) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()  # untimed, e.g. dropping a cache
+        t = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t)
+    return out
+
+
+def _peak_kb(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def _bench(name: str, fn, repeat: int, rows_per_call: int | None = None, setup=None, **extra) -> dict:
+    fn()  # warm-up (page cache, statement cache)
+    samples = _time(fn, repeat, setup)
+    if setup is not None:
+        setup()
+    r = {"bench": name, **extra, **_stats(samples), "peak_kb": _peak_kb(fn)}
+    if rows_per_call is not None:
+        r["rows_per_call"] = rows_per_call
+        r["rows_per_sec"] = round(rows_per_call * len(samples) / sum(samples), 1)
+    return r
+
+
+def bench_size(path: Path, days: float, repeat: int) -> list[dict]:
+    t = time.perf_counter()
+    info = synth.generate(path, days)
+    print(f"[bench] {days}d: {info['rows']} rows generated in {time.perf_counter() - t:.1f}s")
+
+    base = {"size_days": days, "rows": info["rows"], "db_bytes": path.stat().st_size}
+    results = []
+
+    for h in HISTORY_WINDOWS_H:
+        holder = {}
+
+        def q(h=h):
+            holder["res"], holder["rows"] = db.fetch_history(hours=h)
+
+        r = _bench("fetch_history", q, repeat, hours=h, **base)
+        r["resolution"] = holder["res"]
+        r["rows_per_call"] = len(holder["rows"])
+        results.append(r)
+
+    for h in EVENT_WINDOWS_H:
+        results.append(_bench("fetch_watering_events", lambda h=h: db.fetch_watering_events(hours=h), repeat, hours=h, **base))
+        results.append(_bench("fetch_system_events", lambda h=h: db.fetch_system_events(hours=h), repeat, hours=h, **base))
+
+    import app  # flask only needed here
+
+    client = app.app.test_client()
+    for qs in API_QUERIES:
+        holder = {}
+
+        def call(qs=qs):
+            holder["bytes"] = len(client.get(f"/api/history?{qs}").data)
+
+        # api_history: query + encode (the history cache is dropped before every call, same
+        # baseline as before the cache); api_history_cached: repeated refreshes, cache hits
+        r = _bench("api_history", call, repeat, setup=app.history_cache.clear, query=qs, **base)
+        r["response_bytes"] = holder["bytes"]
+        results.append(r)
+        r = _bench("api_history_cached", call, repeat, query=qs, **base)
+        r["response_bytes"] = holder["bytes"]
+        results.append(r)
+
+    # inserts like the collector: small batch + commit, continuing after the last row
+    con = db.get_conn()
+    try:
+        last = con.execute("SELECT MAX(ts) FROM readings").fetchone()[0]
+        state = {"ts": last}
+
+        def flush():
+            batch = []
+            for _ in range(INSERT_BATCH_ROWS):
+                state["ts"] += synth.INTERVAL_SEC
+                batch.append((state["ts"], 400, 500, 600, 50.0, 60.0, 70.0, 22.0, 55.0, None, 0, None))
+            db.insert_sensor_readings_batch(con, batch)
+            con.commit()
+
+        results.append(_bench("insert_batch_commit", flush, INSERT_BATCHES,
+                              rows_per_call=INSERT_BATCH_ROWS, **base))
+
+        wal = path.with_name(path.name + "-wal")
+        wal_bytes = wal.stat().st_size if wal.exists() else 0
+        samples = _time(lambda: con.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall(), 1)
+        results.append({"bench": "wal_checkpoint", **base, "wal_bytes": wal_bytes, **_stats(samples)})
+    finally:
+        con.close()
+        db.close_pool()
+
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).resolve().parent, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(old_path: Path, new: dict):
+    """Τυπώνει p50/p99 ratios new/old για τα ίδια benchmarks."""
+    old = json.loads(old_path.read_text())
+
+    def key(r):
+        return (r["bench"], r["size_days"], r.get("hours"), r.get("query"))
+
+    old_by = {key(r): r for r in old["results"]}
+    print(f"\n{'bench':<24}{'days':>6}  {'param':<36}{'p50 old':>10}{'p50 new':>10}{'ratio':>8}")
+    for r in new["results"]:
+        o = old_by.get(key(r))
+        if not o:
+            continue
+        ratio = r["p50_ms"] / o["p50_ms"] if o["p50_ms"] else float("nan")
+        flag = "  <-- slower" if ratio > 1.2 else ""
+        param = str(r.get("hours") or r.get("query") or "")
+        print(f"{r['bench']:<24}{r['size_days']:>6}  {param:<36}{o['p50_ms']:>10.2f}{r['p50_ms']:>10.2f}{ratio:>8.2f}{flag}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Storage/API benchmarks on synthetic databases")
+    ap.add_argument("--sizes", default="7,90,365", help="μεγέθη βάσης σε ημέρες, comma separated")
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--workdir", help="πού φτιάχνονται οι βάσεις (default: temp dir)")
+    ap.add_argument("--out", help="JSON αποτελεσμάτων (default: bench/results/<commit>.json)")
+    ap.add_argument("--compare", help="παλιό JSON για σύγκριση")
+    args = ap.parse_args()
+
+    sizes = [float(s) for s in args.sizes.split(",") if s]
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="aw-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": [],
+    }
+
+    for days in sizes:
+        path = workdir / f"bench_{days:g}d.db"
+        for r in bench_size(path, days, args.repeat):
+            report["results"].append(r)
+            param = r.get("hours") or r.get("query") or ""
+            print(f"  {r['bench']:<24} {param!s:<36} p50={r['p50_ms']:.2f}ms p99={r['p99_ms']:.2f}ms")
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"[bench] results -> {out}")
+
+    if args.compare:
+        compare(Path(args.compare), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Συνθετική βάση: μήνες/χρόνια από 15s μετρήσεις + watering/system events.
+
+Το μοντέλο μοιάζει με το πραγματικό setup: εκθετική ξήρανση ανά γλάστρα, η γλάστρα 2
+ποτίζεται από τον controller όταν πέσει κάτω από start_pct (pump_* events), οι 1 και 3
+ποτίζονται "με το χέρι" κάθε λίγες μέρες (manual_water_start), θερμοκρασία/υγρασία με
+ημερήσιο κύκλο και περιστασιακά NULL από τον DHT22.
+"""
+import time
+
+import numpy as np
+
+import db
+
+INTERVAL_SEC = 15
+ADC_DRY, ADC_WET = 25, 742
+START_PCT, STOP_PCT = 60.0, 75.0
+DRY_TAU_SEC = 3 * 86400
+PUMP_GAIN_PCT = 18.0           # ~150ml στη γλάστρα 2
+MANUAL_EVERY_SEC = 5 * 86400
+PULSES = [1.0, 1.0, 1.5, 2.0, 2.0]
+PAUSES = [15, 15, 25, 25]
+ML_PER_SEC = 20.0
+DHT_NULL_P = 0.02
+INSERT_CHUNK = 50_000
+
+
+def _moisture(ts: np.ndarray, rng, threshold: float | None, every_sec: int | None, gain: float):
+    """
+    Sawtooth υγρασίας (%) για μία γλάστρα. Επιστρέφει (pct, event_ts).
+    Τα σημεία ποτίσματος υπολογίζονται αναλυτικά (όχι loop ανά sample).
+    """
+    pct = np.empty(ts.shape)
+    events = []
+    t0, m0 = ts[0], rng.uniform(65, 80)
+    i = 0
+    while i < len(ts):
+        if threshold is not None:
+            dt = DRY_TAU_SEC * np.log(m0 / threshold) if m0 > threshold else 0.0
+        else:
+            dt = every_sec * rng.uniform(0.8, 1.2)
+        t_event = t0 + max(dt, INTERVAL_SEC)
+        j = int(np.searchsorted(ts, t_event, side="left"))
+        seg = ts[i:j]
+        pct[i:j] = m0 * np.exp(-(seg - t0) / DRY_TAU_SEC)
+        if j >= len(ts):
+            break
+        m_at = m0 * np.exp(-(t_event - t0) / DRY_TAU_SEC)
+        events.append((int(t_event), float(m_at)))
+        t0, m0 = t_event, min(100.0, m_at + gain * rng.uniform(0.85, 1.15))
+        i = j
+    return pct, events
+
+
+def generate(path, days: float, seed: int = 1, end_ts: int | None = None) -> dict:
+    """Φτιάχνει (από την αρχή) βάση στο `path` με `days` μέρες δεδομένων μέχρι το end_ts (default: τώρα)."""
+    rng = np.random.default_rng(seed)
+    end_ts = int(time.time()) if end_ts is None else end_ts
+    n = int(days * 86400 // INTERVAL_SEC)
+    ts = end_ts - (n - 1 - np.arange(n, dtype=np.int64)) * INTERVAL_SEC
+
+    p1, manual1 = _moisture(ts, rng, None, MANUAL_EVERY_SEC, 25.0)
+    p2, pump2 = _moisture(ts, rng, START_PCT, None, PUMP_GAIN_PCT)
+    p3, manual3 = _moisture(ts, rng, None, int(MANUAL_EVERY_SEC * 1.4), 25.0)
+
+    pcts = [np.clip(p + rng.normal(0, 0.3, n), 0, 100) for p in (p1, p2, p3)]
+    raws = [np.clip(np.round(ADC_DRY + (ADC_WET - ADC_DRY) * p / 100.0), 0, 1023).astype(np.int64) for p in pcts]
+
+    day = (ts % 86400) / 86400.0
+    temp = np.round(22 + 4 * np.sin(2 * np.pi * (day - 0.375)) + rng.normal(0, 0.3, n), 1)
+    hum = np.round(55 - 10 * np.sin(2 * np.pi * (day - 0.375)) + rng.normal(0, 1.0, n), 1)
+    dht_null = rng.random(n) < DHT_NULL_P
+
+    db.DB_PATH = path
+    db.close_pool()
+    for suffix in ("", "-wal", "-shm"):
+        p = path.with_name(path.name + suffix)
+        if p.exists():
+            p.unlink()
+    db.init_db()
+
+    con = db.get_conn()
+    con.execute("PRAGMA synchronous=OFF")
+    try:
+        cols = [
+            ts.tolist(),
+            *(r.tolist() for r in raws),
+            *(np.round(p * db.FIXED_SCALE).astype(np.int64).tolist() for p in pcts),
+            np.where(dht_null, None, np.round(temp * db.FIXED_SCALE).astype(np.int64)).tolist(),
+            np.where(dht_null, None, np.round(hum * db.FIXED_SCALE).astype(np.int64)).tolist(),
+        ]
+        rows = list(zip(*cols))
+        for k in range(0, n, INSERT_CHUNK):
+            con.executemany(
+                """
+                INSERT INTO readings
+                (ts, s1_raw, s2_raw, s3_raw,
+                 s1_pct, s2_pct, s3_pct,
+                 temp, hum, flags)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                """,
+                rows[k:k + INSERT_CHUNK],
+            )
+            con.commit()
+
+        watering, system = _events(pump2, manual1 + manual3)
+        con.executemany(
+            """
+            INSERT INTO watering_events
+            (ts_start, ts_end, duration_s, estimated_ml,
+             trigger_pot, trigger_value_pct, threshold_pct, result)
+            VALUES (?, ?, ?, ?, 2, ?, ?, 'ok')
+            """,
+            watering,
+        )
+        con.executemany("INSERT INTO system_events(ts, level, code, message) VALUES (?, ?, ?, ?)", system)
+        con.commit()
+
+        db.rebuild_rollups(con)
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        con.close()
+
+    return {"rows": n, "watering_events": len(watering), "system_events": len(system)}
+
+
+def _events(pump_events, manual_events):
+    total_on = sum(PULSES)
+    watering, system = [], []
+    for t, pct in pump_events:
+        t_end = t + int(sum(PULSES) + sum(PAUSES))
+        watering.append((t, t_end, int(round(total_on)), total_on * ML_PER_SEC, pct, START_PCT))
+        system.append((t, "info", "pump_trigger", f"Trigger: soil2_pct={pct:.2f} <= {START_PCT}"))
+        system.append((t, "info", "pump_cycle_start", "Pump cycle start pot=2"))
+        at = t
+        for i, (on, pause) in enumerate(zip(PULSES, PAUSES + [0]), start=1):
+            system.append((int(at), "info", "pump_pulse_on", f"Pulse {i}/{len(PULSES)} ON {on:.2f}s"))
+            at += on + pause
+        system.append((t_end, "info", "pump_cycle_end", "Pump cycle end pot=2"))
+    for t, _ in manual_events:
+        system.append((t, "info", "manual_water_start", "manual watering"))
+        system.append((t, "info", "led_off", "LED OFF"))
+    system.sort()
+    return watering, system
@@ -1,128 +1,341 @@
+import math
+import threading
 import time
-from db import init_db, get_conn, insert_sensor_readings_batch
-from sensors import read_soil_raw, read_dht22
-
-INTERVAL_SEC = 15          # sampling
-FLUSH_EVERY_SEC = 15      # commit every 15 sec
-MAX_BUFFER_ROWS = 5       # safety
-
-def clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
-
-def load_calibration(con):
-    keys = ["soil1_dry","soil1_wet","soil2_dry","soil2_wet","soil3_dry","soil3_wet"]
-    latest = {}
-
-    for k in keys:
-        row = con.execute(
-            "SELECT value FROM settings_history WHERE key=? ORDER BY ts DESC LIMIT 1",
-            (k,),
-        ).fetchone()
-        if row is not None:
-            try:
-                latest[k] = float(row["value"])
-            except Exception:
-                pass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import metrics
+import tracing
+from config import config
+from db import init_db, get_writer, insert_sensor_readings_batch, insert_pot_readings_batch
+from hardware import clock
+from notify import Publisher, Subscription, TOPIC_READINGS, TOPIC_WATERING
+from runtime import stop_event
+from sensors import read_pots_raw, read_dht22
+from settings import settings
+from snapshot import SnapshotWriter
+from writer import DbWriter, start_shared, stop_shared
+
+INTERVAL_SEC = 15          # starting interval, then adaptive (commit window: durability mode, config [storage])
+DHT_WAIT_SEC = 2.0        # max wait for the DHT22 per sample (read_dht22 can take ~0.65s with retries)
+DHT_MIN_INTERVAL_SEC = 2.0  # DHT22 datasheet: at most one read every 2s
+
+# Adaptive sampling (settings_history): sample_min_sec σε πότισμα, sample_steep_sec σε απότομη
+# κλίση χωρίς πότισμα (ένα noisy/floating κανάλι δεν κρατάει τα 2s για πάντα),
+# διπλασιασμός μέχρι sample_max_sec όσο η υγρασία είναι flat.
+DEFAULTS = {
+    "sample_min_sec": 2,
+    "sample_steep_sec": 10,
+    "sample_max_sec": 120,             # = SNAPSHOT_MAX_AGE_SEC: πάνω από αυτό οι readers πέφτουν σε SQLite
+    "sample_slope_pct_per_min": 1.0,   # ο θόρυβος του ADC δίνει ~0.2%/min στο SLOPE_WINDOW_SEC
+}
+SLOPE_WINDOW_SEC = 120    # slope against the newest sample at least this old (smooths ADC noise)
+WATERING_MAX_SEC = 600    # a cycle without an end message (lost datagram) stops counting after this
+WATCH_SLICE_SEC = 0.5     # real seconds; stop latency of the watering watcher
+
+SAMPLE_SEC = metrics.histogram("aw_collector_sample_seconds", "Sample: ADC + DHT22 wait + queueing the write")
+WAKE_LATE_SEC = metrics.histogram("aw_collector_wake_late_seconds", "How late the sample loop woke up")
+SAMPLES = metrics.counter("aw_collector_samples_total", "Samples taken")
+SKIPPED = metrics.counter("aw_collector_skipped_samples_total", "Sample slots skipped after an overrun")
+DHT_TIMEOUTS = metrics.counter("aw_collector_dht_timeouts_total", "Samples without T/H (DHT22 slower than DHT_WAIT_SEC)")
+SOIL_ERRORS = metrics.counter("aw_collector_soil_errors_total", "Samples where the soil read raised")
+INTERVAL = metrics.gauge("aw_collector_interval_seconds", "Current adaptive sampling interval")
+SLOPE = metrics.gauge("aw_collector_slope_pct_per_min", "Steepest soil moisture slope over SLOPE_WINDOW_SEC")
+WATERING_WAKEUPS = metrics.counter("aw_collector_watering_wakeups_total", "Sleeps cut short by a pump cycle start")
+
+def _float_or_none(v):
+    try:
+        return float(v) if v is not None else None
+    except Exception:
+        return None
 
+def load_calibration():
+    # all keys come from the settings cache (one query, reloaded only on change)
     cal = {}
-    for pot in (1, 2, 3):
-        cal[pot] = {
-            "dry": latest.get(f"soil{pot}_dry"),
-            "wet": latest.get(f"soil{pot}_wet"),
+    for pot in config.pots:
+        cal[pot.id] = {
+            "dry": _float_or_none(settings.get(pot.dry_key)),
+            "wet": _float_or_none(settings.get(pot.wet_key)),
         }
     return cal
 
-def raw_to_pct(pot: int, raw: int, cal: dict) -> float | None:
-    dry = cal[pot]["dry"]
-    wet = cal[pot]["wet"]
-    if dry is None or wet is None or dry == wet:
-        return None
-    pct = (raw - dry) / (wet - dry) * 100.0
-    return float(clamp(pct, 0.0, 100.0))
+def pct_scales(cal: dict) -> list[tuple[float, float] | None]:
+    """(dry, 100/(wet-dry)) ανά Pot.index, None χωρίς calibration· ξαναϋπολογίζεται μόνο σε αλλαγή settings."""
+    scales = []
+    for pot in config.pots:
+        dry, wet = cal[pot.id]["dry"], cal[pot.id]["wet"]
+        scales.append(None if dry is None or wet is None or dry == wet else (dry, 100.0 / (wet - dry)))
+    return scales
 
-def main():
-    init_db()
-    print(f"[collector] started, interval={INTERVAL_SEC}s")
+def raws_to_pcts(raws, scales) -> list[float | None]:
+    """(raw - dry) / (wet - dry) * 100, clamped 0..100, για όλες τις γλάστρες (None χωρίς raw/calibration)."""
+    return [
+        None if raw is None or sc is None else min(100.0, max(0.0, (raw - sc[0]) * sc[1]))
+        for raw, sc in zip(raws, scales)
+    ]
+
+class AdaptiveInterval:
+    """
+    Επόμενο sampling interval από την κλίση της υγρασίας (max ανά γλάστρα, %/min)
+    και το αν τρέχει κύκλος ποτίσματος. Hysteresis: κάτω από το μισό threshold
+    διπλασιάζεται, ανάμεσα μένει ίδιο.
+    """
+
+    def __init__(self, interval: int = INTERVAL_SEC):
+        self.interval = interval
+        self.slope = None
+        self._hist: deque = deque()  # (ts, pcts)
+
+    def _update_slope(self, ts: int, pcts) -> float | None:
+        self._hist.append((ts, pcts))
+        # keep the newest sample that is >= SLOPE_WINDOW_SEC old as the reference
+        while len(self._hist) > 2 and self._hist[1][0] <= ts - SLOPE_WINDOW_SEC:
+            self._hist.popleft()
+        ref_ts, ref = self._hist[0]
+        if ts <= ref_ts:
+            return None
+        diffs = [abs(p - r) for p, r in zip(pcts, ref) if p is not None and r is not None]
+        return max(diffs) * 60.0 / (ts - ref_ts) if diffs else None
+
+    def next(self, ts: int, pcts, watering: bool, lo: int, hi: int, steep: float, steep_sec: int) -> int:
+        self.slope = self._update_slope(ts, pcts)
+        if watering:
+            self.interval = lo
+        elif self.slope is not None and self.slope >= steep:
+            self.interval = steep_sec
+        elif self.slope is None or self.slope < steep / 2:
+            self.interval = self.interval * 2
+        self.interval = max(lo, min(hi, self.interval))
+        return self.interval
+
+
+def sample_bounds() -> tuple[int, int, float, int]:
+    """(min, max, slope threshold, steep interval) από το settings cache (χωρίς query αν δεν άλλαξε κάτι)."""
+    lo = max(1, settings.get_int("sample_min_sec", DEFAULTS["sample_min_sec"]))
+    hi = max(lo, settings.get_int("sample_max_sec", DEFAULTS["sample_max_sec"]))
+    steep = settings.get_float("sample_slope_pct_per_min", DEFAULTS["sample_slope_pct_per_min"])
+    steep_sec = max(lo, min(hi, settings.get_int("sample_steep_sec", DEFAULTS["sample_steep_sec"])))
+    return lo, hi, steep, steep_sec
+
+
+class WateringWatch:
+    """
+    Ενεργοί κύκλοι ποτίσματος από το TOPIC_WATERING (scheduler.py, ίδιο ή άλλο process).
+    Ένα thread περιμένει τα datagrams και κάνει set το `wake`, ώστε ένας κύκλος που
+    ξεκινάει να κόβει αμέσως ένα μεγάλο sleep του sampling loop (και το stop επίσης).
+    """
+
+    def __init__(self, stop=None):
+        self.wake = threading.Event()
+        self._stop = stop
+        self._closed = threading.Event()
+        self._active: dict[str, float] = {}  # plan -> expires (clock.time())
+        self._lock = threading.Lock()
+        self._sub = Subscription(TOPIC_WATERING)
+        self._thread = threading.Thread(target=self._run, name="collector-watering", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed.is_set():
+            if self._stop is not None and self._stop.is_set():
+                self.wake.set()
+                return
+            msg = self._sub.wait(WATCH_SLICE_SEC)
+            if msg is None or "plan" not in msg:
+                continue
+            with self._lock:
+                if msg.get("active"):
+                    self._active[msg["plan"]] = clock.time() + WATERING_MAX_SEC
+                    self.wake.set()
+                else:
+                    self._active.pop(msg["plan"], None)
+
+    def active(self) -> bool:
+        now = clock.time()
+        with self._lock:
+            for plan in [p for p, exp in self._active.items() if exp < now]:
+                del self._active[plan]
+            return bool(self._active)
+
+    def close(self):
+        self._closed.set()
+        self._thread.join(WATCH_SLICE_SEC * 2)
+        self._sub.close()
 
-    con = get_conn()
-    buffer: list[tuple] = []
-    last_flush = time.time()
 
-    # cache calibration, refresh periodically (so we don't SELECT every 30s)
-    cal = load_calibration(con)
-    last_cal_refresh = time.time()
-    CAL_REFRESH_SEC = 600  # 10 minutes
+def run(stop=None):
+    """
+    Sampling loop μέχρι να γίνει set το `stop` (threading.Event, None = για πάντα).
+    Writes μέσω του shared writer αν υπάρχει (supervisor.py), αλλιώς μέσω δικού του.
+    """
+    print(f"[collector] started, interval={INTERVAL_SEC}s (adaptive)")
+
+    snapshot = SnapshotWriter()  # latest reading for controller/indicator (no DB reads)
+    notifier = Publisher(TOPIC_READINGS)  # wakes the controller on every sample
+
+    # pipeline: ADC in this thread, DHT22 in its own worker, DB writes in the writer thread;
+    # a slow commit (SD card) never delays sampling
+    writer = get_writer()
+    own_writer = None
+    if writer is None:
+        own_writer = writer = DbWriter(name="collector-writer").start()
+    dht_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="collector-dht")
+    dht_future = None
+    dht_last = -math.inf
+
+    # fast sampling while a pump cycle runs or the soil changes quickly, minutes when flat
+    watch = WateringWatch(stop)
+    rate = AdaptiveInterval(INTERVAL_SEC)
+    interval = INTERVAL_SEC
+
+    # cache calibration, rebuild only when settings_history changes (save_cal.py);
+    # compare generations, the settings cache may be refreshed by other threads too
+    settings.refresh()
+    scales = pct_scales(load_calibration())
+    cal_gen = settings.generation
+
+    # per-channel layout comes precomputed from config (no per-sample rebuilds)
+    legacy_index = config.legacy_index
+    extra_pots = tuple((p.id, p.index) for p in config.extra_pots)
+    n_pots = len(config.pots)
+
+    # fixed sample deadlines on the monotonic clock; ts on an INTERVAL_SEC-aligned wall grid
+    # (hardware.clock: real time on the Pi, virtual time with the sim backend)
+    next_ts = (int(clock.time()) // INTERVAL_SEC + 1) * INTERVAL_SEC
+    next_mono = clock.monotonic() + (next_ts - clock.time())
+    last_ts, last_mono = next_ts - interval, next_mono - interval
 
     try:
         while True:
-            ts = int(time.time())
+            delay = next_mono - clock.monotonic()
+            with tracing.span("collector.sleep", planned_sec=round(delay, 3)):
+                woken = clock.wait(watch.wake, delay)
+            if stop is not None and stop.is_set():
+                break
+            if woken:
+                # a pump cycle started: move the deadline to the next sample_min_sec step
+                watch.wake.clear()
+                lo = sample_bounds()[0]
+                if interval > lo and watch.active():
+                    WATERING_WAKEUPS.inc()
+                    interval = lo
+                    n = max(1, math.ceil((clock.monotonic() - last_mono) / lo))
+                    next_ts, next_mono = last_ts + n * lo, last_mono + n * lo
+                continue
+            ts = next_ts
+            last_ts, last_mono = next_ts, next_mono
+            t0 = time.perf_counter()
+            t_sample = tracing.start()
+            wake_late = max(0.0, clock.monotonic() - next_mono)
+            WAKE_LATE_SEC.observe(wake_late)
 
-            # refresh calibration occasionally
-            if time.time() - last_cal_refresh >= CAL_REFRESH_SEC:
-                try:
-                    cal = load_calibration(con)
-                except Exception as e:
-                    print("[collector] calibration load error:", e)
-                last_cal_refresh = time.time()
-
-            s1_raw = s2_raw = s3_raw = None
-            s1_pct = s2_pct = s3_pct = None
+            # DHT22 in parallel with the soil read; one read at a time (driver is not thread-safe),
+            # a read still stuck from the previous sample means no T/H for this one
+            dht_started = (dht_future is None or dht_future.done()) and clock.monotonic() - dht_last >= DHT_MIN_INTERVAL_SEC
+            if dht_started:
+                dht_last = clock.monotonic()
+                dht_future = dht_pool.submit(read_dht22)
 
+            # pick up new calibration immediately (PRAGMA data_version check, no query otherwise)
             try:
-                s1_raw, s2_raw, s3_raw = read_soil_raw()
-                s1_pct = raw_to_pct(1, s1_raw, cal) if s1_raw is not None else None
-                s2_pct = raw_to_pct(2, s2_raw, cal) if s2_raw is not None else None
-                s3_pct = raw_to_pct(3, s3_raw, cal) if s3_raw is not None else None
+                with tracing.span("collector.settings"):
+                    settings.refresh()
+                    if settings.generation != cal_gen:
+                        scales = pct_scales(load_calibration())
+                        cal_gen = settings.generation
             except Exception as e:
-                print("[collector] soil read error:", e)
+                print("[collector] calibration load error:", e)
 
+            raws = [None] * n_pots
+            pcts = [None] * n_pots
             try:
-                temp_c, hum_pct = read_dht22()
+                with tracing.span("collector.soil"):
+                    raws = read_pots_raw()  # one interleaved read per ADC
+                with tracing.span("collector.convert"):
+                    pcts = raws_to_pcts(raws, scales)
             except Exception as e:
-                print("[collector] dht22 read error:", e)
-                temp_c, hum_pct = None, None
+                SOIL_ERRORS.inc()
+                print("[collector] soil read error:", e)
 
+            temp_c, hum_pct = None, None
+            if dht_started:
+                try:
+                    with tracing.span("collector.dht_wait"):
+                        temp_c, hum_pct = dht_future.result(timeout=DHT_WAIT_SEC)
+                except FutureTimeout:
+                    DHT_TIMEOUTS.inc()
+                    print("[collector] dht22 read timeout")
+                except Exception as e:
+                    print("[collector] dht22 read error:", e)
+
+            # pots 1..3 -> soilN_* columns, the rest -> pot_readings
+            legacy_raw = [None if i is None else raws[i] for i in legacy_index]
+            legacy_pct = [None if i is None else pcts[i] for i in legacy_index]
             row = (
                 ts,
-                s1_raw, s2_raw, s3_raw,
-                s1_pct, s2_pct, s3_pct,
+                *legacy_raw,
+                *legacy_pct,
                 temp_c, hum_pct,
                 None,  # vin_v
                 0,     # flags
                 None,  # notes
             )
-            buffer.append(row)
+            extra = [(ts, pot_id, raws[i], pcts[i]) for pot_id, i in extra_pots]
+            with tracing.span("collector.publish"):
+                writer.submit(lambda con, rows=[row], extra=extra: (
+                    insert_sensor_readings_batch(con, rows), insert_pot_readings_batch(con, extra)
+                ))
+                snapshot.publish(ts, raws, pcts, temp_c, hum_pct)
+                try:
+                    notifier.publish({"ts": ts, "pct": pcts})
+                except OSError as e:
+                    print("[collector] notify error:", e)
+            # next interval from the slope / watering state (bounds editable live in settings_history)
+            interval = rate.next(ts, pcts, watch.active(), *sample_bounds())
+            INTERVAL.set(interval)
+            if rate.slope is not None:
+                SLOPE.set(rate.slope)
+            SAMPLE_SEC.observe(time.perf_counter() - t0)
+            SAMPLES.inc()
+            tracing.finish("collector.sample", t_sample, ts=ts, wake_late_sec=round(wake_late, 4), interval=interval)
 
-            print(f"[{ts}] raw=({s1_raw},{s2_raw},{s3_raw}) pct=({s1_pct},{s2_pct},{s3_pct}) T/H=({temp_c},{hum_pct})")
+            print(f"[{ts}] raw={tuple(raws)} pct={tuple(None if p is None else round(p, 2) for p in pcts)} T/H=({temp_c},{hum_pct}) next={interval}s")
 
-            now = time.time()
-            should_flush = (now - last_flush >= FLUSH_EVERY_SEC) or (len(buffer) >= MAX_BUFFER_ROWS)
+            # next deadline; skip (don't burst) slots we already overran
+            next_ts += interval
+            next_mono += interval
+            late = clock.monotonic() - next_mono
+            if late > 0:
+                missed = int(late // interval) + 1
+                print(f"[collector] overran by {late:.2f}s, skipping {missed} sample(s)")
+                SKIPPED.inc(missed)
+                next_ts += missed * interval
+                next_mono += missed * interval
 
-            if should_flush and buffer:
-                try:
-                    insert_sensor_readings_batch(con, buffer)
-                    con.commit()
-                    buffer.clear()
-                    last_flush = now
-                except Exception as e:
-                    print("[collector] DB flush error:", e)
-                    # try to recover: rollback and keep buffer (don't lose data)
-                    try:
-                        con.rollback()
-                    except Exception:
-                        pass
+            # wall clock stepped (NTP)? re-anchor the ts grid
+            if abs((next_ts - clock.time()) - (next_mono - clock.monotonic())) > interval:
+                next_ts = (int(clock.time() + (next_mono - clock.monotonic())) // interval) * interval
+
+    finally:
+        if own_writer is not None:
+            own_writer.stop()  # final flush
+        watch.close()
+        dht_pool.shutdown(wait=False)
+        notifier.close()
+        snapshot.close()
 
-            time.sleep(INTERVAL_SEC)
 
+def main():
+    init_db()
+    metrics.start_exporter("collector")
+    tracing.setup("collector")  # no-op unless AUTO_WATERING_TRACE is set
+    writer = start_shared("collector-writer")  # group commit per durability mode
+    try:
+        run(stop_event())  # SIGTERM -> final commit of the open group
     finally:
-        # final flush on exit
-        try:
-            if buffer:
-                insert_sensor_readings_batch(con, buffer)
-                con.commit()
-        except Exception:
-            pass
-        con.close()
+        tracing.flush()
+        stop_shared(writer)
+        metrics.flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+"""
+Compact columnar binary format (typed arrays + μικρό JSON header).
+
+Layout (little-endian):
+  b"AWC1" | uint32 header_len | header JSON (padded σε 8 bytes) | column blobs (το καθένα padded σε 8)
+Header: {"n": rows, "columns": [{"name": ..., "dtype": "i4"/"i2"/"f4"/...}, ...], "meta": {...}}
+Τα f4/f8 έχουν NaN για NULL, τα ακέραια το sentinel του column ("null", default -1).
+Το padding κρατάει κάθε column aligned, ώστε ο browser να φτιάχνει TypedArray views χωρίς copy.
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"AWC1"
+CONTENT_TYPE = "application/octet-stream"
+
+_INT_NULL = -1
+
+# /api/history columns: (response key, row key, dtype)
+HISTORY_COLUMNS = (
+    ("timestamps", "ts", "i4"),
+    ("soil1_raw", "soil1_raw", "i2"),
+    ("soil2_raw", "soil2_raw", "i2"),
+    ("soil3_raw", "soil3_raw", "i2"),
+    ("soil1", "soil1_pct", "f4"),
+    ("soil2", "soil2_pct", "f4"),
+    ("soil3", "soil3_pct", "f4"),
+    ("temp", "temp_c", "f4"),
+    ("hum", "hum_pct", "f4"),
+)
+
+
+def _pad8(n: int) -> int:
+    return (-n) % 8
+
+
+def to_array(values, dtype: str) -> np.ndarray:
+    """list με None -> numpy array (NaN ή sentinel για τα NULL)."""
+    arr = np.array(values, dtype=np.float64)  # None -> NaN
+    if dtype.startswith("f"):
+        return arr.astype("<" + dtype)
+    arr[np.isnan(arr)] = _INT_NULL
+    return arr.astype("<" + dtype)
+
+
+def pack(columns: dict[str, np.ndarray], meta: dict | None = None) -> bytes:
+    """columns: name -> 1-D numpy array (ίδιο μήκος για όλα)."""
+    lengths = {len(a) for a in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("all columns must have the same length")
+    n = lengths.pop() if lengths else 0
+
+    specs = []
+    for name, arr in columns.items():
+        spec = {"name": name, "dtype": arr.dtype.str.lstrip("<>|=")}
+        if arr.dtype.kind in "iu":
+            spec["null"] = _INT_NULL
+        specs.append(spec)
+
+    header = json.dumps({"n": n, "columns": specs, "meta": meta or {}}, separators=(",", ":")).encode()
+    header += b" " * _pad8(8 + len(header))
+
+    parts = [MAGIC, struct.pack("<I", len(header)), header]
+    for arr in columns.values():
+        blob = np.ascontiguousarray(arr).astype(arr.dtype.newbyteorder("<"), copy=False).tobytes()
+        parts.append(blob)
+        parts.append(b"\0" * _pad8(len(blob)))
+    return b"".join(parts)
+
+
+def unpack(buf: bytes) -> tuple[dict[str, np.ndarray], dict]:
+    """Αντίστροφο του pack. Επιστρέφει (columns, meta)."""
+    if buf[:4] != MAGIC:
+        raise ValueError("not a columnar blob")
+    (header_len,) = struct.unpack_from("<I", buf, 4)
+    header = json.loads(buf[8:8 + header_len])
+    n = header["n"]
+
+    off = 8 + header_len
+    columns = {}
+    for spec in header["columns"]:
+        dt = np.dtype("<" + spec["dtype"])
+        columns[spec["name"]] = np.frombuffer(buf, dtype=dt, count=n, offset=off)
+        size = n * dt.itemsize
+        off += size + _pad8(size)
+    return columns, header["meta"]
+
+
+def pack_history(rows, meta: dict) -> bytes:
+    """rows του fetch_history (sqlite3.Row ή dict από το archive) -> binary response του /api/history."""
+    values = [[r[row_key] for r in rows] for _, row_key, _ in HISTORY_COLUMNS]
+
+    columns = {
+        name: to_array(col, dtype)
+        for (name, _, dtype), col in zip(HISTORY_COLUMNS, values)
+    }
+    return pack(columns, meta)
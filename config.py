@@ -0,0 +1,184 @@
+"""
+Hardware/pots configuration: γλάστρες, ADCs (MCP3008 σε CE0/CE1), relays, LED, DHT22,
+και η πολιτική writes της βάσης ([storage], durability mode).
+
+Χωρίς config.toml ισχύει το σημερινό setup (3 γλάστρες σε CH0..2 του CE0, αντλία της
+γλάστρας 2 στο GPIO19, LED στο GPIO17 για τις 1 και 3). Με config.toml (βλ.
+config.example.toml, ή AUTO_WATERING_CONFIG=path) ορίζονται όσες γλάστρες χρειάζεται.
+
+Όλες οι per-channel δομές (ομαδοποίηση ανά ADC, settings keys, θέσεις στο
+sensor_readings) υπολογίζονται μία φορά εδώ, όχι σε κάθε loop.
+"""
+import os
+import tomllib
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+CONFIG_PATH = Path(os.environ.get("AUTO_WATERING_CONFIG") or BASE_DIR / "config.toml")
+
+LEGACY_POTS = (1, 2, 3)  # γλάστρες με δικές τους στήλες soilN_* στο sensor_readings
+ADC_CHANNELS = 8         # MCP3008
+SPI_MAX_HZ = 1_000_000
+
+_DEFAULT = {
+    "adc": [{"bus": 0, "device": 0}],
+    "dht_pin": 4,
+    "led_pin": 17,
+    "pot": [
+        {"id": 1, "name": "Γλάστρα 1", "adc": 0, "channel": 0, "led_pct": 88.0},
+        {"id": 2, "name": "Γλάστρα 2", "adc": 0, "channel": 1, "relay": 19,
+         "start_pct": 60.0, "stop_pct": 75.0},
+        {"id": 3, "name": "Γλάστρα 3", "adc": 0, "channel": 2, "led_pct": 82.0},
+    ],
+}
+
+
+# Durability modes (storage.durability): πόσα δεδομένα μπορεί να χαθούν σε crash/power loss
+# έναντι πόσων writes στην SD card.
+#   full   : κάθε write commit αμέσως + fsync (synchronous=FULL), WAL autocheckpoint ανά 1000 pages
+#   normal : group commit ανά 2s, synchronous=NORMAL (ασφαλές σε WAL, χάνονται μόνο τα τελευταία commits)
+#   flash  : group commit ανά 60s, χωρίς autocheckpoint· checkpoint από τον writer ανά 15 min ή όταν
+#            το WAL ξεπεράσει τα 16MB -> λίγα, μεγάλα sequential writes
+DURABILITY_MODES = {
+    "full": {
+        "synchronous": "FULL", "commit_delay_sec": 0.0,
+        "wal_autocheckpoint": 1000, "checkpoint_sec": 0, "checkpoint_wal_mb": 0,
+    },
+    "normal": {
+        "synchronous": "NORMAL", "commit_delay_sec": 2.0,
+        "wal_autocheckpoint": 1000, "checkpoint_sec": 0, "checkpoint_wal_mb": 0,
+    },
+    "flash": {
+        "synchronous": "NORMAL", "commit_delay_sec": 60.0,
+        "wal_autocheckpoint": 0, "checkpoint_sec": 900, "checkpoint_wal_mb": 16,
+    },
+}
+DEFAULT_DURABILITY = "normal"
+
+
+class Storage:
+    """[storage] του config.toml: ένα preset (durability) + προαιρετικά overrides ανά key."""
+
+    __slots__ = (
+        "durability", "synchronous", "commit_delay_sec", "max_pending",
+        "wal_autocheckpoint", "checkpoint_sec", "checkpoint_wal_mb", "journal_size_limit_mb",
+        "stats_sec",
+    )
+
+    def __init__(self, d: dict):
+        mode = os.environ.get("AUTO_WATERING_DURABILITY") or d.get("durability") or DEFAULT_DURABILITY
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"storage.durability must be one of: {', '.join(DURABILITY_MODES)}")
+        v = {**DURABILITY_MODES[mode], **{k: x for k, x in d.items() if k != "durability"}}
+        self.durability = mode
+        self.synchronous = str(v["synchronous"]).upper()
+        if self.synchronous not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+            raise ValueError("storage.synchronous must be OFF/NORMAL/FULL/EXTRA")
+        self.commit_delay_sec = float(v["commit_delay_sec"])
+        self.max_pending = int(v.get("max_pending", 500))
+        self.wal_autocheckpoint = int(v["wal_autocheckpoint"])  # pages, 0 = off
+        self.checkpoint_sec = float(v["checkpoint_sec"])        # timed checkpoint από τον writer, 0 = off
+        self.checkpoint_wal_mb = float(v["checkpoint_wal_mb"])  # checkpoint νωρίτερα αν το WAL μεγαλώσει, 0 = off
+        # WAL κόβεται σε τόσα MB μετά από checkpoint (ίδιο με το checkpoint_wal_mb, για να μην ξαναπυροδοτεί)
+        self.journal_size_limit_mb = float(v.get("journal_size_limit_mb") or self.checkpoint_wal_mb or 32)
+        self.stats_sec = float(v.get("stats_sec", 10.0))        # πόσο συχνά γράφονται τα counters στο RUN_DIR
+
+    @property
+    def loss_window_sec(self) -> float:
+        """Μέγιστο διάστημα writes που μπορεί να χαθεί σε crash (χωρίς τα in-flight jobs)."""
+        return self.commit_delay_sec
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return f"Storage({self.durability}, sync={self.synchronous}, commit_delay={self.commit_delay_sec}s)"
+
+
+class Pot:
+    __slots__ = (
+        "id", "index", "name", "bus", "device", "channel",
+        "relay_pin", "relay_active_high", "start_pct", "stop_pct", "led_pct",
+        "dry_key", "wet_key", "start_key", "stop_key", "cooldown_key", "ml_key", "led_key",
+        "plan_name",
+    )
+
+    def __init__(self, index: int, d: dict, adcs: list[dict]):
+        self.id = int(d["id"])
+        self.index = index  # θέση στις λίστες raw/pct (snapshot, collector)
+        self.name = str(d.get("name") or f"Γλάστρα {self.id}")
+        adc = adcs[int(d.get("adc", 0))]
+        self.bus = int(adc.get("bus", 0))
+        self.device = int(adc.get("device", 0))
+        self.channel = int(d["channel"])
+        if not 0 <= self.channel < ADC_CHANNELS:
+            raise ValueError(f"pot {self.id}: channel must be 0..{ADC_CHANNELS - 1}")
+        relay = d.get("relay")
+        self.relay_pin = int(relay) if relay is not None else None
+        self.relay_active_high = bool(d.get("relay_active_high", True))
+        self.start_pct = float(d.get("start_pct", 60.0))
+        self.stop_pct = float(d.get("stop_pct", 75.0))
+        self.led_pct = float(d["led_pct"]) if d.get("led_pct") is not None else None
+
+        # settings_history keys (ίδια ονόματα με πριν για τις soil1..3)
+        self.dry_key = f"soil{self.id}_dry"
+        self.wet_key = f"soil{self.id}_wet"
+        self.start_key = f"soil{self.id}_start_pct"
+        self.stop_key = f"soil{self.id}_stop_pct"
+        self.cooldown_key = f"soil{self.id}_cooldown_sec"  # fallback: pump_cooldown_sec
+        self.ml_key = f"soil{self.id}_ml_per_sec"          # fallback: ml_per_sec
+        self.led_key = f"soil{self.id}_led_pct"
+        self.plan_name = f"pot{self.id}"
+
+    def __repr__(self):
+        return f"Pot(id={self.id}, spi={self.bus}.{self.device}, ch={self.channel}, relay={self.relay_pin})"
+
+
+class Config:
+    def __init__(self, d: dict):
+        adcs = list(d.get("adc") or _DEFAULT["adc"])
+        self.dht_pin = int(d.get("dht_pin", _DEFAULT["dht_pin"]))
+        self.led_pin = d.get("led_pin", _DEFAULT["led_pin"])
+        self.storage = Storage(d.get("storage") or {})
+        self.pots = tuple(Pot(i, p, adcs) for i, p in enumerate(d.get("pot") or _DEFAULT["pot"]))
+
+        ids = [p.id for p in self.pots]
+        if len(set(ids)) != len(ids):
+            raise ValueError("duplicate pot id in config")
+        chans = [(p.bus, p.device, p.channel) for p in self.pots]
+        if len(set(chans)) != len(chans):
+            raise ValueError("two pots on the same ADC channel")
+        pins = [p.relay_pin for p in self.pots if p.relay_pin is not None]
+        if len(set(pins)) != len(pins):
+            raise ValueError("two pots on the same relay")
+
+        self.by_id = {p.id: p for p in self.pots}
+        self.pump_pots = tuple(p for p in self.pots if p.relay_pin is not None)
+        self.led_pots = tuple(p for p in self.pots if p.led_pct is not None)
+
+        # acquisition plan: one interleaved read per ADC -> [(bus, device, channels, pot indexes)]
+        groups: dict[tuple[int, int], list[Pot]] = {}
+        for p in self.pots:
+            groups.setdefault((p.bus, p.device), []).append(p)
+        self.adc_groups = tuple(
+            (bus, dev, tuple(p.channel for p in ps), tuple(p.index for p in ps))
+            for (bus, dev), ps in sorted(groups.items())
+        )
+
+        # sensor_readings soil1..3 -> pot index (None αν η γλάστρα δεν υπάρχει)
+        self.legacy_index = tuple(
+            self.by_id[i].index if i in self.by_id else None for i in LEGACY_POTS
+        )
+        # γλάστρες που γράφονται στο pot_readings
+        self.extra_pots = tuple(p for p in self.pots if p.id not in LEGACY_POTS)
+
+
+def load(path: Path = CONFIG_PATH) -> Config:
+    if path.exists():
+        with open(path, "rb") as f:
+            return Config(tomllib.load(f))
+    return Config(_DEFAULT)
+
+
+# Ένα instance ανά process.
+config = load()
@@ -1,16 +1,17 @@
 #!/usr/bin/env python3
-import time
-import sqlite3
-from pathlib import Path
-from gpiozero import OutputDevice
+# usage: python controlled_watering.py [pot_id]   (default: the first pot with a pump in config)
+import sys
 
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "db" / "data.db"
+import hardware
+from config import config
+from db import connection
+from hardware import clock
+from scheduler import PulsePlan, default_scheduler, OK, ERROR
 
-RELAY_PIN = 19
-relay = OutputDevice(RELAY_PIN, active_high=True, initial_value=False)  # OFF
+POT = int(sys.argv[1]) if len(sys.argv) > 1 else config.pump_pots[0].id
+RELAY_PIN = config.by_id[POT].relay_pin
+relay = hardware.output(RELAY_PIN, active_high=config.by_id[POT].relay_active_high, initial_value=False)  # OFF
 
-POT = 2
 ML_PER_SEC = 20.0
 
 # Soft-start pulses (seconds) + pauses (seconds) after each pulse except last
@@ -18,59 +19,55 @@ PULSES = [1.0, 1.0, 1.5, 2.0, 2.0]      # ~20 + 20 + 30 + 40 + 40 = 150ml
 PAUSES = [15, 30, 60, 60]              # pauses between pulses
 
 def log_system(code: str, message: str, level: str = "info"):
-    con = sqlite3.connect(DB_PATH)
-    con.execute(
-        "INSERT INTO system_events(ts, level, code, message) VALUES (?, ?, ?, ?)",
-        (int(time.time()), level, code, message),
-    )
-    con.commit()
-    con.close()
+    with connection() as con:
+        con.execute(
+            "INSERT INTO system_events(ts, level, code, message) VALUES (?, ?, ?, ?)",
+            (int(clock.time()), level, code, message),
+        )
 
-def insert_watering_event(ts_start: int, ts_end: int, duration_s: float, est_ml: float):
-    con = sqlite3.connect(DB_PATH)
-    con.execute(
-        """
-        INSERT INTO watering_events
-        (ts_start, ts_end, duration_s, estimated_ml, trigger_pot, result)
-        VALUES (?, ?, ?, ?, ?, 'ok')
-        """,
-        (ts_start, ts_end, int(round(duration_s)), float(est_ml), POT),
-    )
-    con.commit()
-    con.close()
+def insert_watering_event(ts_start: int, ts_end: int, duration_s: float, est_ml: float,
+                          result: str = "ok", error_msg: str | None = None):
+    with connection() as con:
+        con.execute(
+            """
+            INSERT INTO watering_events
+            (ts_start, ts_end, duration_s, estimated_ml, trigger_pot, result, error_msg)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            (ts_start, ts_end, int(round(duration_s)), float(est_ml), POT, result, error_msg),
+        )
+
+def on_pulse(plan, i, on_s):
+    log_system("pump_pulse_on", f"Pulse {i}/{len(plan.pulses)} ON {on_s:.2f}s (~{on_s*ML_PER_SEC:.1f}ml)")
+
+def on_done(plan):
+    ml = plan.on_sec * ML_PER_SEC
+    insert_watering_event(plan.ts_start, plan.ts_end, plan.on_sec, ml, plan.result, plan.reason)
+    if plan.result == OK:
+        log_system("pump_cycle_end", f"Pump cycle end pot={POT}, total_on={plan.on_sec:.2f}s, est_ml={ml:.1f}")
+    elif plan.result == ERROR:
+        log_system("pump_cycle_error", f"Pump cycle error: {plan.reason}", level="error")
+    else:
+        log_system("pump_cycle_abort", f"Pump cycle aborted: {plan.reason}, total_on={plan.on_sec:.2f}s", level="warn")
 
 def main():
     total_on = sum(PULSES)
     est_ml = total_on * ML_PER_SEC
 
-    ts_start = int(time.time())
+    # same pulse scheduler as the controller (the relay is switched off on every exit path)
+    scheduler = default_scheduler()
+    plan = PulsePlan(f"pot{POT}", relay, PULSES, PAUSES, on_pulse=on_pulse, on_done=on_done)
     log_system("pump_cycle_start", f"Pump cycle start pot={POT}, plan={PULSES}s, est_ml={est_ml:.1f}")
+    scheduler.submit(plan)
 
     try:
-        for i, on_s in enumerate(PULSES, start=1):
-            # pulse on
-            log_system("pump_pulse_on", f"Pulse {i}/{len(PULSES)} ON {on_s:.2f}s (~{on_s*ML_PER_SEC:.1f}ml)")
-            relay.on()
-            time.sleep(on_s)
-            relay.off()
-
-            # pause
-            if i <= len(PAUSES):
-                time.sleep(PAUSES[i-1])
-
-        ts_end = int(time.time())
-        insert_watering_event(ts_start, ts_end, total_on, est_ml)
-        log_system("pump_cycle_end", f"Pump cycle end pot={POT}, total_on={total_on:.2f}s, est_ml={est_ml:.1f}")
-
+        while not plan.finished:
+            clock.sleep(0.5)
     except KeyboardInterrupt:
-        relay.off()
-        log_system("pump_cycle_abort", "Pump cycle aborted by user", level="warn")
-        raise
-    except Exception as e:
-        relay.off()
-        log_system("pump_cycle_error", f"Pump cycle error: {e}", level="error")
+        scheduler.abort(plan.name, "aborted by user")
         raise
     finally:
+        scheduler.stop()
         relay.off()
 
 if __name__ == "__main__":
@@ -1,20 +1,25 @@
 #!/usr/bin/env python3
 import time
-import sqlite3
-from pathlib import Path
-from typing import Optional, Dict, Any
-
-from gpiozero import OutputDevice
-
-BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "db" / "data.db"
-
-# GPIO19 relay, confirmed active_high=True on your setup
-RELAY_PIN = 19
-relay = OutputDevice(RELAY_PIN, active_high=True, initial_value=False)  # OFF
-
-# Only pot 2 is watered by pump
-PUMP_POT = 2
+from typing import Optional, Any
+
+import hardware
+import db
+import metrics
+import tracing
+from config import config
+from hardware import clock
+from notify import Subscription, TOPIC_READINGS, TOPIC_SETTINGS, wait_any
+from runtime import stop_event
+from scheduler import PulsePlan, PulseScheduler, default_scheduler, OK, ERROR
+from settings import settings
+from snapshot import latest_reading
+from writer import start_shared, stop_shared
+
+# Pumps come from config (default: pot 2 on GPIO19, active_high=True on your setup)
+relays = {
+    p.id: hardware.output(p.relay_pin, active_high=p.relay_active_high, initial_value=False)  # OFF, created on first use
+    for p in config.pump_pots
+}
 
 # Pump calibration
 ML_PER_SEC_DEFAULT = 20.0
@@ -28,69 +33,56 @@ START_PCT_DEFAULT = 60.0
 STOP_PCT_DEFAULT = 75.0
 COOLDOWN_SEC_DEFAULT = 3 * 3600  # 3 hours
 
-POLL_SEC = 20  # check DB every 90s
+POLL_SEC = 20  # fallback poll when no notifications arrive
 
-
-def _db_conn():
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    return con
+LOOP_SEC = metrics.histogram("aw_controller_eval_seconds", "One evaluation of all pump rules (without the wait)")
+SETTINGS_SEC = metrics.histogram("aw_controller_settings_seconds", "settings.refresh() + rule reload on change")
+RULES_RELOADS = metrics.counter("aw_controller_rule_reloads_total", "Rules rebuilt after a settings change")
+WAKEUPS_READING = metrics.counter("aw_controller_wakeups_total", "Loop wakeups", reason="reading")
+WAKEUPS_POLL = metrics.counter("aw_controller_wakeups_total", "Loop wakeups", reason="poll")  # timeout/settings/stop
 
 
 def log_system(level: str, code: str, message: str):
-    with _db_conn() as con:
-        con.execute(
-            "INSERT INTO system_events(ts, level, code, message) VALUES (?, ?, ?, ?)",
-            (int(time.time()), level, code, message),
-        )
-        con.commit()
+    # through the shared writer under supervisor.py, own pooled commit otherwise
+    row = (int(clock.time()), level, code, message)
+    db.write(lambda con: con.execute(
+        "INSERT INTO system_events(ts, level, code, message) VALUES (?, ?, ?, ?)", row
+    ))
 
 
 def get_latest_setting(key: str) -> Optional[str]:
-    with _db_conn() as con:
-        row = con.execute(
-            "SELECT value FROM settings_history WHERE key=? ORDER BY ts DESC LIMIT 1",
-            (key,),
-        ).fetchone()
-    return row["value"] if row else None
+    return settings.get(key)
 
 
 def get_float_setting(key: str, default: float) -> float:
-    v = get_latest_setting(key)
-    if v is None:
-        return default
-    try:
-        return float(v)
-    except Exception:
-        return default
+    return settings.get_float(key, default)
 
 
 def get_int_setting(key: str, default: int) -> int:
-    v = get_latest_setting(key)
-    if v is None:
-        return default
-    try:
-        return int(float(v))
-    except Exception:
-        return default
-
-
-def get_latest_pct() -> Optional[Dict[int, Optional[float]]]:
-    with _db_conn() as con:
-        row = con.execute(
-            "SELECT ts, soil1_pct, soil2_pct, soil3_pct FROM sensor_readings ORDER BY ts DESC LIMIT 1"
-        ).fetchone()
-    if not row:
-        return None
-    return {
-        1: row["soil1_pct"],
-        2: row["soil2_pct"],
-        3: row["soil3_pct"],
-        -1: row["ts"],  # stash ts
-    }
+    return settings.get_int(key, default)
+
+
+def load_rules() -> list[tuple]:
+    """
+    (pot, start_pct, stop_pct, cooldown_sec, ml_per_sec) ανά γλάστρα με αντλία.
+    Ξαναφτιάχνεται μόνο όταν αλλάξουν settings (settings.generation), όχι σε κάθε loop.
+    """
+    cooldown = get_int_setting("pump_cooldown_sec", COOLDOWN_SEC_DEFAULT)
+    ml_per_sec = get_float_setting("ml_per_sec", ML_PER_SEC_DEFAULT)
+    return [
+        (
+            p,
+            get_float_setting(p.start_key, p.start_pct),
+            get_float_setting(p.stop_key, p.stop_pct),
+            get_int_setting(p.cooldown_key, cooldown),
+            get_float_setting(p.ml_key, ml_per_sec),
+        )
+        for p in config.pump_pots
+    ]
 
 
 def insert_watering_event(
+    pot: int,
     ts_start: int,
     ts_end: int,
     duration_s: float,
@@ -101,131 +93,210 @@ def insert_watering_event(
     error_code: Optional[str] = None,
     error_msg: Optional[str] = None,
 ):
-    with _db_conn() as con:
-        con.execute(
-            """
-            INSERT INTO watering_events
-            (ts_start, ts_end, duration_s, estimated_ml,
-             trigger_pot, trigger_value_pct, threshold_pct,
-             result, error_code, error_msg)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                ts_start, ts_end, int(round(duration_s)), float(estimated_ml),
-                PUMP_POT, trigger_value_pct, threshold_pct,
-                result, error_code, error_msg
-            ),
-        )
-        con.commit()
-
-
-def pump_cycle(pulses, pauses, ml_per_sec, trigger_pct, start_threshold):
+    row = (
+        ts_start, ts_end, int(round(duration_s)), float(estimated_ml),
+        pot, trigger_value_pct, threshold_pct,
+        result, error_code, error_msg
+    )
+    db.write(lambda con: con.execute(
+        """
+        INSERT INTO watering_events
+        (ts_start, ts_end, duration_s, estimated_ml,
+         trigger_pot, trigger_value_pct, threshold_pct,
+         result, error_code, error_msg)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        row,
+    ))
+
+
+def start_pump_cycle(
+    scheduler: PulseScheduler,
+    pot,
+    pulses,
+    pauses,
+    ml_per_sec,
+    trigger_pct,
+    start_threshold,
+    stop_pct=None,
+    on_end=None,
+) -> Optional[PulsePlan]:
+    """
+    Ξεκινάει κύκλο για τη γλάστρα `pot` (config.Pot) στον scheduler και επιστρέφει
+    αμέσως (None αν τρέχει ήδη). Με stop_pct ο κύκλος σταματάει πριν από το επόμενο
+    pulse μόλις η γλάστρα φτάσει το stop. Το watering event γράφεται στο τέλος με το
+    ON time που δόθηκε πραγματικά.
+    """
     total_on = float(sum(pulses))
     est_ml = total_on * float(ml_per_sec)
 
-    ts_start = int(time.time())
-    log_system(
-        "info",
-        "pump_cycle_start",
-        f"Pump cycle start pot={PUMP_POT}, pulses={pulses}s, pauses={pauses}s, "
-        f"trigger_pct={trigger_pct}, start_th={start_threshold}, est_ml={est_ml:.1f}",
-    )
-
-    try:
-        for i, on_s in enumerate(pulses, start=1):
-            log_system("info", "pump_pulse_on", f"Pulse {i}/{len(pulses)} ON {on_s:.2f}s (~{on_s*ml_per_sec:.1f}ml)")
-            relay.on()
-            time.sleep(float(on_s))
-            relay.off()
-
-            if i <= len(pauses):
-                time.sleep(float(pauses[i - 1]))
+    def stop_check():
+        latest = latest_reading()
+        pcts = latest["pct"] if latest else ()
+        v = pcts[pot.index] if pot.index < len(pcts) else None
+        return stop_pct is not None and v is not None and v >= stop_pct
 
-        ts_end = int(time.time())
-        insert_watering_event(
-            ts_start=ts_start,
-            ts_end=ts_end,
-            duration_s=total_on,
-            estimated_ml=est_ml,
-            trigger_value_pct=trigger_pct,
-            threshold_pct=start_threshold,
-            result="ok",
-        )
-        log_system("info", "pump_cycle_end", f"Pump cycle end pot={PUMP_POT}, total_on={total_on:.2f}s, est_ml={est_ml:.1f}")
+    def on_pulse(plan, i, on_s):
+        log_system("info", "pump_pulse_on", f"Pot {pot.id} pulse {i}/{len(plan.pulses)} ON {on_s:.2f}s (~{on_s*ml_per_sec:.1f}ml)")
 
-    except Exception as e:
-        relay.off()
-        ts_end = int(time.time())
+    def on_done(plan):
+        ml = plan.on_sec * float(ml_per_sec)
+        metrics.counter("aw_pump_cycles_total", "Finished pump cycles", pot=pot.id, result=plan.result).inc()
+        metrics.counter("aw_pump_on_seconds_total", "Relay ON time", pot=pot.id).inc(plan.on_sec)
         insert_watering_event(
-            ts_start=ts_start,
-            ts_end=ts_end,
-            duration_s=total_on,
-            estimated_ml=est_ml,
+            pot=pot.id,
+            ts_start=plan.ts_start,
+            ts_end=plan.ts_end,
+            duration_s=plan.on_sec,
+            estimated_ml=ml,
             trigger_value_pct=trigger_pct,
             threshold_pct=start_threshold,
-            result="error",
-            error_code="exception",
-            error_msg=str(e),
+            result=plan.result,
+            error_code="exception" if plan.result == ERROR else None,
+            error_msg=plan.reason,
         )
-        log_system("error", "pump_cycle_error", f"Pump cycle error: {e}")
-        raise
-    finally:
-        relay.off()
-
-
-def main():
-    relay.off()
-
+        if plan.result == ERROR:
+            log_system("error", "pump_cycle_error", f"Pump cycle error pot={pot.id}: {plan.reason}")
+        else:
+            what = "end" if plan.result == OK else f"aborted ({plan.reason})"
+            log_system("info", "pump_cycle_end", f"Pump cycle {what} pot={pot.id}, total_on={plan.on_sec:.2f}s, est_ml={ml:.1f}")
+        if on_end is not None:
+            on_end(plan)
+
+    plan = PulsePlan(
+        pot.plan_name, relays[pot.id], pulses, pauses,
+        stop_check=stop_check, on_pulse=on_pulse, on_done=on_done,
+    )
+    if scheduler.active(pot.plan_name) is not None:
+        return None
     log_system(
         "info",
-        "controller_start",
-        f"Controller started. Pump pot={PUMP_POT}. Settings keys: soil2_start_pct, soil2_stop_pct, pump_cooldown_sec, ml_per_sec",
-
+        "pump_cycle_start",
+        f"Pump cycle start pot={pot.id}, pulses={pulses}s, pauses={pauses}s, "
+        f"trigger_pct={trigger_pct}, start_th={start_threshold}, est_ml={est_ml:.1f}",
     )
+    return plan if scheduler.submit(plan) else None
 
-    last_cycle_end = 0.0
-
-    while True:
-        # Load settings live (no restart needed)
-        start_pct = get_float_setting("soil2_start_pct", START_PCT_DEFAULT)
-        stop_pct = get_float_setting("soil2_stop_pct", STOP_PCT_DEFAULT)
-        cooldown_sec = get_int_setting("pump_cooldown_sec", COOLDOWN_SEC_DEFAULT)
-        ml_per_sec = get_float_setting("ml_per_sec", ML_PER_SEC_DEFAULT)
-
-        # (optional) pulses/pauses could also be loaded from DB later; keep stable for now
-        pulses = PULSES_DEFAULT
-        pauses = PAUSES_DEFAULT
 
-        latest = get_latest_pct()
-        if not latest:
-            time.sleep(POLL_SEC)
-            continue
+def wait_for_reading(sub: Subscription, settings_sub: Subscription, timeout: float, stop=None) -> bool:
+    """
+    Block έως `timeout` (clock seconds) στα notify sockets: True σε νέα μέτρηση,
+    False σε timeout, αλλαγή settings (settings.notify_changed) ή stop
+    (ξυπνάει μέσω settings_sub.interrupt()). Κανένα ενδιάμεσο wakeup ή query.
+    """
+    if stop is not None and stop.is_set():
+        return False
+    woke = wait_any((sub, settings_sub), clock.real_seconds(timeout))
+    return sub in woke
 
-        v = latest.get(PUMP_POT)
-        if v is None:
-            time.sleep(POLL_SEC)
-            continue
 
-        now = time.time()
+def run(stop=None):
+    """Control loop μέχρι να γίνει set το `stop` (threading.Event, None = για πάντα)."""
+    for r in relays.values():
+        r.off()
 
-        # Cooldown safety
-        if last_cycle_end and (now - last_cycle_end) < cooldown_sec:
-            time.sleep(POLL_SEC)
-            continue
+    pump_ids = ", ".join(str(p.id) for p in config.pump_pots) or "none"
+    log_system(
+        "info",
+        "controller_start",
+        f"Controller started. Pump pots={pump_ids}. Settings keys: soilN_start_pct, soilN_stop_pct, "
+        f"soilN_cooldown_sec / pump_cooldown_sec, soilN_ml_per_sec / ml_per_sec",
+    )
 
-        # Skip if already wet enough
-        if v >= stop_pct:
-            time.sleep(POLL_SEC)
-            continue
+    # every new reading from the collector wakes us immediately (notify.py);
+    # POLL_SEC stays as the fallback when the collector/notifier is not running
+    sub = Subscription(TOPIC_READINGS)
+    settings_sub = Subscription(TOPIC_SETTINGS)
+    # stop.set() wakes the notify wait (runtime.StopEvent); a plain Event ends it at the timeout
+    add_stop_callback = getattr(stop, "add_callback", None)
+    if add_stop_callback is not None:
+        add_stop_callback(settings_sub.interrupt)
+    # pump cycles run in the pulse scheduler, this loop keeps evaluating while they do
+    scheduler = default_scheduler()
+    last_cycle_end: dict[int, float] = {}
+
+    def on_cycle_end(plan):
+        last_cycle_end[plan.name] = clock.time()
+
+    # Load settings live (no restart needed): thresholds are rebuilt only when
+    # settings_history changes; wait_for_reading() wakes early on edits
+    rules = load_rules()
+    rules_gen = settings.generation
+
+    # (optional) pulses/pauses could also be loaded from DB later; keep stable for now
+    pulses = PULSES_DEFAULT
+    pauses = PAUSES_DEFAULT
 
-        # Trigger condition
-        if v <= start_pct:
-            log_system("info", "pump_trigger", f"Trigger: soil{PUMP_POT}_pct={v:.2f} <= {start_pct} (stop={stop_pct}, cooldown={cooldown_sec}s)")
+    try:
+        while stop is None or not stop.is_set():
+            t0 = time.perf_counter()
+            settings.refresh()
+            if settings.generation != rules_gen:
+                rules = load_rules()
+                rules_gen = settings.generation
+                RULES_RELOADS.inc()
+            t1 = time.perf_counter()
+            SETTINGS_SEC.observe(t1 - t0)
+            t_eval = tracing.start()
+
+            latest = latest_reading()
+            pcts = latest["pct"] if latest else ()
+            now = clock.time()
+
+            for pot, start_pct, stop_pct, cooldown_sec, ml_per_sec in rules:
+                v = pcts[pot.index] if pot.index < len(pcts) else None
+                last_end = last_cycle_end.get(pot.plan_name)
+
+                if v is None:
+                    continue
+                # Cycle running: cut it short (mid-pulse too) once the pot is wet enough
+                if scheduler.active(pot.plan_name) is not None:
+                    if v >= stop_pct:
+                        scheduler.abort(pot.plan_name, f"soil{pot.id}_pct={v:.2f} >= stop={stop_pct}")
+                    continue
+                # Cooldown safety
+                if last_end and (now - last_end) < cooldown_sec:
+                    continue
+                # Skip if already wet enough
+                if v >= stop_pct:
+                    continue
+                # Trigger condition
+                if v <= start_pct:
+                    log_system("info", "pump_trigger", f"Trigger: soil{pot.id}_pct={v:.2f} <= {start_pct} (stop={stop_pct}, cooldown={cooldown_sec}s)")
+
+                    start_pump_cycle(
+                        scheduler, pot, pulses, pauses, ml_per_sec,
+                        trigger_pct=float(v), start_threshold=float(start_pct),
+                        stop_pct=float(stop_pct), on_end=on_cycle_end,
+                    )
+
+            LOOP_SEC.observe(time.perf_counter() - t1)
+            tracing.finish("controller.eval", t_eval, rules=len(rules))
+            if wait_for_reading(sub, settings_sub, POLL_SEC, stop):
+                WAKEUPS_READING.inc()
+            else:
+                WAKEUPS_POLL.inc()
+    finally:
+        for p in config.pump_pots:
+            scheduler.abort(p.plan_name, "controller stopped")
+        for r in relays.values():
+            r.off()
+        if add_stop_callback is not None:
+            stop.remove_callback(settings_sub.interrupt)
+        sub.close()
+        settings_sub.close()
 
-            pump_cycle(pulses, pauses, ml_per_sec, trigger_pct=float(v), start_threshold=float(start_pct))
-            last_cycle_end = time.time()
 
-        time.sleep(POLL_SEC)
+def main():
+    metrics.start_exporter("controller")
+    tracing.setup("controller")  # no-op unless AUTO_WATERING_TRACE is set
+    writer = start_shared("controller-writer")  # group commit per durability mode
+    try:
+        run(stop_event())  # SIGTERM -> final commit of the open group
+    finally:
+        tracing.flush()
+        stop_shared(writer)
+        metrics.flush()
 
 
 if __name__ == "__main__":
@@ -1,36 +1,302 @@
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+from config import config
+
 BASE_DIR = Path(__file__).resolve().parent
 
-DB_PATH = BASE_DIR / "db" / "data.db"
+DB_PATH = Path(os.environ.get("AUTO_WATERING_DB") or BASE_DIR / "db" / "data.db")  # π.χ. ξεχωριστή βάση για sim/bench
 SCHEMA_PATH = BASE_DIR / "db" / "schema.sql"
 
+# Ονομαστικό sampling interval του collector (για επιλογή resolution tier).
+RAW_SAMPLE_SEC = 15
+
+# Rollup tiers: (resolution, table, bucket seconds), από το πιο λεπτό στο πιο χοντρό.
+ROLLUP_TIERS = (
+    ("minute", "sensor_rollup_minute", 60),
+    ("hour", "sensor_rollup_hour", 3600),
+    ("day", "sensor_rollup_day", 86400),
+)
+RESOLUTIONS = ("raw",) + tuple(t[0] for t in ROLLUP_TIERS)
+
+# Στήλες του sensor_readings που κρατάμε σε min/max/avg.
+ROLLUP_COLUMNS = (
+    "soil1_raw", "soil2_raw", "soil3_raw",
+    "soil1_pct", "soil2_pct", "soil3_pct",
+    "temp_c", "hum_pct",
+)
+
+# Compact readings layout (db/schema.sql): pct/temp/hum αποθηκεύονται ως INTEGER x FIXED_SCALE.
+FIXED_SCALE = 100
+
+# sensor_readings στήλη -> expression πάνω στο readings (ίδια keys με το παλιό layout)
+READING_EXPRS = {
+    "soil1_raw": "s1_raw",
+    "soil2_raw": "s2_raw",
+    "soil3_raw": "s3_raw",
+    "soil1_pct": f"s1_pct / {FIXED_SCALE:.1f}",
+    "soil2_pct": f"s2_pct / {FIXED_SCALE:.1f}",
+    "soil3_pct": f"s3_pct / {FIXED_SCALE:.1f}",
+    "temp_c": f"temp / {FIXED_SCALE:.1f}",
+    "hum_pct": f"hum / {FIXED_SCALE:.1f}",
+}
+READING_COLUMNS_SQL = ", ".join(f"{e} AS {c}" for c, e in READING_EXPRS.items())
+
+LEGACY_READINGS_TABLE = "sensor_readings_legacy"
+MIGRATE_CHUNK_SEC = 7 * 86400
+
+# Πίνακες που στέλνει ο shipper.py στον aggregator.py: name -> (cursor column, columns).
+# Ο cursor αυξάνεται μονότονα ανά commit (ts των μετρήσεων, AUTOINCREMENT id των events);
+# στο pot_readings δεν είναι μοναδικός (ένα row ανά γλάστρα στο ίδιο ts).
+INGEST_TABLES = {
+    "readings": ("ts", ("ts", "s1_raw", "s2_raw", "s3_raw", "s1_pct", "s2_pct", "s3_pct", "temp", "hum", "flags")),
+    "reading_extras": ("ts", ("ts", "vin_v", "notes")),
+    "pot_readings": ("ts", ("ts", "pot", "raw", "pct")),
+    "watering_events": ("id", (
+        "id", "ts_start", "ts_end", "duration_s", "estimated_ml", "trigger_pot",
+        "trigger_value_raw", "trigger_value_pct", "threshold_pct", "result", "error_code", "error_msg",
+    )),
+    "system_events": ("id", ("id", "ts", "level", "code", "message")),
+}
 
-def get_conn():
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+HISTORY_MAX_HOURS = 366 * 24  # με rollups δεν χρειάζεται πια το clamp των 7 ημερών
+
+
+# PRAGMAs που εφαρμόζονται σε κάθε νέα connection.
+# synchronous/wal_autocheckpoint/journal_size_limit έρχονται από το durability mode (config [storage]);
+# synchronous=NORMAL είναι ασφαλές σε WAL (χάνονται μόνο τα τελευταία commits σε power loss).
+STORAGE = config.storage
+CONN_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    f"PRAGMA synchronous={STORAGE.synchronous}",
+    f"PRAGMA wal_autocheckpoint={STORAGE.wal_autocheckpoint}",
+    f"PRAGMA journal_size_limit={int(STORAGE.journal_size_limit_mb * 1024 * 1024)}",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=67108864",  # 64MB
+    "PRAGMA cache_size=-8000",    # ~8MB
+    "PRAGMA temp_store=MEMORY",
+)
+VACUUM_STEP_PAGES = 256  # pages ανά incremental_vacuum βήμα (~1MB με 4K pages)
+STATEMENT_CACHE_SIZE = 128  # prepared statements ανά connection (sqlite3 cached_statements)
+POOL_MAX_IDLE = 4
+
+_pool: dict[str, list[sqlite3.Connection]] = {}
+_pool_lock = threading.Lock()
+
+
+def get_conn(path: Path | None = None):
+    """
+    Νέα dedicated connection με τα CONN_PRAGMAS (στο DB_PATH, ή στο `path`, π.χ. partitions του aggregator).
+    Για long-lived owners (collector, watchers) που την κρατάνε και την κλείνουν οι ίδιοι.
+    Για σύντομες εργασίες προτίμησε το connection() (pooled).
+    """
+    path = DB_PATH if path is None else Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(
+        path,
+        timeout=5.0,
+        check_same_thread=False,  # pooled connections αλλάζουν thread (ποτέ ταυτόχρονα)
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     con.row_factory = sqlite3.Row
+    for pragma in CONN_PRAGMAS:
+        con.execute(pragma)
     return con
 
 
-def init_db():
-    """Δημιουργεί πίνακες/indices αν δεν υπάρχουν, εκτελώντας το db/schema.sql."""
+@contextmanager
+def connection():
+    """
+    Pooled connection: with connection() as con: ...
+    Commit στο τέλος (rollback σε exception) και επιστροφή στο pool, οπότε τα
+    prepared statements και το page cache μένουν ζεστά ανάμεσα στις κλήσεις.
+    """
+    key = str(DB_PATH)
+    with _pool_lock:
+        idle = _pool.get(key)
+        con = idle.pop() if idle else None
+    if con is None:
+        con = get_conn()
+
+    try:
+        with con:
+            yield con
+    finally:
+        if con.in_transaction:
+            con.close()
+        else:
+            with _pool_lock:
+                idle = _pool.setdefault(key, [])
+                if len(idle) < POOL_MAX_IDLE:
+                    idle.append(con)
+                    con = None
+            if con is not None:
+                con.close()
+
+
+def close_pool():
+    """Κλείνει όλες τις idle pooled connections (π.χ. πριν από VACUUM ή σε shutdown)."""
+    with _pool_lock:
+        conns = [c for idle in _pool.values() for c in idle]
+        _pool.clear()
+    for con in conns:
+        con.close()
+
+
+# shared writer (writer.DbWriter) όταν οι daemons τρέχουν μαζί στο supervisor.py
+_writer = None
+
+
+def set_writer(writer):
+    """Ορίζει (ή με None αφαιρεί) τον shared writer του process."""
+    global _writer
+    _writer = writer
+
+
+def get_writer():
+    return _writer
+
+
+def write(fn):
+    """
+    fn(con): μέσω του shared writer (async, group commit) αν υπάρχει,
+    αλλιώς αμέσως σε pooled connection με δικό της commit.
+    """
+    writer = _writer
+    if writer is not None:
+        writer.submit(fn)
+        return
+    with connection() as con:
+        fn(con)
+
+
+def init_db(verbose: bool = False):
+    """
+    Δημιουργεί πίνακες/indices αν δεν υπάρχουν, εκτελώντας το db/schema.sql.
+    Βάσεις με το παλιό sensor_readings table μεταφέρονται αυτόματα στο compact layout.
+    """
     if not SCHEMA_PATH.exists():
         raise FileNotFoundError(f"Missing schema file: {SCHEMA_PATH}")
     schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
 
-    with get_conn() as con:
+    with connection() as con:
+        # παλιό layout: το sensor_readings είναι ακόμα table -> rename, το schema φτιάχνει το VIEW
+        kind = con.execute("SELECT type FROM sqlite_master WHERE name = 'sensor_readings'").fetchone()
+        if kind and kind[0] == "table":
+            con.execute(f"ALTER TABLE sensor_readings RENAME TO {LEGACY_READINGS_TABLE}")
+            con.commit()
+
         con.executescript(schema_sql)
         con.commit()
 
+        if _table_exists(con, LEGACY_READINGS_TABLE):
+            migrate_legacy_readings(con, verbose=verbose)
+
+        # one-time backfill για βάσεις που είχαν μετρήσεις πριν τα rollups
+        has_rollups = con.execute("SELECT 1 FROM sensor_rollup_minute LIMIT 1").fetchone()
+        has_readings = con.execute("SELECT 1 FROM readings LIMIT 1").fetchone()
+        if has_readings and not has_rollups:
+            rebuild_rollups(con)
+
+
+def _table_exists(con, name: str) -> bool:
+    return con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def migrate_legacy_readings(con, chunk_sec: int = MIGRATE_CHUNK_SEC, verbose: bool = False) -> int:
+    """
+    Αντιγράφει το παλιό sensor_readings (μετονομασμένο σε sensor_readings_legacy) στο
+    compact readings/reading_extras, με commit ανά chunk. Idempotent (INSERT OR REPLACE),
+    οπότε αν διακοπεί συνεχίζει στο επόμενο init_db. Στο τέλος σβήνει τον παλιό πίνακα.
+    Το readings έχει key το ts: από rows με ίδιο ts κρατιέται το τελευταίο (max id) και
+    τα υπόλοιπα μετριούνται και αναφέρονται. Επιστρέφει πόσα rows γράφτηκαν στο readings.
+    """
+    lo, hi = con.execute(f"SELECT MIN(ts), MAX(ts) FROM {LEGACY_READINGS_TABLE}").fetchone()
+    total = dups = 0
+    if lo is not None:
+        def fx(col):
+            return f"CAST(ROUND({col} * {FIXED_SCALE}) AS INTEGER)"
+
+        copy_sql = f"""
+            INSERT OR REPLACE INTO readings (ts, s1_raw, s2_raw, s3_raw, s1_pct, s2_pct, s3_pct, temp, hum, flags)
+            SELECT ts, soil1_raw, soil2_raw, soil3_raw,
+                   {fx("soil1_pct")}, {fx("soil2_pct")}, {fx("soil3_pct")},
+                   {fx("temp_c")}, {fx("hum_pct")}, COALESCE(flags, 0)
+            FROM {LEGACY_READINGS_TABLE}
+            WHERE ts >= ? AND ts < ?
+            ORDER BY id ASC  -- duplicate ts: the latest row replaces the earlier ones
+        """
+        count_sql = f"SELECT COUNT(*), COUNT(DISTINCT ts) FROM {LEGACY_READINGS_TABLE} WHERE ts >= ? AND ts < ?"
+        extras_sql = f"""
+            INSERT OR REPLACE INTO reading_extras (ts, vin_v, notes)
+            SELECT ts, vin_v, notes FROM {LEGACY_READINGS_TABLE}
+            WHERE ts >= ? AND ts < ? AND (vin_v IS NOT NULL OR notes IS NOT NULL)
+            ORDER BY id ASC
+        """
+        start = lo
+        while start <= hi:
+            end = start + chunk_sec
+            n, distinct = con.execute(count_sql, (start, end)).fetchone()
+            con.execute(copy_sql, (start, end))
+            total += distinct
+            dups += n - distinct
+            con.execute(extras_sql, (start, end))
+            con.commit()
+            if verbose:
+                print(f"[migrate] {total} rows (up to ts={min(end, hi + 1)})")
+            start = end
+    if dups:
+        print(f"[migrate] {dups} legacy rows shared a ts with a newer row and were collapsed (kept the latest id)")
+
+    con.execute(f"DROP TABLE {LEGACY_READINGS_TABLE}")
+    con.commit()
+    incremental_vacuum(con)
+    return total
+
+
+def ensure_incremental_vacuum(con) -> bool:
+    """Μετατροπή σε auto_vacuum=INCREMENTAL (one-time full VACUUM). True αν έγινε μετατροπή."""
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    print("[db] converting database to auto_vacuum=INCREMENTAL (one-time VACUUM)...")
+    con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    con.execute("VACUUM")
+    return True
+
+
+def incremental_vacuum(con, step_pages: int = VACUUM_STEP_PAGES, pause_sec: float = 0.05):
+    """
+    Επιστρέφει τις ελεύθερες σελίδες σε μικρά βήματα (σύντομα write locks αντί για full VACUUM).
+    Χωρίς auto_vacuum=INCREMENTAL δεν κάνει τίποτα (οι σελίδες ξαναχρησιμοποιούνται από νέα rows)·
+    για να μικρύνει και το αρχείο κάλεσε πρώτα το ensure_incremental_vacuum.
+    """
+    if con.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return
+    while con.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+        con.execute(f"PRAGMA incremental_vacuum({int(step_pages)})").fetchall()
+        con.commit()
+        time.sleep(pause_sec)
+
 
 def clear_sensor_readings():
     """Εκκαθάριση μετρήσεων (κρατάει τα υπόλοιπα tables)."""
-    with get_conn() as con:
-        con.execute("DELETE FROM sensor_readings;")
-        con.execute("VACUUM;")
+    with connection() as con:
+        con.execute("DELETE FROM readings;")
+        con.execute("DELETE FROM reading_extras;")
+        con.execute("DELETE FROM pot_readings;")
+        for _, table, _ in ROLLUP_TIERS:
+            con.execute(f"DELETE FROM {table};")
         con.commit()
+        # on an auto_vacuum=NONE database the incremental pass is a no-op: convert first
+        # (the VACUUM is cheap here, the readings are gone)
+        if not ensure_incremental_vacuum(con):
+            incremental_vacuum(con)
 
 
 def insert_sensor_reading(
@@ -47,28 +313,18 @@ def insert_sensor_reading(
     flags: int = 0,
     notes: str | None = None,
 ):
-    with get_conn() as con:
-        con.execute(
-            """
-            INSERT INTO sensor_readings
-            (ts, soil1_raw, soil2_raw, soil3_raw,
-             soil1_pct, soil2_pct, soil3_pct,
-             temp_c, hum_pct,
-             vin_v, flags, notes)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                ts, soil1_raw, soil2_raw, soil3_raw,
-                soil1_pct, soil2_pct, soil3_pct,
-                temp_c, hum_pct,
-                vin_v, flags, notes
-            )
-        )
+    with connection() as con:
+        insert_sensor_readings_batch(con, [(
+            ts, soil1_raw, soil2_raw, soil3_raw,
+            soil1_pct, soil2_pct, soil3_pct,
+            temp_c, hum_pct,
+            vin_v, flags, notes
+        )])
         con.commit()
 
 def insert_sensor_readings_batch(con, rows: list[tuple]):
     """
-    Batch insert για sensor_readings.
+    Batch insert μετρήσεων (compact readings + reading_extras για vin_v/notes).
     Συμβατό με collector.py: insert_sensor_readings_batch(con, buffer)
     όπου buffer είναι list[tuple] με σειρά:
       (ts,
@@ -76,84 +332,278 @@ def insert_sensor_readings_batch(con, rows: list[tuple]):
        soil1_pct, soil2_pct, soil3_pct,
        temp_c, hum_pct,
        vin_v, flags, notes)
+    Ενημερώνει και τα rollups για το εύρος του batch (στο ίδιο transaction).
     """
     if not rows:
         return
 
     con.executemany(
         """
-        INSERT INTO sensor_readings
-        (ts, soil1_raw, soil2_raw, soil3_raw,
-         soil1_pct, soil2_pct, soil3_pct,
-         temp_c, hum_pct,
-         vin_v, flags, notes)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT OR REPLACE INTO readings
+        (ts, s1_raw, s2_raw, s3_raw,
+         s1_pct, s2_pct, s3_pct,
+         temp, hum, flags)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
-        rows
+        [
+            (r[0], r[1], r[2], r[3],
+             to_fixed(r[4]), to_fixed(r[5]), to_fixed(r[6]),
+             to_fixed(r[7]), to_fixed(r[8]), r[10] or 0)
+            for r in rows
+        ]
+    )
+    extras = [(r[0], r[9], r[11]) for r in rows if r[9] is not None or r[11] is not None]
+    if extras:
+        con.executemany("INSERT OR REPLACE INTO reading_extras (ts, vin_v, notes) VALUES (?, ?, ?)", extras)
+    ts_values = [r[0] for r in rows]
+    update_rollups(con, min(ts_values), max(ts_values))
+
+
+def to_fixed(v: float | None) -> int | None:
+    """float -> fixed-point INTEGER του compact layout (x FIXED_SCALE)."""
+    return None if v is None else int(round(v * FIXED_SCALE))
+
+
+def insert_pot_readings_batch(con, rows: list[tuple]):
+    """Batch insert για pot_readings (γλάστρες πέρα από τις soil1..3): rows (ts, pot, raw, pct)."""
+    if not rows:
+        return
+    con.executemany(
+        "INSERT OR REPLACE INTO pot_readings (ts, pot, raw, pct) VALUES (?, ?, ?, ?)",
+        [(ts, pot, raw, to_fixed(pct)) for ts, pot, raw, pct in rows],
+    )
+
+
+def _rollup_select_from_raw(bucket_sec: int) -> str:
+    aggs = ",\n".join(
+        f"MIN({READING_EXPRS[c]}), MAX({READING_EXPRS[c]}), AVG({READING_EXPRS[c]})" for c in ROLLUP_COLUMNS
     )
+    return f"""
+        SELECT (ts / {bucket_sec}) * {bucket_sec} AS b, COUNT(*),
+        {aggs}
+        FROM readings
+        WHERE ts >= ? AND ts < ?
+        GROUP BY b
+    """
+
+
+def _rollup_select_from_tier(src_table: str, bucket_sec: int) -> str:
+    # time-weighted avg: κάθε υπο-bucket καλύπτει τον ίδιο χρόνο, άρα ίσο βάρος (όχι n:
+    # με adaptive sampling ένα πότισμα στα 2s θα είχε πολλαπλάσια rows από μια flat ώρα)
+    aggs = ",\n".join(
+        f"MIN({c}_min), MAX({c}_max), AVG({c}_avg)"
+        for c in ROLLUP_COLUMNS
+    )
+    return f"""
+        SELECT (bucket_ts / {bucket_sec}) * {bucket_sec} AS b, SUM(n),
+        {aggs}
+        FROM {src_table}
+        WHERE bucket_ts >= ? AND bucket_ts < ?
+        GROUP BY b
+    """
+
+
+def _rollup_insert(table: str) -> str:
+    cols = ", ".join(f"{c}_min, {c}_max, {c}_avg" for c in ROLLUP_COLUMNS)
+    return f"INSERT OR REPLACE INTO {table} (bucket_ts, n, {cols})"
+
+
+def update_rollups(con, ts_from: int, ts_to: int):
+    """
+    Ξαναϋπολογίζει τα buckets όλων των tiers που καλύπτουν το [ts_from, ts_to].
+    minute από raw rows, hour από minute, day από hour, οπότε κάθε flush
+    αγγίζει μόνο λίγα rows ανά tier. Δεν κάνει commit (το κάνει ο caller).
+    """
+    src = None
+    for _, table, sec in ROLLUP_TIERS:
+        lo = (ts_from // sec) * sec
+        hi = (ts_to // sec) * sec + sec
+        if src is None:
+            select = _rollup_select_from_raw(sec)
+        else:
+            select = _rollup_select_from_tier(src, sec)
+        con.execute(_rollup_insert(table) + select, (lo, hi))
+        src = table
+
+
+def rebuild_rollups(con, ts_from: int | None = None, ts_to: int | None = None, chunk_sec: int = 86400):
+    """
+    Πλήρης ανακατασκευή rollups (π.χ. μετά από backfill ή σε παλιά βάση).
+    Δουλεύει ανά ημέρα με commit ανά chunk για να μην κρατάει write lock πολύ ώρα.
+    """
+    if ts_from is None or ts_to is None:
+        row = con.execute("SELECT MIN(ts), MAX(ts) FROM readings").fetchone()
+        if row[0] is None:
+            return
+        ts_from = row[0] if ts_from is None else ts_from
+        ts_to = row[1] if ts_to is None else ts_to
+
+    start = (ts_from // chunk_sec) * chunk_sec
+    while start <= ts_to:
+        end = min(start + chunk_sec - 1, ts_to)
+        update_rollups(con, start, end)
+        con.commit()
+        start += chunk_sec
+
+
+def mark_resend(con, table: str, lo: int, hi: int):
+    """
+    Rows του [lo, hi] (cursor column του INGEST_TABLES) άλλαξαν επί τόπου: ο shipper.py
+    θα τα ξαναστείλει στον aggregator. Δεν κάνει commit (το κάνει ο caller).
+    """
+    if table not in INGEST_TABLES:
+        raise ValueError(f"not a shipped table: {table}")
+    con.execute("INSERT INTO ship_resend(tbl, lo, hi) VALUES (?, ?, ?)", (table, lo, hi))
 
 
+def pick_resolution(window_sec: int, max_rows: int, raw_rows: int | None = None) -> str:
+    """
+    Το πιο λεπτό tier που χωράει το παράθυρο σε max_rows σημεία.
+    raw_rows: πραγματικό πλήθος raw rows στο παράθυρο (το sampling είναι adaptive,
+    το RAW_SAMPLE_SEC είναι μόνο εκτίμηση).
+    """
+    if window_sec / RAW_SAMPLE_SEC <= max_rows and (raw_rows is None or raw_rows <= max_rows):
+        return "raw"
+    for name, _, sec in ROLLUP_TIERS:
+        if window_sec / sec <= max_rows:
+            return name
+    return ROLLUP_TIERS[-1][0]
 
 
-def fetch_history(hours: int = 24, limit: int = 5000):
+def fetch_history(
+    hours: int = 24,
+    limit: int = 5000,
+    resolution: str | None = None,
+    since: int | None = None,
+    now: int | None = None,
+):
     """
     Φέρνει μετρήσεις από τις τελευταίες `hours` ώρες.
     limit: safety για να μην τραβάμε άπειρα rows.
+    resolution: "raw" / "minute" / "hour" / "day" ή None (auto, βάσει limit).
+    since: incremental cursor (ts). Για raw φέρνει μόνο ts > since, για rollups
+      ξαναστέλνει και το bucket που περιέχει το since (μπορεί να έχει αλλάξει).
+    now: τέλος του παραθύρου (default: τώρα)· το history_cache δίνει aligned τιμή.
+    Τα rollup rows έχουν τα ίδια keys με τα raw (ts = αρχή bucket, τιμές = avg).
+    Επιστρέφει (resolution, rows).
     """
-    hours = max(1, min(hours, 7 * 24))  # clamp 1h..7days
+    hours = max(1, min(hours, HISTORY_MAX_HOURS))
     limit = max(100, min(limit, 20000))
+    window_sec = hours * 3600
 
-    with get_conn() as con:
-        rows = con.execute(
-            """
-            SELECT ts, soil1_raw, soil2_raw, soil3_raw,
-                   soil1_pct, soil2_pct, soil3_pct,
-                   temp_c, hum_pct
-            FROM sensor_readings
-            WHERE ts >= (strftime('%s','now') - ?)
-            ORDER BY ts ASC
+    now = int(time.time()) if now is None else int(now)
+    start = now - window_sec
+
+    if resolution not in RESOLUTIONS:
+        resolution = pick_resolution(window_sec, limit)
+        if resolution == "raw":
+            # bounded count (index range, at most limit+1 rows): 2s sampling may not fit
+            with connection() as con:
+                n = con.execute(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM readings WHERE ts >= ? LIMIT ?)", (start, limit + 1)
+                ).fetchone()[0]
+            resolution = pick_resolution(window_sec, limit, n)
+
+    if resolution == "raw":
+        # newest `limit` rows (a truncated window must drop the oldest, not the latest readings)
+        q = f"""
+            SELECT * FROM (
+                SELECT ts, {READING_COLUMNS_SQL}
+                FROM readings
+                WHERE ts >= ?
+                ORDER BY ts DESC
+                LIMIT ?
+            ) ORDER BY ts ASC
+        """
+        if since is not None:
+            start = max(start, since + 1)
+
+        with connection() as con:
+            rows = con.execute(q, (start, limit)).fetchall()
+            oldest_live = con.execute("SELECT MIN(ts) FROM readings").fetchone()[0]
+
+        # το παλιότερο κομμάτι του παραθύρου μπορεί να έχει μεταφερθεί στο archive (archive.py)
+        if oldest_live is None or start < oldest_live:
+            from archive import read_archived  # lazy: archive imports db
+            end = oldest_live if oldest_live is not None else now + 1
+            archived = read_archived(start, end, limit)
+            if archived:
+                rows = (archived + rows)[-limit:]
+
+        return resolution, rows
+
+    else:
+        table, sec = next((t, s) for n, t, s in ROLLUP_TIERS if n == resolution)
+        q = f"""
+            SELECT bucket_ts AS ts,
+                   CAST(ROUND(soil1_raw_avg) AS INTEGER) AS soil1_raw,
+                   CAST(ROUND(soil2_raw_avg) AS INTEGER) AS soil2_raw,
+                   CAST(ROUND(soil3_raw_avg) AS INTEGER) AS soil3_raw,
+                   soil1_pct_avg AS soil1_pct,
+                   soil2_pct_avg AS soil2_pct,
+                   soil3_pct_avg AS soil3_pct,
+                   temp_c_avg AS temp_c,
+                   hum_pct_avg AS hum_pct
+            FROM {table}
+            WHERE bucket_ts >= ?
+            ORDER BY bucket_ts ASC
             LIMIT ?
-            """,
-            (hours * 3600, limit)
-        ).fetchall()
+        """
+        if since is not None:
+            start = max(start, since)
+        start = (start // sec) * sec
 
-    return rows
+    with connection() as con:
+        rows = con.execute(q, (start, limit)).fetchall()
+
+    return resolution, rows
 
 
-def fetch_watering_events(hours: int = 24, limit: int = 2000):
-    """Φέρνει watering cycles (ποτίσματα) από watering_events."""
-    hours = max(1, min(hours, 7 * 24))
+def fetch_watering_events(hours: int = 24, limit: int = 2000, after_id: int | None = None):
+    """
+    Φέρνει watering cycles (ποτίσματα) από watering_events.
+    after_id: incremental cursor (row id). Χρειάζεται id και όχι ts, γιατί ο controller
+    γράφει το event στο τέλος του κύκλου με ts_start στο παρελθόν.
+    """
+    hours = max(1, min(hours, HISTORY_MAX_HOURS))
     limit = max(50, min(limit, 20000))
 
-    with get_conn() as con:
+    with connection() as con:
         rows = con.execute(
             """
-            SELECT ts_start, ts_end, duration_s,
+            SELECT id, ts_start, ts_end, duration_s,
                    estimated_ml, trigger_pot,
                    trigger_value_pct, threshold_pct,
                    result
             FROM watering_events
             WHERE ts_start >= (strftime('%s','now') - ?)
+              AND id > ?
             ORDER BY ts_start ASC
             LIMIT ?
             """,
-            (hours * 3600, limit)
+            (hours * 3600, after_id or 0, limit)
         ).fetchall()
 
     return rows
 
 
-def fetch_system_events(hours: int = 24, limit: int = 2000, code: str | None = None):
-    """Φέρνει system events (useful for debug / manual watering markers)."""
-    hours = max(1, min(hours, 7 * 24))
+def fetch_system_events(
+    hours: int = 24,
+    limit: int = 2000,
+    code: str | None = None,
+    after_id: int | None = None,
+):
+    """Φέρνει system events (useful for debug / manual watering markers). after_id: incremental cursor."""
+    hours = max(1, min(hours, HISTORY_MAX_HOURS))
     limit = max(50, min(limit, 20000))
 
     q = """
-        SELECT ts, level, code, message
+        SELECT id, ts, level, code, message
         FROM system_events
         WHERE ts >= (strftime('%s','now') - ?)
+          AND id > ?
     """
-    params = [hours * 3600]
+    params = [hours * 3600, after_id or 0]
 
     if code is not None:
         q += " AND code = ?"
@@ -162,7 +612,7 @@ def fetch_system_events(hours: int = 24, limit: int = 2000, code: str | None = N
     q += " ORDER BY ts ASC LIMIT ?"
     params.append(limit)
 
-    with get_conn() as con:
+    with connection() as con:
         rows = con.execute(q, tuple(params)).fetchall()
 
     return rows
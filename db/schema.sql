@@ -1,27 +1,98 @@
+-- πρέπει να προηγείται του πρώτου CREATE TABLE (παλιές βάσεις: βλ. archive.ensure_incremental_vacuum)
+PRAGMA auto_vacuum=INCREMENTAL;
 PRAGMA journal_mode=WAL;
 
-CREATE TABLE IF NOT EXISTS sensor_readings (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  ts INTEGER NOT NULL,
+-- Compact layout: ένα row ανά ts (WITHOUT ROWID, ο πίνακας είναι το ίδιο το ts index),
+-- pct/temp/hum σε fixed-point x100 (INTEGER: 2-3 bytes αντί για REAL 8 bytes),
+-- οι σπάνιες στήλες vin_v/notes στο reading_extras.
+CREATE TABLE IF NOT EXISTS readings (
+  ts INTEGER PRIMARY KEY,
 
-  soil1_raw INTEGER,
-  soil2_raw INTEGER,
-  soil3_raw INTEGER,
+  s1_raw INTEGER,
+  s2_raw INTEGER,
+  s3_raw INTEGER,
 
-  soil1_pct REAL,
-  soil2_pct REAL,
-  soil3_pct REAL,
+  s1_pct INTEGER,   -- soilN_pct * 100
+  s2_pct INTEGER,
+  s3_pct INTEGER,
 
-  temp_c REAL,
-  hum_pct REAL,
+  temp INTEGER,     -- temp_c * 100
+  hum INTEGER,      -- hum_pct * 100
 
+  flags INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS reading_extras (
+  ts INTEGER PRIMARY KEY,
   vin_v REAL,
-  flags INTEGER DEFAULT 0,
   notes TEXT
-);
+) WITHOUT ROWID;
 
-CREATE INDEX IF NOT EXISTS idx_sensor_readings_ts
-ON sensor_readings(ts);
+-- Συμβατότητα: το παλιό sensor_readings ως VIEW (id = ts) με INSTEAD OF triggers,
+-- ώστε εξωτερικά scripts/queries να δουλεύουν όπως πριν. Ο κώδικας εδώ γράφει/διαβάζει
+-- απευθείας το readings (db.py).
+CREATE VIEW IF NOT EXISTS sensor_readings AS
+SELECT r.ts AS id,
+       r.ts,
+       r.s1_raw AS soil1_raw, r.s2_raw AS soil2_raw, r.s3_raw AS soil3_raw,
+       r.s1_pct / 100.0 AS soil1_pct, r.s2_pct / 100.0 AS soil2_pct, r.s3_pct / 100.0 AS soil3_pct,
+       r.temp / 100.0 AS temp_c, r.hum / 100.0 AS hum_pct,
+       e.vin_v, r.flags, e.notes
+FROM readings r
+LEFT JOIN reading_extras e ON e.ts = r.ts;
+
+CREATE TRIGGER IF NOT EXISTS sensor_readings_insert
+INSTEAD OF INSERT ON sensor_readings
+BEGIN
+  INSERT OR REPLACE INTO readings (ts, s1_raw, s2_raw, s3_raw, s1_pct, s2_pct, s3_pct, temp, hum, flags)
+  VALUES (
+    NEW.ts, NEW.soil1_raw, NEW.soil2_raw, NEW.soil3_raw,
+    CAST(ROUND(NEW.soil1_pct * 100) AS INTEGER),
+    CAST(ROUND(NEW.soil2_pct * 100) AS INTEGER),
+    CAST(ROUND(NEW.soil3_pct * 100) AS INTEGER),
+    CAST(ROUND(NEW.temp_c * 100) AS INTEGER),
+    CAST(ROUND(NEW.hum_pct * 100) AS INTEGER),
+    COALESCE(NEW.flags, 0)
+  );
+  INSERT OR REPLACE INTO reading_extras (ts, vin_v, notes)
+  SELECT NEW.ts, NEW.vin_v, NEW.notes
+  WHERE NEW.vin_v IS NOT NULL OR NEW.notes IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sensor_readings_update
+INSTEAD OF UPDATE ON sensor_readings
+BEGIN
+  UPDATE readings SET
+    ts = NEW.ts,
+    s1_raw = NEW.soil1_raw, s2_raw = NEW.soil2_raw, s3_raw = NEW.soil3_raw,
+    s1_pct = CAST(ROUND(NEW.soil1_pct * 100) AS INTEGER),
+    s2_pct = CAST(ROUND(NEW.soil2_pct * 100) AS INTEGER),
+    s3_pct = CAST(ROUND(NEW.soil3_pct * 100) AS INTEGER),
+    temp = CAST(ROUND(NEW.temp_c * 100) AS INTEGER),
+    hum = CAST(ROUND(NEW.hum_pct * 100) AS INTEGER),
+    flags = COALESCE(NEW.flags, 0)
+  WHERE ts = OLD.ts;
+  DELETE FROM reading_extras WHERE ts = OLD.ts;
+  INSERT OR REPLACE INTO reading_extras (ts, vin_v, notes)
+  SELECT NEW.ts, NEW.vin_v, NEW.notes
+  WHERE NEW.vin_v IS NOT NULL OR NEW.notes IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS sensor_readings_delete
+INSTEAD OF DELETE ON sensor_readings
+BEGIN
+  DELETE FROM readings WHERE ts = OLD.ts;
+  DELETE FROM reading_extras WHERE ts = OLD.ts;
+END;
+
+-- Γλάστρες πέρα από τις soil1..3 (config.toml), μία row ανά (ts, pot).
+CREATE TABLE IF NOT EXISTS pot_readings (
+  ts INTEGER NOT NULL,
+  pot INTEGER NOT NULL,
+  raw INTEGER,
+  pct INTEGER,      -- pct * 100 (όπως στο readings)
+  PRIMARY KEY (ts, pot)
+) WITHOUT ROWID;
 
 CREATE TABLE IF NOT EXISTS watering_events (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -66,3 +137,78 @@ CREATE TABLE IF NOT EXISTS system_events (
 
 CREATE INDEX IF NOT EXISTS idx_system_events_ts
 ON system_events(ts);
+
+-- Tracing spans (tracing.py, μόνο με AUTO_WATERING_TRACE=db). ts = wall clock start (sec, float).
+CREATE TABLE IF NOT EXISTS trace_spans (
+  id INTEGER PRIMARY KEY,
+  ts REAL NOT NULL,
+  dur_us INTEGER NOT NULL,
+  process TEXT NOT NULL,
+  pid INTEGER,
+  thread TEXT,
+  name TEXT NOT NULL,
+  args TEXT              -- JSON
+);
+
+CREATE INDEX IF NOT EXISTS idx_trace_spans_ts
+ON trace_spans(ts);
+
+-- Rollups ανά minute/hour/day (min/max/avg ανά στήλη).
+-- Ενημερώνονται incrementally σε κάθε insert_sensor_readings_batch (db.update_rollups), από το readings.
+-- n = πλήθος raw rows στο bucket· στο cascade minute -> hour -> day κάθε υπο-bucket έχει ίσο βάρος (χρόνος, όχι n).
+CREATE TABLE IF NOT EXISTS sensor_rollup_minute (
+  bucket_ts INTEGER PRIMARY KEY,
+  n INTEGER NOT NULL,
+
+  soil1_raw_min INTEGER, soil1_raw_max INTEGER, soil1_raw_avg REAL,
+  soil2_raw_min INTEGER, soil2_raw_max INTEGER, soil2_raw_avg REAL,
+  soil3_raw_min INTEGER, soil3_raw_max INTEGER, soil3_raw_avg REAL,
+
+  soil1_pct_min REAL, soil1_pct_max REAL, soil1_pct_avg REAL,
+  soil2_pct_min REAL, soil2_pct_max REAL, soil2_pct_avg REAL,
+  soil3_pct_min REAL, soil3_pct_max REAL, soil3_pct_avg REAL,
+
+  temp_c_min REAL, temp_c_max REAL, temp_c_avg REAL,
+  hum_pct_min REAL, hum_pct_max REAL, hum_pct_avg REAL
+);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_hour (
+  bucket_ts INTEGER PRIMARY KEY,
+  n INTEGER NOT NULL,
+
+  soil1_raw_min INTEGER, soil1_raw_max INTEGER, soil1_raw_avg REAL,
+  soil2_raw_min INTEGER, soil2_raw_max INTEGER, soil2_raw_avg REAL,
+  soil3_raw_min INTEGER, soil3_raw_max INTEGER, soil3_raw_avg REAL,
+
+  soil1_pct_min REAL, soil1_pct_max REAL, soil1_pct_avg REAL,
+  soil2_pct_min REAL, soil2_pct_max REAL, soil2_pct_avg REAL,
+  soil3_pct_min REAL, soil3_pct_max REAL, soil3_pct_avg REAL,
+
+  temp_c_min REAL, temp_c_max REAL, temp_c_avg REAL,
+  hum_pct_min REAL, hum_pct_max REAL, hum_pct_avg REAL
+);
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_day (
+  bucket_ts INTEGER PRIMARY KEY,
+  n INTEGER NOT NULL,
+
+  soil1_raw_min INTEGER, soil1_raw_max INTEGER, soil1_raw_avg REAL,
+  soil2_raw_min INTEGER, soil2_raw_max INTEGER, soil2_raw_avg REAL,
+  soil3_raw_min INTEGER, soil3_raw_max INTEGER, soil3_raw_avg REAL,
+
+  soil1_pct_min REAL, soil1_pct_max REAL, soil1_pct_avg REAL,
+  soil2_pct_min REAL, soil2_pct_max REAL, soil2_pct_avg REAL,
+  soil3_pct_min REAL, soil3_pct_max REAL, soil3_pct_avg REAL,
+
+  temp_c_min REAL, temp_c_max REAL, temp_c_avg REAL,
+  hum_pct_min REAL, hum_pct_max REAL, hum_pct_avg REAL
+);
+
+-- Ranges που άλλαξαν επί τόπου μετά το ship (π.χ. recalibrate.py): ο shipper.py τα ξαναστέλνει
+-- στον aggregator και σβήνει το row.
+CREATE TABLE IF NOT EXISTS ship_resend (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  tbl TEXT NOT NULL,
+  lo INTEGER NOT NULL,
+  hi INTEGER NOT NULL
+);
@@ -0,0 +1,81 @@
+"""
+Shape-preserving downsampling (Largest-Triangle-Three-Buckets) για το /api/history.
+
+Σε αντίθεση με το every-Nth stride, το LTTB κρατάει σε κάθε bucket το σημείο που
+σχηματίζει το μεγαλύτερο τρίγωνο με τους γείτονες, οπότε βυθίσεις/κορυφές
+(π.χ. η πτώση πριν το πότισμα) δεν χάνονται.
+"""
+import numpy as np
+
+# Οι σειρές που ζωγραφίζει το dashboard (κοινά timestamps για όλες).
+HISTORY_SERIES = ("soil1_pct", "soil2_pct", "soil3_pct", "temp_c", "hum_pct")
+
+
+def lttb_indices(x, ys, n_out: int) -> np.ndarray:
+    """
+    Multi-series LTTB: επιστρέφει n_out sorted indices κοινά για όλες τις σειρές.
+    x: (n,) αύξουσα, ys: (k, n) με NaN για τα NULL.
+    Κάθε σειρά κανονικοποιείται στο εύρος της και το εμβαδόν αθροίζεται ανά σειρά,
+    ώστε το επιλεγμένο σημείο να σέβεται όλες τις καμπύλες μαζί.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[0]
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    ys = np.atleast_2d(np.asarray(ys, dtype=np.float64))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = ~np.isnan(ys)
+        lo = np.where(valid, ys, np.inf).min(axis=1, keepdims=True)
+        hi = np.where(valid, ys, -np.inf).max(axis=1, keepdims=True)
+        span = hi - lo
+        span[~np.isfinite(span) | (span == 0)] = 1.0
+        yn = (ys - lo) / span
+
+    # n_out-2 buckets για τα ενδιάμεσα σημεία (πρώτο/τελευταίο μένουν πάντα)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo_i, hi_i = edges[i], edges[i + 1]
+
+        # μέσος όρος του επόμενου bucket (ή το τελευταίο σημείο)
+        if i + 2 < len(edges):
+            nlo, nhi = edges[i + 1], edges[i + 2]
+        else:
+            nlo, nhi = n - 1, n
+        cx = x[nlo:nhi].mean()
+        seg = yn[:, nlo:nhi]
+        cnt = (~np.isnan(seg)).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cy = np.nansum(seg, axis=1) / cnt
+
+        ax = x[a]
+        ay = yn[:, a:a + 1]
+        bx = x[lo_i:hi_i]
+        by = yn[:, lo_i:hi_i]
+        area = np.abs((ax - cx) * (by - ay) - (ax - bx) * (cy[:, None] - ay))
+        total = np.nansum(area, axis=0)
+
+        a = lo_i + int(np.argmax(total))
+        out[i + 1] = a
+
+    return out
+
+
+def downsample_rows(rows, max_points: int, series=HISTORY_SERIES):
+    """
+    Κρατάει το πολύ max_points rows (sqlite3.Row / dict) με LTTB πάνω στις `series`.
+    Τα rows που επιστρέφονται είναι τα αυθεντικά (όχι interpolated τιμές).
+    """
+    n = len(rows)
+    if max_points is None or n <= max_points:
+        return rows
+
+    x = np.fromiter((r["ts"] for r in rows), dtype=np.float64, count=n)
+    ys = np.array([[r[k] for r in rows] for k in series], dtype=np.float64)  # None -> NaN
+    idx = lttb_indices(x, ys, max_points)
+    return [rows[i] for i in idx]
@@ -0,0 +1,379 @@
+"""
+Hardware abstraction: ADC (SPI), DHT22 και ψηφιακές έξοδοι (relay/LED) πίσω από backend.
+
+  AUTO_WATERING_BACKEND=pi   (default) spidev / adafruit_dht / gpiozero, με lazy imports
+  AUTO_WATERING_BACKEND=sim  προσομοίωση: ξήρανση χώματος, ροή αντλίας (ML_PER_SEC),
+                             θόρυβος αισθητήρων, προαιρετικά επιταχυνόμενος χρόνος
+                             (AUTO_WATERING_SIM_SPEED=60 -> 1 λεπτό virtual ανά δευτερόλεπτο)
+
+Οι daemons χρησιμοποιούν το `clock` (time/monotonic/sleep) αντί για το time module,
+ώστε στο sim να τρέχουν στον virtual χρόνο. Η κατάσταση του sim (υγρασία, relays,
+anchor του virtual clock) μοιράζεται ανάμεσα στα processes μέσω αρχείου στο RUN_DIR.
+"""
+import fcntl
+import json
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from runtime import run_path
+
+BACKEND = os.environ.get("AUTO_WATERING_BACKEND", "pi")
+SIM_SPEED = float(os.environ.get("AUTO_WATERING_SIM_SPEED", "1"))
+
+
+# --- clocks ---
+
+class Clock:
+    """Πραγματικός χρόνος."""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, event, seconds: float) -> bool:
+        """Σαν sleep(), αλλά ξυπνά αμέσως (True) όταν γίνει set το event (π.χ. stop)."""
+        if event is None:
+            self.sleep(seconds)
+            return False
+        return event.wait(max(0.0, seconds))
+
+    def real_seconds(self, seconds: float) -> float:
+        """Clock seconds -> πραγματικά seconds (για blocking calls όπως select())."""
+        return max(0.0, seconds)
+
+
+class ScaledClock(Clock):
+    """
+    Virtual χρόνος = wall0 + (monotonic - mono0) * speed. Το CLOCK_MONOTONIC είναι
+    κοινό για όλα τα processes, οπότε με κοινό anchor συμφωνούν όλοι οι daemons.
+    """
+
+    def __init__(self, speed: float, wall0: float, mono0: float):
+        self.speed = speed
+        self.wall0 = wall0
+        self.mono0 = mono0
+
+    def time(self) -> float:
+        return self.wall0 + (time.monotonic() - self.mono0) * self.speed
+
+    def monotonic(self) -> float:
+        return (time.monotonic() - self.mono0) * self.speed
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def wait(self, event, seconds: float) -> bool:
+        if event is None:
+            self.sleep(seconds)
+            return False
+        return event.wait(max(0.0, seconds) / self.speed)
+
+    def real_seconds(self, seconds: float) -> float:
+        return max(0.0, seconds) / self.speed
+
+
+# --- lazy device wrapper ---
+
+class LazyDevice:
+    """Δημιουργεί το πραγματικό device στην πρώτη χρήση (όχι στο import)."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._dev = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._dev is None:
+            with self._lock:
+                if self._dev is None:
+                    self._dev = self._factory()
+        return self._dev
+
+    def on(self):
+        self._get().on()
+
+    def off(self):
+        self._get().off()
+
+    @property
+    def value(self):
+        return self._get().value
+
+    def close(self):
+        if self._dev is not None:
+            self._dev.close()
+
+
+# --- Raspberry Pi backend ---
+
+class PiBackend:
+    name = "pi"
+
+    def __init__(self):
+        self.clock = Clock()
+
+    def spi(self, bus: int, device: int, max_hz: int):
+        import spidev
+
+        spi = spidev.SpiDev()
+        spi.open(bus, device)
+        spi.max_speed_hz = max_hz
+        return spi
+
+    def dht22(self, pin: int):
+        import adafruit_dht
+        import board
+
+        return adafruit_dht.DHT22(getattr(board, f"D{pin}"), use_pulseio=False)
+
+    def output(self, pin: int, active_high: bool = True, initial_value: bool = False):
+        from gpiozero import OutputDevice
+
+        return OutputDevice(pin, active_high=active_high, initial_value=initial_value)
+
+    def led(self, pin: int):
+        from gpiozero import LED
+
+        return LED(pin)
+
+
+# --- simulated backend ---
+
+SIM_STATE_NAME = "sim_world.json"
+SIM_SYNC_SEC = 0.2            # real seconds ανάμεσα σε διαβάσματα του shared state
+
+SIM_ADC_DRY = 25              # ίδιο με save_cal.py
+SIM_ADC_WET = 742
+SIM_ADC_NOISE = 3.0           # σ σε ADC counts
+SIM_DRY_TAU_SEC = 3 * 86400   # time constant ξήρανσης
+SIM_POT_CAPACITY_ML = 1500.0  # νερό για 0 -> 1 υγρασία
+SIM_ML_PER_SEC = 20.0         # ροή αντλίας (controller.ML_PER_SEC_DEFAULT)
+SIM_ADC_DEVICES = 2           # CE0 + CE1, 8 κανάλια το καθένα
+SIM_DHT_FAIL_P = 0.05
+
+
+class SimWorld:
+    """
+    Μοντέλο: υγρασία m ∈ [0,1] ανά ADC channel, εκθετική ξήρανση, +ML_PER_SEC όσο
+    είναι ON το relay της γλάστρας. Ολοκληρώνεται μέχρι τον τρέχοντα virtual χρόνο
+    σε κάθε sync/αλλαγή relay, με flock για τα πολλαπλά processes.
+    """
+
+    def __init__(self, speed: float = SIM_SPEED, channels: int = 8 * SIM_ADC_DEVICES):
+        from config import config
+
+        self._path = run_path(SIM_STATE_NAME)
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        self._channels = channels
+        # relay GPIO -> sim channel (device*8 + channel) της γλάστρας που ποτίζει, από το config
+        self._pump_pins = {p.relay_pin: p.device * 8 + p.channel for p in config.pump_pots}
+        self._rng = random.Random()
+
+        with self._locked_state() as st:
+            if "wall0" not in st:
+                st.update({
+                    "wall0": time.time(),
+                    "mono0": time.monotonic(),
+                    "t": 0.0,
+                    "moisture": [0.7] * channels,
+                    "outputs": {},
+                })
+            if len(st["moisture"]) < channels:  # state file of an older, smaller sim
+                st["moisture"] += [0.7] * (channels - len(st["moisture"]))
+            self.clock = ScaledClock(speed, st["wall0"], st["mono0"])
+            self._state = dict(st)
+
+    # shared state file
+
+    @contextmanager
+    def _locked_state(self):
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 1 << 16)
+            st = json.loads(raw) if raw else {}
+            yield st
+            data = json.dumps(st).encode()
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+        finally:
+            os.close(fd)  # releases the flock
+
+    def _advance(self, st: dict):
+        now = self.clock.monotonic()
+        dt = now - st["t"]
+        if dt <= 0:
+            return
+        decay = math.exp(-dt / SIM_DRY_TAU_SEC)
+        m = [v * decay for v in st["moisture"]]
+        for pin, on in st["outputs"].items():
+            ch = self._pump_pins.get(int(pin))
+            if on and ch is not None:
+                m[ch] += SIM_ML_PER_SEC * dt / SIM_POT_CAPACITY_ML
+        st["moisture"] = [min(1.0, max(0.0, v)) for v in m]
+        st["t"] = now
+
+    def _sync(self, force: bool = False):
+        with self._lock:
+            if not force and time.monotonic() - self._last_sync < SIM_SYNC_SEC:
+                return
+            with self._locked_state() as st:
+                self._advance(st)
+                self._state = dict(st)
+            self._last_sync = time.monotonic()
+
+    # model outputs
+
+    def adc(self, device: int, channel: int) -> int:
+        self._sync()
+        ch = device * 8 + channel
+        m = self._state["moisture"][ch] if ch < self._channels else 0.0
+        v = SIM_ADC_DRY + (SIM_ADC_WET - SIM_ADC_DRY) * m + self._rng.gauss(0.0, SIM_ADC_NOISE)
+        return int(min(1023, max(0, round(v))))
+
+    def temperature(self) -> float:
+        day = (self.clock.time() % 86400) / 86400
+        return round(22.0 + 4.0 * math.sin(2 * math.pi * (day - 0.375)) + self._rng.gauss(0, 0.2), 1)
+
+    def humidity(self) -> float:
+        day = (self.clock.time() % 86400) / 86400
+        return round(55.0 - 10.0 * math.sin(2 * math.pi * (day - 0.375)) + self._rng.gauss(0, 1.0), 1)
+
+    def set_output(self, pin: int, on: bool):
+        with self._lock:
+            with self._locked_state() as st:
+                self._advance(st)  # integrate flow up to the switch moment
+                st["outputs"][str(pin)] = bool(on)
+                self._state = dict(st)
+            self._last_sync = time.monotonic()
+
+
+class SimSpi:
+    """MCP3008 frames [1, (8+ch)<<4, 0] -> [_, hi, lo] από το SimWorld."""
+
+    def __init__(self, world: SimWorld, device: int):
+        self._world = world
+        self._device = device
+        self.max_speed_hz = 0
+
+    def xfer2(self, frame):
+        if len(frame) != 3:
+            return [0] * len(frame)
+        v = self._world.adc(self._device, (frame[1] >> 4) & 7)
+        return [0, (v >> 8) & 3, v & 0xFF]
+
+    def close(self):
+        pass
+
+
+class SimDht:
+    def __init__(self, world: SimWorld):
+        self._world = world
+
+    @property
+    def temperature(self):
+        if random.random() < SIM_DHT_FAIL_P:
+            raise RuntimeError("Checksum did not validate (sim)")
+        return self._world.temperature()
+
+    @property
+    def humidity(self):
+        return self._world.humidity()
+
+
+class SimOutput:
+    def __init__(self, world: SimWorld, pin: int, initial_value: bool = False):
+        self._world = world
+        self.pin = pin
+        self.value = int(initial_value)
+        world.set_output(pin, bool(initial_value))
+
+    def on(self):
+        self.value = 1
+        self._world.set_output(self.pin, True)
+
+    def off(self):
+        self.value = 0
+        self._world.set_output(self.pin, False)
+
+    def close(self):
+        self.off()
+
+
+class SimBackend:
+    name = "sim"
+
+    def __init__(self, speed: float = SIM_SPEED):
+        self.world = SimWorld(speed)
+        self.clock = self.world.clock
+
+    def spi(self, bus: int, device: int, max_hz: int):
+        return SimSpi(self.world, device)
+
+    def dht22(self, pin: int):
+        return SimDht(self.world)
+
+    def output(self, pin: int, active_high: bool = True, initial_value: bool = False):
+        return SimOutput(self.world, pin, initial_value)
+
+    def led(self, pin: int):
+        return SimOutput(self.world, pin)
+
+
+_BACKENDS = {"pi": PiBackend, "sim": SimBackend}
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if BACKEND not in _BACKENDS:
+                    raise ValueError(f"unknown AUTO_WATERING_BACKEND={BACKEND!r} (pi/sim)")
+                _backend = _BACKENDS[BACKEND]()
+    return _backend
+
+
+class _BackendClock(Clock):
+    """Το clock του ενεργού backend (επιλύεται στην πρώτη χρήση)."""
+
+    def time(self) -> float:
+        return backend().clock.time()
+
+    def monotonic(self) -> float:
+        return backend().clock.monotonic()
+
+    def sleep(self, seconds: float):
+        backend().clock.sleep(seconds)
+
+    def wait(self, event, seconds: float) -> bool:
+        return backend().clock.wait(event, seconds)
+
+    def real_seconds(self, seconds: float) -> float:
+        return backend().clock.real_seconds(seconds)
+
+
+clock = _BackendClock()
+
+
+def output(pin: int, active_high: bool = True, initial_value: bool = False) -> LazyDevice:
+    return LazyDevice(lambda: backend().output(pin, active_high=active_high, initial_value=initial_value))
+
+
+def led(pin: int) -> LazyDevice:
+    return LazyDevice(lambda: backend().led(pin))
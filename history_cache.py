@@ -0,0 +1,136 @@
+"""
+In-process cache των (ήδη encoded) απαντήσεων του /api/history.
+
+Πολλά tabs που κάνουν refresh στο ίδιο παράθυρο ζητάνε ακριβώς το ίδιο πράγμα: το
+key είναι (hours, resolution, max_points, cursor, format, end στρογγυλεμένο σε
+HISTORY_ALIGN_SEC), οπότε μέσα στο ίδιο slot απαντάνε όλα από ένα bytes object.
+
+- Invalidation: PRAGMA data_version σε δική του connection (αλλάζει μόνο όταν άλλο
+  connection κάνει commit, π.χ. το flush του collector) -> άδειασμα όλου του cache.
+- TTL ανά entry και LRU με όριο σε bytes.
+- Coalescing: ταυτόχρονα ίδια requests περιμένουν το ένα query που ήδη τρέχει.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from db import get_conn, RAW_SAMPLE_SEC
+
+HISTORY_ALIGN_SEC = RAW_SAMPLE_SEC  # end του παραθύρου στρογγυλεύεται στο sampling interval
+CACHE_TTL_SEC = 30.0
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024  # μεγαλύτερες απαντήσεις δεν μπαίνουν στο cache
+
+_HITS = metrics.counter("aw_history_cache_requests_total", "History cache lookups", result="hit")
+_MISSES = metrics.counter("aw_history_cache_requests_total", "History cache lookups", result="miss")
+_COALESCED = metrics.counter("aw_history_cache_requests_total", "History cache lookups", result="coalesced")
+_INVALIDATIONS = metrics.counter("aw_history_cache_invalidations_total", "Cache flushes after a DB commit")
+_BYTES = metrics.gauge("aw_history_cache_bytes", "Encoded bytes held by the history cache")
+
+
+def aligned_end(now: float | None = None) -> int:
+    now = time.time() if now is None else now
+    return int(now) // HISTORY_ALIGN_SEC * HISTORY_ALIGN_SEC
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class HistoryCache:
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, ttl_sec: float = CACHE_TTL_SEC):
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires, (body, mimetype))
+        self._bytes = 0
+        self._inflight: dict = {}
+        self._lock = threading.Lock()
+        self._con = None
+        self._con_lock = threading.Lock()
+        self._data_version = None
+
+    def _check_data_version(self):
+        # one PRAGMA per request (no disk I/O); only commits of other connections change it
+        with self._con_lock:
+            if self._con is None:
+                self._con = get_conn()
+            dv = self._con.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            if dv != self._data_version:
+                if self._data_version is not None and self._entries:
+                    _INVALIDATIONS.inc()
+                self._entries.clear()
+                self._bytes = 0
+                _BYTES.set(0)
+                self._data_version = dv
+            return dv
+
+    def get(self, key, compute):
+        """
+        (body, mimetype) για το key· compute() -> (body bytes, mimetype) τρέχει μία φορά
+        ακόμα κι αν έρθουν πολλά ίδια requests μαζί.
+        """
+        dv = self._check_data_version()
+        now = time.monotonic()
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e[0] > now:
+                self._entries.move_to_end(key)
+                _HITS.inc()
+                return e[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+
+        if not leader:
+            _COALESCED.inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        _MISSES.inc()
+        try:
+            call.value = compute()
+            return call.value
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if call.error is None and dv == self._data_version:
+                    self._store(key, call.value)
+            call.done.set()
+
+    def _store(self, key, value):
+        size = len(value[0])
+        if size > CACHE_MAX_ENTRY_BYTES:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1][0])
+        self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+        self._bytes += size
+        # LRU eviction; expired entries go first anyway, they are never hit again
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, (body, _)) = self._entries.popitem(last=False)
+            self._bytes -= len(body)
+        _BYTES.set(self._bytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            _BYTES.set(0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "inflight": len(self._inflight)}
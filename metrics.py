@@ -0,0 +1,237 @@
+"""
+Ελαφρύ metrics registry (counters, gauges, fixed-bucket histograms) σε Prometheus text format.
+
+Κάθε process (collector, controller, indicator, supervisor, app) κρατάει τα δικά του
+metrics στη μνήμη· ένα exporter thread τα γράφει ανά METRICS_EXPORT_SEC σε
+metrics.<process>.<pid>.json στο RUN_DIR (tmpfs). Το /metrics του app.py τα ενώνει
+με label process="..." (ένα series ανά process, το άθροισμα το κάνει το Prometheus).
+
+Hot path: ένα observe/inc είναι ένα lock + bisect (~1µs), χωρίς allocations·
+τα metrics δημιουργούνται μία φορά σε module level.
+
+    READ_SEC = metrics.histogram("aw_adc_read_seconds", "MCP3008 interleaved read", adc="0.0")
+    with READ_SEC.time():
+        ...
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from runtime import read_process_json, write_process_json
+
+METRICS_PREFIX = "metrics."
+METRICS_EXPORT_SEC = 10.0
+
+# seconds: 100µs .. 30s (ADC reads ~0.1s, DHT retries ~0.65s, commits ms, HTTP ms)
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# name -> (type, help, {labels tuple: metric})
+_families: dict[str, tuple[str, str, dict]] = {}
+_registry_lock = threading.Lock()
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1.0):
+        with self._lock:
+            self.value += n
+
+    def dump(self) -> dict:
+        return {"value": self.value}
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, v: float):
+        self.value = v
+
+    def dump(self) -> dict:
+        return {"value": self.value}
+
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist):
+        self._hist = hist
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.observe(time.perf_counter() - self._t0)
+        return False
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float):
+        i = bisect_left(self.buckets, v)  # le semantics: v == bound goes in that bucket
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += v
+            self.count += 1
+
+    def time(self) -> _Timer:
+        """with hist.time(): ... – παρατηρεί τη διάρκεια σε seconds (και σε exception)."""
+        return _Timer(self)
+
+    def dump(self) -> dict:
+        with self._lock:
+            return {"buckets": self.buckets, "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+_TYPES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+def _get(kind: str, name: str, help: str, labels: dict, **kwargs):
+    key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+    with _registry_lock:
+        fam = _families.get(name)
+        if fam is None:
+            fam = _families[name] = (kind, help, {})
+        elif fam[0] != kind:
+            raise ValueError(f"metric {name} already registered as {fam[0]}")
+        m = fam[2].get(key)
+        if m is None:
+            m = fam[2][key] = _TYPES[kind](**kwargs)
+        return m
+
+
+def counter(name: str, help: str = "", **labels) -> Counter:
+    return _get("counter", name, help, labels)
+
+
+def gauge(name: str, help: str = "", **labels) -> Gauge:
+    return _get("gauge", name, help, labels)
+
+
+def histogram(name: str, help: str = "", buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+    return _get("histogram", name, help, labels, buckets=buckets)
+
+
+def dump() -> dict:
+    """Τα metrics αυτού του process σε JSON-able μορφή."""
+    with _registry_lock:
+        fams = [(n, k, h, list(series.items())) for n, (k, h, series) in _families.items()]
+    return {
+        name: {"type": kind, "help": help, "series": [[dict(key), m.dump()] for key, m in series]}
+        for name, kind, help, series in fams
+    }
+
+
+# --- per-process export ---
+
+_exporter: threading.Thread | None = None
+_process = None
+
+
+def _export():
+    try:
+        write_process_json(METRICS_PREFIX, _process, {
+            "process": _process, "pid": os.getpid(), "updated": int(time.time()), "metrics": dump(),
+        })
+    except OSError as e:
+        print("[metrics] export error:", e)
+
+
+def start_exporter(process: str, interval: float = METRICS_EXPORT_SEC):
+    """Γράφει τα metrics του process στο RUN_DIR ανά `interval` (ένα thread ανά process, idempotent)."""
+    global _exporter, _process
+    with _registry_lock:
+        if _exporter is not None:
+            return
+        _process = process
+
+        def loop():
+            while True:
+                _export()
+                time.sleep(interval)
+
+        _exporter = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+        _exporter.start()
+
+
+def flush():
+    """Τελικό export (π.χ. σε shutdown), ώστε να μη χαθούν τα τελευταία δευτερόλεπτα."""
+    if _process is not None:
+        _export()
+
+
+# --- Prometheus text format ---
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) and not v.is_integer() else str(int(v))
+
+
+def _labels(d: dict) -> str:
+    if not d:
+        return ""
+    esc = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in d.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(d.keys(), esc)) + "}"
+
+
+def render(processes: list[dict]) -> str:
+    """
+    Prometheus text exposition (0.0.4) από τα dumps των processes
+    ([{"process": ..., "metrics": dump()}]); κάθε series παίρνει label process.
+    """
+    merged: dict[str, tuple[str, str, list]] = {}
+    for p in processes:
+        for name, fam in p["metrics"].items():
+            m = merged.setdefault(name, (fam["type"], fam["help"], []))
+            if m[0] != fam["type"]:
+                continue
+            for labels, v in fam["series"]:
+                m[2].append(({"process": p["process"], **labels}, v))
+
+    lines = []
+    for name in sorted(merged):
+        kind, help, series = merged[name]
+        if help:
+            lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, v in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_fmt(v['value'])}")
+                continue
+            cum = 0
+            for bound, c in zip(list(v["buckets"]) + [float("inf")], v["counts"]):
+                cum += c
+                lines.append(f"{name}_bucket{_labels({**labels, 'le': _fmt(bound)})} {cum}")
+            lines.append(f"{name}_sum{_labels(labels)} {_fmt(v['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {v['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def collect(process: str | None = None) -> list[dict]:
+    """Τα exports όλων των ζωντανών processes· με `process` προστίθεται και το τρέχον (φρέσκο, από τη μνήμη)."""
+    out = read_process_json(METRICS_PREFIX)
+    if process is not None:
+        out = [p for p in out if p.get("pid") != os.getpid()]
+        out.append({"process": process, "pid": os.getpid(), "metrics": dump()})
+    return out
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Μεταφορά του sensor_readings στο compact layout (readings WITHOUT ROWID, fixed-point x100,
+vin_v/notes στο reading_extras). Το ίδιο γίνεται αυτόματα στο init_db· εδώ με progress,
+στατιστικά μεγέθους και προαιρετικό full VACUUM για να μικρύνει και το αρχείο.
+
+  python migrate.py              # migration (αν χρειάζεται) + incremental vacuum
+  python migrate.py --vacuum     # + VACUUM (σταμάτα πρώτα collector/controller/app)
+"""
+import argparse
+
+import db
+
+
+def _stats(con) -> dict:
+    page_size = con.execute("PRAGMA page_size").fetchone()[0]
+    pages = con.execute("PRAGMA page_count").fetchone()[0]
+    free = con.execute("PRAGMA freelist_count").fetchone()[0]
+    out = {"file_mb": pages * page_size / 1e6, "used_mb": (pages - free) * page_size / 1e6}
+    # per-table pages, if the dbstat virtual table is compiled in
+    try:
+        rows = con.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat GROUP BY name ORDER BY 2 DESC LIMIT 6"
+        ).fetchall()
+        out["tables_mb"] = {name: size / 1e6 for name, size in rows}
+    except Exception:
+        pass
+    return out
+
+
+def _print_stats(label: str, st: dict):
+    print(f"[migrate] {label}: file={st['file_mb']:.2f}MB used={st['used_mb']:.2f}MB")
+    for name, mb in st.get("tables_mb", {}).items():
+        print(f"           {name:<32} {mb:8.2f}MB")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Migrate sensor_readings to the compact layout")
+    ap.add_argument("--vacuum", action="store_true", help="full VACUUM at the end (exclusive lock)")
+    args = ap.parse_args()
+
+    con = db.get_conn()
+    try:
+        _print_stats("before", _stats(con))
+    finally:
+        con.close()
+
+    db.init_db(verbose=True)
+
+    con = db.get_conn()
+    try:
+        rows = con.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+        print(f"[migrate] readings: {rows} rows")
+        if args.vacuum:
+            db.close_pool()
+            print("[migrate] VACUUM...")
+            # auto_vacuum=INCREMENTAL in the same pass, so later deletes (archive, clear) shrink the file too
+            if not db.ensure_incremental_vacuum(con):
+                con.execute("VACUUM")
+        _print_stats("after", _stats(con))
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
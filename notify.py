@@ -0,0 +1,124 @@
+"""
+Τοπικές ειδοποιήσεις ανάμεσα σε daemons μέσω Unix datagram sockets στο RUN_DIR.
+
+Κάθε subscriber κάνει bind ένα socket `<topic>.<pid>.<n>.sock`· ο publisher στέλνει
+ένα μικρό JSON datagram σε όλα τα sockets του topic. Sockets που δεν απαντούν
+(ο subscriber πέθανε χωρίς cleanup) σβήνονται. Αν δεν τρέχει publisher, ο
+subscriber απλά κάνει timeout και ο caller πέφτει πίσω σε polling.
+"""
+import errno
+import itertools
+import json
+import os
+import select
+import socket
+import threading
+
+from runtime import RUN_DIR, run_path
+
+TOPIC_READINGS = "readings"
+TOPIC_SETTINGS = "settings"  # commit στο settings_history (settings.notify_changed)
+TOPIC_WATERING = "watering"  # pump cycle start/end (scheduler.py), για το adaptive sampling
+MAX_DATAGRAM = 4096
+
+_counter = itertools.count(1)
+_counter_lock = threading.Lock()
+
+
+class Publisher:
+    def __init__(self, topic: str):
+        self.topic = topic
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)  # a slow subscriber must never block the publisher
+
+    def publish(self, payload: dict) -> int:
+        """Στέλνει σε όλους τους subscribers. Επιστρέφει πόσοι το έλαβαν."""
+        data = json.dumps(payload, separators=(",", ":")).encode()
+        sent = 0
+        for path in RUN_DIR.glob(f"{self.topic}.*.sock"):
+            try:
+                self._sock.sendto(data, str(path))
+                sent += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                # nobody bound: stale socket of a dead subscriber
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.ENOBUFS):
+                    raise
+                # subscriber's queue is full: it already has a pending wake-up
+        return sent
+
+    def close(self):
+        self._sock.close()
+
+
+class Subscription:
+    def __init__(self, topic: str):
+        with _counter_lock:
+            n = next(_counter)
+        self.path = run_path(f"{topic}.{os.getpid()}.{n}.sock")
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(str(self.path))
+        self._sock.setblocking(False)
+
+    def wait(self, timeout: float | None) -> dict | None:
+        """
+        Περιμένει έως `timeout` (πραγματικά sec) για ειδοποίηση. Επιστρέφει την πιο
+        πρόσφατη (όσες είχαν μαζευτεί συγχωνεύονται) ή None σε timeout.
+        """
+        ready, _, _ = select.select([self._sock], [], [], timeout)
+        if not ready:
+            return None
+        return self._drain()
+
+    def interrupt(self, payload: dict | None = None):
+        """Ξυπνά ένα wait() από άλλο thread (π.χ. σε stop), με ένα datagram στο δικό μας socket."""
+        data = json.dumps(payload or {"interrupt": True}, separators=(",", ":")).encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as s:
+            try:
+                s.sendto(data, str(self.path))
+            except OSError:
+                pass  # closed or queue full: a wake-up is already pending
+
+    def _drain(self) -> dict | None:
+        latest = None
+        while True:
+            try:
+                data = self._sock.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return latest
+            try:
+                latest = json.loads(data)
+            except ValueError:
+                continue
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def close(self):
+        self._sock.close()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def wait_any(subs, timeout: float | None) -> dict:
+    """
+    Ένα select() πάνω σε πολλά subscriptions: {subscription: πιο πρόσφατο μήνυμα}
+    για όσα ξύπνησαν, {} σε timeout (πραγματικά sec).
+    """
+    ready, _, _ = select.select(list(subs), [], [], timeout)
+    out = {}
+    for sub in ready:
+        msg = sub._drain()
+        if msg is not None:
+            out[sub] = msg
+    return out
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Backfill των soil1_pct..soil3_pct από τα αποθηκευμένα *_raw, μετά από αλλαγή calibration.
+
+Default: για κάθε row χρησιμοποιεί το calibration (soilN_dry / soilN_wet) που ίσχυε
+τη στιγμή της μέτρησης, βάσει settings_history. Με --current εφαρμόζει το τρέχον
+calibration σε όλο το εύρος (ώστε το ιστορικό να συμφωνεί με τα thresholds του controller).
+
+Δουλεύει σε chunks (NumPy για τον υπολογισμό, executemany για τα UPDATE) με commit
+ανά chunk και μικρή παύση, ώστε ο collector να μην περιμένει ποτέ πολύ για write lock.
+Το εύρος που άλλαξε μπαίνει στο ship_resend, ώστε ο shipper.py να το ξαναστείλει στον aggregator.
+
+  python recalibrate.py --from 2025-01-01 --to 2025-02-01
+  python recalibrate.py --current --chunk 2000 --pause 0.1
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from db import FIXED_SCALE, connection, init_db, mark_resend, rebuild_rollups
+
+POTS = (1, 2, 3)
+CHUNK_ROWS = 5000
+PAUSE_SEC = 0.05
+
+
+def parse_when(s: str | None) -> int | None:
+    """epoch seconds ή ISO ημερομηνία/ώρα (local time)."""
+    if s is None:
+        return None
+    if s.isdigit():
+        return int(s)
+    return int(datetime.fromisoformat(s).timestamp())
+
+
+def load_calibration_timeline(con, current_only: bool = False) -> dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Ανά pot: (change_ts, dry, wet) – step function, η τιμή i ισχύει από change_ts[i]
+    μέχρι την επόμενη αλλαγή. NaN όσο δεν έχει οριστεί κάποιο από τα δύο.
+    """
+    keys = [f"soil{p}_{kind}" for p in POTS for kind in ("dry", "wet")]
+    rows = con.execute(
+        f"""
+        SELECT ts, key, value FROM settings_history
+        WHERE key IN ({",".join("?" * len(keys))})
+        ORDER BY ts ASC, id ASC
+        """,
+        keys,
+    ).fetchall()
+
+    timeline = {}
+    for pot in POTS:
+        state = {"dry": np.nan, "wet": np.nan}
+        t, dry, wet = [], [], []
+        for r in rows:
+            prefix, kind = r["key"].rsplit("_", 1)
+            if prefix != f"soil{pot}":
+                continue
+            try:
+                state[kind] = float(r["value"])
+            except ValueError:
+                continue
+            if t and t[-1] == r["ts"]:
+                dry[-1], wet[-1] = state["dry"], state["wet"]
+            else:
+                t.append(r["ts"])
+                dry.append(state["dry"])
+                wet.append(state["wet"])
+
+        if current_only:
+            # one step that covers the whole history
+            t, dry, wet = [np.iinfo(np.int64).min], [state["dry"]], [state["wet"]]
+        timeline[pot] = (np.array(t, dtype=np.int64), np.array(dry), np.array(wet))
+    return timeline
+
+
+def recompute_pct(ts: np.ndarray, raw: np.ndarray, timeline) -> np.ndarray:
+    """Vectorized collector.raws_to_pcts με το calibration που ίσχυε σε κάθε ts (NaN όπου δεν ορίζεται)."""
+    change_ts, dry_v, wet_v = timeline
+    out = np.full(ts.shape, np.nan)
+    if change_ts.size == 0:
+        return out
+
+    idx = np.searchsorted(change_ts, ts, side="right") - 1
+    known = idx >= 0
+    dry = np.where(known, dry_v[np.clip(idx, 0, None)], np.nan)
+    wet = np.where(known, wet_v[np.clip(idx, 0, None)], np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = (raw - dry) / (wet - dry) * 100.0
+    pct[dry == wet] = np.nan
+    return np.clip(pct, 0.0, 100.0, out=out, where=~np.isnan(pct))
+
+
+def _fixed(a: np.ndarray) -> list:
+    """pct -> fixed-point INTEGER του readings (NaN -> NULL)."""
+    return [None if v != v else int(v) for v in np.round(a * FIXED_SCALE).tolist()]
+
+
+def backfill(
+    ts_from: int | None = None,
+    ts_to: int | None = None,
+    current_only: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+    pause_sec: float = PAUSE_SEC,
+    dry_run: bool = False,
+) -> int:
+    """Επιστρέφει πόσα rows ενημερώθηκαν."""
+    ts_from = ts_from if ts_from is not None else 0
+    ts_to = ts_to if ts_to is not None else 2**62
+
+    with connection() as con:
+        timelines = load_calibration_timeline(con, current_only)
+
+    last_ts = ts_from - 1
+    total = 0
+    touched_lo = touched_hi = None
+    while True:
+        with connection() as con:
+            rows = con.execute(
+                """
+                SELECT ts, s1_raw, s2_raw, s3_raw
+                FROM readings
+                WHERE ts > ? AND ts <= ?
+                ORDER BY ts ASC
+                LIMIT ?
+                """,
+                (last_ts, ts_to, chunk_rows),
+            ).fetchall()
+            if not rows:
+                break
+
+            cols = np.array([tuple(r) for r in rows], dtype=np.float64)  # None -> NaN
+            ts = cols[:, 0].astype(np.int64)
+            pcts = [recompute_pct(ts, cols[:, pot], timelines[pot]) for pot in POTS]
+
+            if not dry_run:
+                con.executemany(
+                    "UPDATE readings SET s1_pct=?, s2_pct=?, s3_pct=? WHERE ts=?",
+                    zip(*(_fixed(p) for p in pcts), ts.tolist()),
+                )
+            # commit on leaving the with-block: one short write transaction per chunk
+
+        last_ts = int(ts[-1])
+        total += len(rows)
+        lo, hi = int(ts.min()), int(ts.max())
+        touched_lo = lo if touched_lo is None else min(touched_lo, lo)
+        touched_hi = hi if touched_hi is None else max(touched_hi, hi)
+        print(f"[recalibrate] {total} rows (up to ts={last_ts})")
+        time.sleep(pause_sec)
+
+    if total and not dry_run:
+        with connection() as con:
+            rebuild_rollups(con, touched_lo, touched_hi)
+            # the shipper sends only rows past its cursor: queue the rewritten range again
+            mark_resend(con, "readings", touched_lo, touched_hi)
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Recompute soil*_pct from raw values")
+    ap.add_argument("--from", dest="ts_from", help="epoch ή ISO (default: αρχή)")
+    ap.add_argument("--to", dest="ts_to", help="epoch ή ISO (default: τέλος)")
+    ap.add_argument("--current", action="store_true", help="τρέχον calibration για όλο το εύρος")
+    ap.add_argument("--chunk", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--pause", type=float, default=PAUSE_SEC, help="παύση ανάμεσα στα chunks (s)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    init_db()
+    n = backfill(
+        parse_when(args.ts_from),
+        parse_when(args.ts_to),
+        current_only=args.current,
+        chunk_rows=args.chunk,
+        pause_sec=args.pause,
+        dry_run=args.dry_run,
+    )
+    print(f"[recalibrate] done, {n} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Κοινός κατάλογος για runtime αρχεία (shared memory snapshot, sockets, per-process stats κλπ.)."""
+import json
+import os
+import signal
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def _default_run_dir() -> Path:
+    # tmpfs (RAM) αν υπάρχει, ώστε να μη γράφουμε στην SD card
+    if Path("/dev/shm").is_dir():
+        return Path("/dev/shm") / "auto_watering"
+    return BASE_DIR / "db" / "run"
+
+
+RUN_DIR = Path(os.environ.get("AUTO_WATERING_RUN_DIR") or _default_run_dir())
+
+
+def run_path(name: str) -> Path:
+    RUN_DIR.mkdir(parents=True, exist_ok=True)
+    return RUN_DIR / name
+
+
+def write_process_json(prefix: str, name: str, data: dict) -> Path:
+    """Γράφει atomically <prefix><name>.<pid>.json (tmpfs: δεν κοστίζει writes στην SD card)."""
+    path = run_path(f"{prefix}{name}.{os.getpid()}.json")
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")))
+    os.replace(tmp, path)
+    return path
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_process_json(prefix: str) -> list[dict]:
+    """Τα αρχεία <prefix>*.json όλων των processes· όσα έμειναν από νεκρά processes σβήνονται."""
+    out = []
+    if not RUN_DIR.is_dir():
+        return out
+    for path in sorted(RUN_DIR.glob(f"{prefix}*.json")):
+        try:
+            d = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        if not _pid_alive(int(d.get("pid", 0))):
+            path.unlink(missing_ok=True)
+            continue
+        out.append(d)
+    return out
+
+
+class StopEvent(threading.Event):
+    """
+    threading.Event που τρέχει και callbacks στο set(), π.χ. interrupt() ενός notify wait,
+    ώστε ένα blocking wait να ξυπνά στο stop χωρίς δικό του thread που περιμένει το event.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []  # list append/remove are atomic: safe from the signal handler too
+
+    def add_callback(self, fn):
+        self._callbacks.append(fn)
+        if self.is_set():
+            fn()
+
+    def remove_callback(self, fn):
+        try:
+            self._callbacks.remove(fn)
+        except ValueError:
+            pass
+
+    def set(self):
+        super().set()
+        for fn in list(self._callbacks):
+            try:
+                fn()
+            except Exception as e:
+                print(f"[runtime] stop callback failed: {e}")
+
+
+def stop_event() -> StopEvent:
+    """Event που γίνεται set σε SIGTERM/SIGINT (main thread), για καθαρό stop + τελικό commit."""
+    stop = StopEvent()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    return stop
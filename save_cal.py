@@ -1,5 +1,6 @@
 import time
-from db import init_db, get_conn
+from db import init_db, connection
+from settings import notify_changed
 
 init_db()
 ts = int(time.time())
@@ -10,12 +11,13 @@ vals = {
   "soil3_dry": "25",  "soil3_wet": "742",
 }
 
-with get_conn() as con:
+with connection() as con:
   for k, v in vals.items():
     con.execute(
       "INSERT INTO settings_history (ts, key, value, source, comment) VALUES (?, ?, ?, 'manual', 'calibration')",
       (ts, k, v),
     )
   con.commit()
+notify_changed()
 
 print("OK saved calibration")
@@ -0,0 +1,288 @@
+"""
+Non-blocking pulse scheduler για τις αντλίες.
+
+Κάθε κύκλος ποτίσματος είναι ένα PulsePlan (state machine: pulse ON -> pause -> ...),
+και ένα PulseScheduler thread τα τρέχει όλα από ένα heapq με deadlines στο
+clock.monotonic(). Έτσι πολλά relays/γλάστρες μπορούν να έχουν επικαλυπτόμενους
+κύκλους, ο controller δεν μπλοκάρει για ~90s, και ένας κύκλος σταματάει νωρίς
+(abort ή stop_check) με το relay OFF.
+
+Το relay κλείνει σε κάθε έξοδο: τέλος plan, abort, exception στο plan,
+shutdown του scheduler και crash του thread.
+"""
+import heapq
+import itertools
+import threading
+import traceback
+
+import metrics
+import tracing
+from hardware import clock
+from notify import Publisher, TOPIC_WATERING
+
+# plan states
+PENDING = "pending"
+ON = "on"
+PAUSE = "pause"
+DONE = "done"
+
+# results
+OK = "ok"
+ABORTED = "aborted"
+ERROR = "error"
+
+STEP_LATE_SEC = metrics.histogram("aw_scheduler_late_seconds", "How late a pulse/pause transition ran vs its deadline")
+
+_watering_pub: Publisher | None = None
+_watering_pub_lock = threading.Lock()  # _announce runs from submit() (any thread) and the scheduler thread
+
+
+def _announce(plan: "PulsePlan", active: bool):
+    """Start/end ενός κύκλου στο TOPIC_WATERING (ο collector κάνει γρήγορο sampling όσο τρέχει)."""
+    global _watering_pub
+    try:
+        with _watering_pub_lock:
+            if _watering_pub is None:
+                _watering_pub = Publisher(TOPIC_WATERING)
+        _watering_pub.publish({"plan": plan.name, "active": active, "ts": int(clock.time())})
+    except OSError as e:
+        print("[scheduler] notify error:", e)
+
+
+class PulsePlan:
+    def __init__(
+        self,
+        name: str,
+        output,
+        pulses,
+        pauses,
+        stop_check=None,
+        on_pulse=None,
+        on_done=None,
+    ):
+        """
+        name: μοναδικό ανά relay/γλάστρα (ένα ενεργό plan ανά name).
+        output: device με on()/off() (hardware.output).
+        stop_check(): True -> ο κύκλος σταματάει πριν από το επόμενο pulse.
+        on_pulse(plan, i, on_s), on_done(plan): callbacks στο scheduler thread.
+        """
+        self.name = name
+        self.output = output
+        self.pulses = [float(p) for p in pulses]
+        self.pauses = [float(p) for p in pauses]
+        self.stop_check = stop_check
+        self.on_pulse = on_pulse
+        self.on_done = on_done
+
+        self._lock = threading.RLock()  # step() (scheduler thread) vs abort() (any thread)
+        self.state = PENDING
+        self.index = 0            # next pulse
+        self.on_sec = 0.0         # delivered ON time
+        self.result = None
+        self.reason = None
+        self.ts_start = None
+        self.ts_end = None
+        self.late = 0.0           # lateness of the current transition (set by the scheduler)
+        self._on_at = None
+        self._t_start = 0         # tracing (monotonic ns, 0 = tracing off)
+        self._t_on = 0
+        self._t_pause = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.state == DONE
+
+    def step(self, now: float) -> float | None:
+        """Επόμενη μετάβαση. Επιστρέφει το επόμενο deadline (monotonic) ή None όταν τελειώσει."""
+        with self._lock:
+            return self._step(now)
+
+    def _step(self, now: float) -> float | None:
+        if self.state == PENDING:
+            self.ts_start = int(clock.time())
+            self._t_start = tracing.start()
+            return self._next_pulse(now)
+
+        if self.state == ON:
+            self._relay_off(now)
+            if self.index >= len(self.pulses):
+                return self._finish(OK)
+            if self.index - 1 < len(self.pauses):
+                self.state = PAUSE
+                self._t_pause = tracing.start()
+                return now + self.pauses[self.index - 1]
+            return self._next_pulse(now)  # fewer pauses than gaps: no pause, the remaining pulses still run
+
+        if self.state == PAUSE:
+            tracing.finish(
+                "pump.pause", self._t_pause, plan=self.name, i=self.index,
+                planned_sec=self.pauses[self.index - 1], late_sec=round(self.late, 4),
+            )
+            return self._next_pulse(now)
+        return None
+
+    def _next_pulse(self, now: float) -> float | None:
+        if self.index >= len(self.pulses):
+            return self._finish(OK)
+        if self.stop_check is not None and self.stop_check():
+            return self._finish(ABORTED, "stop condition")
+        on_s = self.pulses[self.index]
+        self.index += 1
+        if self.on_pulse is not None:
+            self.on_pulse(self, self.index, on_s)
+        self.output.on()
+        self.state = ON
+        self._on_at = now
+        self._t_on = tracing.start()
+        return now + on_s
+
+    def _relay_off(self, now: float):
+        self.output.off()
+        if self._on_at is not None:
+            on_s = max(0.0, now - self._on_at)
+            self.on_sec += on_s
+            self._on_at = None
+            tracing.finish(
+                "pump.pulse", self._t_on, plan=self.name, i=self.index,
+                planned_sec=self.pulses[self.index - 1], on_sec=round(on_s, 3), late_sec=round(self.late, 4),
+            )
+
+    def abort(self, now: float, result: str = ABORTED, reason: str | None = None):
+        """Σταματάει αμέσως (relay OFF). No-op αν έχει ήδη τελειώσει."""
+        with self._lock:
+            if self.state == DONE:
+                return
+            try:
+                self._relay_off(now)
+            finally:
+                self._finish(result, reason)
+
+    def _finish(self, result: str, reason: str | None = None):
+        self.state = DONE
+        self.result = result
+        self.reason = reason
+        self.ts_end = int(clock.time())
+        if self.ts_start is None:
+            self.ts_start = self.ts_end
+        tracing.finish("pump.cycle", self._t_start, plan=self.name, result=result, reason=reason, on_sec=round(self.on_sec, 3))
+        _announce(self, False)
+        if self.on_done is not None:
+            try:
+                self.on_done(self)
+            except Exception:
+                traceback.print_exc()
+        return None
+
+
+class PulseScheduler:
+    def __init__(self, name: str = "pulse-scheduler"):
+        self._heap: list = []           # (deadline, seq, plan)
+        self._seq = itertools.count()
+        self._active: dict[str, PulsePlan] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self) -> "PulseScheduler":
+        self._thread.start()
+        return self
+
+    def submit(self, plan: PulsePlan) -> bool:
+        """Ξεκινάει το plan στο επόμενο tick. False αν τρέχει ήδη plan με το ίδιο name."""
+        with self._lock:
+            if plan.name in self._active:
+                return False
+            self._active[plan.name] = plan
+            heapq.heappush(self._heap, (clock.monotonic(), next(self._seq), plan))
+        _announce(plan, True)
+        self._wake.set()
+        return True
+
+    def active(self, name: str) -> PulsePlan | None:
+        with self._lock:
+            return self._active.get(name)
+
+    def abort(self, name: str, reason: str = "aborted") -> bool:
+        with self._lock:
+            plan = self._active.pop(name, None)
+        if plan is None:
+            return False
+        self._safe_abort(plan, ABORTED, reason)
+        self._wake.set()
+        return True
+
+    def stop(self, timeout: float | None = 5.0):
+        """Abort όλων (relays OFF) και τερματισμός του thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        self._abort_all("scheduler stopped")
+
+    def _safe_abort(self, plan: PulsePlan, result: str, reason: str):
+        try:
+            plan.abort(clock.monotonic(), result, reason)
+        except Exception:
+            traceback.print_exc()
+            try:
+                plan.output.off()
+            except Exception:
+                traceback.print_exc()
+
+    def _abort_all(self, reason: str):
+        with self._lock:
+            plans = list(self._active.values())
+            self._active.clear()
+            self._heap.clear()
+        for plan in plans:
+            self._safe_abort(plan, ABORTED, reason)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                now = clock.monotonic()
+                with self._lock:
+                    due = []
+                    while self._heap and self._heap[0][0] <= now:
+                        deadline, _, plan = heapq.heappop(self._heap)
+                        due.append((deadline, plan))
+
+                for deadline, plan in due:
+                    if plan.finished:
+                        continue  # aborted while queued
+                    plan.late = now - deadline
+                    STEP_LATE_SEC.observe(plan.late)
+                    try:
+                        nxt = plan.step(now)
+                    except Exception as e:
+                        traceback.print_exc()
+                        self._safe_abort(plan, ERROR, f"{type(e).__name__}: {e}")
+                        nxt = None
+                    with self._lock:
+                        if nxt is None or plan.finished:
+                            if self._active.get(plan.name) is plan:
+                                del self._active[plan.name]
+                        else:
+                            heapq.heappush(self._heap, (nxt, next(self._seq), plan))
+
+                with self._lock:
+                    delay = self._heap[0][0] - clock.monotonic() if self._heap else 3600.0
+                clock.wait(self._wake, delay)
+        finally:
+            # whatever happened in the loop, no relay stays on
+            self._abort_all("scheduler exit")
+
+
+_default: PulseScheduler | None = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler() -> PulseScheduler:
+    """Ένας scheduler ανά process (κοινός για controller/controlled_watering στο supervisor)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PulseScheduler().start()
+        return _default
@@ -1,40 +1,117 @@
-import time
 import threading
 import statistics
 from typing import Optional, Tuple
 
-import spidev
+import hardware
+import metrics
+import tracing
+from config import config, SPI_MAX_HZ
+from hardware import clock
 
-import board
-import adafruit_dht
 
-
-# --- MCP3008 (SPI0, CE0) ---
+# --- MCP3008 (SPI0, CE0 by default; config.toml for more ADCs) ---
 _SPI_BUS = 0
 _SPI_DEV = 0       # 0=CE0 (GPIO8/pin24), 1=CE1 (GPIO7/pin26)
-_SPI_MAX_HZ = 1_000_000
+_SPI_MAX_HZ = SPI_MAX_HZ
 
 # Tuning for stability
 _SOIL_CHANNELS = (0, 1, 2)
 _ADC_SAMPLES = 21          # median of 21 samples (odd number)
 _ADC_SAMPLE_DELAY_S = 0.005  # 5ms between samples
 _ADC_SETTLE_S = 0.002        # 2ms settle after dummy read
+_ADC_DISCARD = 1             # discarded conversions after each mux switch (interleaved mode)
+
+_ADC_READ_SEC: dict[tuple[int, int], metrics.Histogram] = {}
+_ADC_ERRORS = metrics.counter("aw_adc_read_errors_total", "Failed MCP3008 reads (whole ADC)")
+_DHT_READ_SEC = metrics.histogram("aw_dht_read_seconds", "read_dht22 duration including retries")
+_DHT_RETRIES = metrics.counter("aw_dht_retries_total", "DHT22 reads that needed a retry")
+_DHT_FAILURES = metrics.counter("aw_dht_failures_total", "DHT22 reads that returned (None, None)")
+
+_spi_lock = threading.Lock()  # one SPI bus shared by all chip selects
+_init_lock = threading.Lock()
+_spis: dict[tuple[int, int], object] = {}  # (bus, device) -> opened on first read (lazy import of spidev)
 
-_spi_lock = threading.Lock()
-_spi = spidev.SpiDev()
-_spi.open(_SPI_BUS, _SPI_DEV)
-_spi.max_speed_hz = _SPI_MAX_HZ
 
+def _get_spi(bus: int = _SPI_BUS, device: int = _SPI_DEV):
+    spi = _spis.get((bus, device))
+    if spi is None:
+        with _init_lock:
+            spi = _spis.get((bus, device))
+            if spi is None:
+                spi = _spis[(bus, device)] = hardware.backend().spi(bus, device, _SPI_MAX_HZ)
+    return spi
 
-def _read_mcp3008_once(channel: int) -> int:
+
+def _read_mcp3008_once(channel: int, bus: int = _SPI_BUS, device: int = _SPI_DEV) -> int:
     """Μία ανάγνωση 0..1023 από MCP3008 κανάλι 0..7 (χωρίς filtering)."""
     if channel < 0 or channel > 7:
         raise ValueError("channel must be 0..7")
     with _spi_lock:
-        adc = _spi.xfer2([1, (8 + channel) << 4, 0])
+        adc = _get_spi(bus, device).xfer2([1, (8 + channel) << 4, 0])
     return ((adc[1] & 3) << 8) | adc[2]
 
 
+def _frame(channel: int) -> list[int]:
+    if channel < 0 or channel > 7:
+        raise ValueError("channel must be 0..7")
+    return [1, (8 + channel) << 4, 0]
+
+
+def read_channels(
+    channels=_SOIL_CHANNELS,
+    samples: int = _ADC_SAMPLES,
+    sample_delay_s: float = _ADC_SAMPLE_DELAY_S,
+    settle_s: float = _ADC_SETTLE_S,
+    discard: int = _ADC_DISCARD,
+    bus: int = _SPI_BUS,
+    device: int = _SPI_DEV,
+) -> list[int]:
+    """
+    Interleaved ανάγνωση πολλών καναλιών, median ανά κανάλι (ίδια σειρά με `channels`).
+    Σε κάθε round διαβάζονται όλα τα κανάλια με ένα lock και μετά γίνεται ένα sleep,
+    οπότε το διάστημα ανάμεσα στα δείγματα του ίδιου καναλιού γεμίζει με τα υπόλοιπα
+    αντί για ~21 sleeps ανά κανάλι. Μετά από κάθε αλλαγή mux γίνονται `discard`
+    conversions (ό,τι έκανε το dummy read) για να φορτίσει ο S&H.
+    Το MCP3008 θέλει CS toggle ανά conversion, οπότε κάθε frame είναι ξεχωριστό xfer2.
+    """
+    frames = [_frame(ch) for ch in channels]
+    if not frames:
+        return []
+    hist = _ADC_READ_SEC.get((bus, device))
+    if hist is None:
+        hist = _ADC_READ_SEC[(bus, device)] = metrics.histogram(
+            "aw_adc_read_seconds", "MCP3008 interleaved read (all channels, median filtered)", adc=f"{bus}.{device}"
+        )
+    with hist.time(), tracing.span("adc.read", adc=f"{bus}.{device}", channels=len(frames)):
+        return _read_channels(frames, samples, sample_delay_s, settle_s, discard, bus, device)
+
+
+def _read_channels(frames, samples, sample_delay_s, settle_s, discard, bus, device) -> list[int]:
+    switching = len(frames) > 1
+    vals: list[list[int]] = [[] for _ in frames]
+    xfer = _get_spi(bus, device).xfer2
+
+    # dummy read on every channel + one settle (instead of one per channel)
+    with _spi_lock:
+        for f in frames:
+            xfer(f)
+    clock.sleep(settle_s)
+
+    for r in range(samples):
+        with _spi_lock:
+            for i, f in enumerate(frames):
+                if switching:
+                    for _ in range(discard):
+                        xfer(f)
+                adc = xfer(f)
+                vals[i].append(((adc[1] & 3) << 8) | adc[2])
+        if sample_delay_s and r < samples - 1:
+            clock.sleep(sample_delay_s)
+
+    with tracing.span("adc.median", n=samples):
+        return [int(statistics.median(v)) for v in vals]
+
+
 def read_mcp3008(channel: int) -> int:
     """
     Επιστρέφει σταθερή τιμή 0..1023 από MCP3008.
@@ -43,32 +120,50 @@ def read_mcp3008(channel: int) -> int:
       - μικρό settle
       - median από πολλαπλά samples (κόβει spikes/θόρυβο)
     """
-    # Dummy read + settle
-    _ = _read_mcp3008_once(channel)
-    time.sleep(_ADC_SETTLE_S)
-
-    vals = []
-    for _ in range(_ADC_SAMPLES):
-        vals.append(_read_mcp3008_once(channel))
-        time.sleep(_ADC_SAMPLE_DELAY_S)
-
-    return int(statistics.median(vals))
+    return read_channels((channel,))[0]
 
 
 def read_soil_raw() -> Tuple[int, int, int]:
     """
     Soil sensors στα CH0, CH1, CH2.
-    Επιστρέφει (s1, s2, s3) raw 0..1023, με median filtering.
+    Επιστρέφει (s1, s2, s3) raw 0..1023, με median filtering (interleaved, βλ. read_channels).
     """
-    c1, c2, c3 = _SOIL_CHANNELS
-    s1 = read_mcp3008(c1)
-    s2 = read_mcp3008(c2)
-    s3 = read_mcp3008(c3)
+    s1, s2, s3 = read_channels(_SOIL_CHANNELS)
     return s1, s2, s3
 
 
+def read_pots_raw(groups=None) -> list[Optional[int]]:
+    """
+    Raw όλων των γλαστρών του config (index = Pot.index): ένα interleaved read ανά ADC
+    (config.adc_groups). Αν αποτύχει ένα ADC, μόνο οι γλάστρες του μένουν None.
+    """
+    if groups is None:
+        groups = config.adc_groups
+    out: list[Optional[int]] = [None] * len(config.pots)
+    for bus, device, channels, indexes in groups:
+        try:
+            vals = read_channels(channels, bus=bus, device=device)
+        except Exception as e:
+            _ADC_ERRORS.inc()
+            print(f"[sensors] ADC spi{bus}.{device} read error:", e)
+            continue
+        for i, v in zip(indexes, vals):
+            out[i] = v
+    return out
+
+
 # --- DHT22 on GPIO4 (pin 7) ---
-_dht = adafruit_dht.DHT22(board.D4, use_pulseio=False)
+_DHT_PIN = config.dht_pin
+_dht = None
+
+
+def _get_dht():
+    global _dht
+    if _dht is None:
+        with _init_lock:
+            if _dht is None:
+                _dht = hardware.backend().dht22(_DHT_PIN)
+    return _dht
 
 
 def read_dht22() -> Tuple[Optional[float], Optional[float]]:
@@ -76,14 +171,23 @@ def read_dht22() -> Tuple[Optional[float], Optional[float]]:
     Επιστρέφει (temp_c, hum_pct) ή (None, None) αν αποτύχει.
     Κάνει 1 retry με μικρή καθυστέρηση γιατί ο DHT22 συχνά πετάει transient errors.
     """
-    for attempt in range(2):
-        try:
-            t = _dht.temperature
-            h = _dht.humidity
-            if t is None or h is None:
-                raise RuntimeError("DHT returned None")
-            return float(t), float(h)
-        except Exception:
-            time.sleep(0.25 + 0.15 * attempt)
-
+    with _DHT_READ_SEC.time(), tracing.span("dht.read") as sp:
+        for attempt in range(2):
+            try:
+                dht = _get_dht()
+                t = dht.temperature
+                h = dht.humidity
+                if t is None or h is None:
+                    raise RuntimeError("DHT returned None")
+                if attempt:
+                    _DHT_RETRIES.inc()
+                    sp.set(attempts=attempt + 1)
+                return float(t), float(h)
+            except Exception as e:
+                with tracing.span("dht.retry_sleep", attempt=attempt + 1, error=type(e).__name__):
+                    clock.sleep(0.25 + 0.15 * attempt)
+        sp.set(attempts=2, failed=True)
+
+    _DHT_RETRIES.inc()
+    _DHT_FAILURES.inc()
     return None, None
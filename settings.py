@@ -0,0 +1,122 @@
+"""
+Settings cache πάνω από το settings_history.
+
+Όλες οι τρέχουσες τιμές φορτώνονται με ένα query και μένουν στη μνήμη. Σε κάθε
+get γίνεται μόνο ένα PRAGMA data_version (δεν αγγίζει δίσκο)· μόνο αν κάποιο άλλο
+connection έκανε commit κοιτάμε το MAX(id) του settings_history (append-only),
+και μόνο αν άλλαξε ξαναφορτώνουμε.
+"""
+import threading
+from typing import Optional
+
+from db import get_conn
+from hardware import clock
+from notify import Publisher, TOPIC_SETTINGS
+
+# Latest value ανά key (ισοπαλία σε ts -> το πιο πρόσφατο id).
+_LOAD_SQL = """
+    SELECT key, value FROM (
+        SELECT key, value,
+               ROW_NUMBER() OVER (PARTITION BY key ORDER BY ts DESC, id DESC) AS rn
+        FROM settings_history
+    )
+    WHERE rn = 1
+"""
+
+
+class Settings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._con = None
+        self._values: dict[str, str] = {}
+        self._data_version = None
+        self._max_id = None
+        self.generation = 0  # αυξάνεται σε κάθε reload (για όποιον θέλει να κάνει cache από πάνω)
+
+    def refresh(self) -> bool:
+        """Ξαναφορτώνει αν άλλαξε το settings_history. True αν έγινε reload."""
+        with self._lock:
+            if self._con is None:
+                self._con = get_conn()
+            con = self._con
+
+            dv = con.execute("PRAGMA data_version").fetchone()[0]
+            if dv == self._data_version:
+                return False
+            self._data_version = dv
+
+            max_id = con.execute("SELECT MAX(id) FROM settings_history").fetchone()[0]
+            if max_id == self._max_id and self.generation:
+                return False
+
+            self._values = {r["key"]: r["value"] for r in con.execute(_LOAD_SQL)}
+            self._max_id = max_id
+            self.generation += 1
+            return True
+
+    def wait(self, timeout: float, interval: float = 1.0, stop=None) -> bool:
+        """
+        Sleep έως `timeout`, αλλά επιστρέφει νωρίτερα (True) αν αλλάξουν settings,
+        ώστε οι αλλαγές να εφαρμόζονται αμέσως και όχι στο επόμενο poll.
+        Με `stop` (threading.Event) επιστρέφει αμέσως (False) μόλις γίνει set.
+        """
+        deadline = clock.monotonic() + timeout
+        while True:
+            remaining = deadline - clock.monotonic()
+            if remaining <= 0:
+                return False
+            if clock.wait(stop, min(interval, remaining)):
+                return False
+            if self.refresh():
+                return True
+
+    def get(self, key: str) -> Optional[str]:
+        self.refresh()
+        return self._values.get(key)
+
+    def get_float(self, key: str, default: float) -> float:
+        v = self.get(key)
+        if v is None:
+            return default
+        try:
+            return float(v)
+        except Exception:
+            return default
+
+    def get_int(self, key: str, default: int) -> int:
+        v = self.get(key)
+        if v is None:
+            return default
+        try:
+            return int(float(v))
+        except Exception:
+            return default
+
+    def snapshot(self) -> dict[str, str]:
+        self.refresh()
+        return dict(self._values)
+
+    def close(self):
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+            self._data_version = None
+
+
+# Ένα instance ανά process.
+settings = Settings()
+
+
+def notify_changed():
+    """
+    Μετά από commit στο settings_history: ξυπνάει όσους περιμένουν στο TOPIC_SETTINGS
+    (controller), ώστε η αλλαγή να εφαρμόζεται αμέσως χωρίς polling.
+    """
+    pub = Publisher(TOPIC_SETTINGS)
+    try:
+        pub.publish({"settings": True})
+    except OSError as e:
+        print("[settings] notify error:", e)
+    finally:
+        pub.close()
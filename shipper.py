@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Shipper: στέλνει τα νέα rows του κόμβου (db.INGEST_TABLES) στον central aggregator
+(app.py με AUTO_WATERING_AGGREGATOR_DIR) σε batches, zlib-compressed.
+
+Resume: ο cursor κάθε πίνακα (ts ή id) είναι αυτός που έχει επιβεβαιώσει ο aggregator·
+διαβάζεται από το /api/ingest/cursors στην εκκίνηση και μετά από 409, οπότε ο κόμβος
+δεν κρατάει δικό του state και ένα batch που χάθηκε στο δίκτυο απλώς ξαναστέλνεται.
+Query στη βάση γίνεται μόνο όταν άλλαξε το PRAGMA data_version (νέο commit).
+
+Rows που ξαναγράφτηκαν επί τόπου (recalibrate.py) δεν περνάνε τον cursor: το εύρος τους
+μπαίνει στο ship_resend (db.mark_resend) και ξαναστέλνεται με from <= acked, οπότε ο
+aggregator κάνει INSERT OR REPLACE + rollups χωρίς να αλλάξει ο cursor.
+
+  python shipper.py --url http://central:5000 [--node pi-balcony] [--once]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import time
+import urllib.error
+import urllib.request
+import zlib
+
+import metrics
+from db import INGEST_TABLES, get_conn
+from runtime import stop_event
+
+SHIP_INTERVAL_SEC = 30.0
+SHIP_BATCH_ROWS = 5000
+BACKOFF_MIN_SEC = 1.0
+BACKOFF_MAX_SEC = 300.0
+HTTP_TIMEOUT_SEC = 30.0
+
+BATCH_SEC = metrics.histogram("aw_ship_batch_seconds", "Query + compress + upload of one batch")
+SHIP_ERRORS = metrics.counter("aw_ship_errors_total", "Failed uploads (network / HTTP errors)")
+SHIP_BYTES = metrics.counter("aw_ship_bytes_total", "Compressed bytes uploaded")
+
+
+class Shipper:
+    def __init__(self, url: str, node: str, token: str | None = None, batch_rows: int = SHIP_BATCH_ROWS):
+        self.url = url.rstrip("/")
+        self.node = node
+        self.token = token
+        self.batch_rows = batch_rows
+        self.cursors: dict | None = None  # None = ρώτα τον aggregator
+        self.con = get_conn()
+        self._data_version = None
+        self._rows = {t: metrics.counter("aw_ship_rows_total", "Rows acknowledged by the aggregator", table=t)
+                      for t in INGEST_TABLES}
+
+    def _request(self, path: str, body: bytes | None = None) -> tuple[int, dict]:
+        headers = {"Content-Type": "application/json"}
+        if body is not None:
+            headers["Content-Encoding"] = "deflate"
+        if self.token:
+            headers["X-Ingest-Token"] = self.token
+        req = urllib.request.Request(self.url + path, data=body, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=HTTP_TIMEOUT_SEC) as r:
+                return r.status, json.loads(r.read())
+        except urllib.error.HTTPError as e:
+            if e.code != 409:
+                raise
+            return e.code, json.loads(e.read())
+
+    def fetch_cursors(self):
+        _, cursors = self._request(f"/api/ingest/cursors?node={self.node}")
+        self.cursors = {t: int(cursors.get(t, 0)) for t in INGEST_TABLES}
+
+    def _query(self, table: str, after: int, upto: int | None = None) -> tuple[list, list, bool]:
+        cursor_col, columns = INGEST_TABLES[table]
+        where, args = f"{cursor_col} > ?", [after]
+        if upto is not None:
+            where += f" AND {cursor_col} <= ?"
+            args.append(upto)
+        rows = self.con.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {where} ORDER BY {cursor_col} LIMIT ?",
+            (*args, self.batch_rows),
+        ).fetchall()
+        rows = [tuple(r) for r in rows]
+        i = columns.index(cursor_col)
+        full = len(rows) == self.batch_rows
+        if full and rows[0][i] != rows[-1][i]:
+            # non-unique cursor (pot_readings): the last ts may continue past the LIMIT
+            last = rows[-1][i]
+            while rows[-1][i] == last:
+                rows.pop()
+        return list(columns), rows, full
+
+    def _upload(self, table: str, cursor_from: int, columns: list, rows: list) -> tuple[int, dict]:
+        i = columns.index(INGEST_TABLES[table][0])
+        body = zlib.compress(json.dumps({
+            "node": self.node, "table": table, "from": cursor_from, "to": rows[-1][i],
+            "columns": columns, "rows": rows,
+        }, separators=(",", ":")).encode())
+        status, resp = self._request("/api/ingest", body)
+        SHIP_BYTES.inc(len(body))
+        return status, resp
+
+    def ship_table(self, table: str) -> tuple[int, bool]:
+        """Ένα batch του πίνακα: (rows που στάλθηκαν, υπάρχουν κι άλλα)."""
+        with BATCH_SEC.time():
+            columns, rows, full = self._query(table, self.cursors[table])
+            self.con.commit()  # end the read transaction (WAL snapshot)
+            if not rows:
+                return 0, False
+            status, resp = self._upload(table, self.cursors[table], columns, rows)
+        if status == 409:
+            print(f"[shipper] {table}: aggregator is at cursor {resp['cursor']}, resuming from there")
+            self.cursors[table] = int(resp["cursor"])
+            return 0, True
+        self.cursors[table] = int(resp["cursor"])
+        self._rows[table].inc(len(rows))
+        return len(rows), full
+
+    def resend(self) -> int:
+        """Ξαναστέλνει τα ranges του ship_resend που έχει ήδη επιβεβαιώσει ο aggregator."""
+        total = 0
+        pending = self.con.execute("SELECT id, tbl, lo, hi FROM ship_resend ORDER BY id").fetchall()
+        self.con.commit()
+        for rid, table, lo, hi in pending:
+            cursor_col = INGEST_TABLES[table][0]
+            # past the acked cursor the normal pass sends the rows anyway
+            after, upto = lo - 1, min(hi, self.cursors[table])
+            while after < upto:
+                with BATCH_SEC.time():
+                    columns, rows, _ = self._query(table, after, upto)
+                    self.con.commit()
+                    if not rows:
+                        break
+                    status, resp = self._upload(table, after, columns, rows)
+                if status == 409:
+                    # the aggregator is behind the range: the normal pass re-sends all of it
+                    self.cursors[table] = int(resp["cursor"])
+                    break
+                after = rows[-1][columns.index(cursor_col)]
+                total += len(rows)
+                self._rows[table].inc(len(rows))
+            with self.con:
+                self.con.execute("DELETE FROM ship_resend WHERE id = ?", (rid,))
+        return total
+
+    def ship(self) -> int:
+        """Στέλνει ό,τι νέο υπάρχει σε όλους τους πίνακες (όσα batches χρειαστούν)."""
+        if self.cursors is None:
+            self.fetch_cursors()
+        dv = self.con.execute("PRAGMA data_version").fetchone()[0]
+        if dv == self._data_version:
+            return 0
+        total = self.resend()
+        for table in INGEST_TABLES:
+            more = True
+            while more:
+                n, more = self.ship_table(table)
+                total += n
+        self._data_version = dv
+        return total
+
+    def close(self):
+        self.con.close()
+
+
+def run(shipper: Shipper, stop=None, interval: float = SHIP_INTERVAL_SEC):
+    """Loop μέχρι να γίνει set το `stop`, με exponential backoff (+ jitter) σε σφάλματα."""
+    backoff = BACKOFF_MIN_SEC
+    while stop is None or not stop.is_set():
+        try:
+            n = shipper.ship()
+            if n:
+                print(f"[shipper] {n} rows -> {shipper.url}")
+            backoff = BACKOFF_MIN_SEC
+            delay = interval
+        except (OSError, ValueError, KeyError) as e:  # URLError/HTTPError are OSError
+            SHIP_ERRORS.inc()
+            shipper.cursors = None  # the aggregator may have restarted: ask again
+            delay = backoff * random.uniform(0.5, 1.0)
+            print(f"[shipper] upload failed ({e}), retry in {delay:.0f}s")
+            backoff = min(backoff * 2, BACKOFF_MAX_SEC)
+        # real seconds, not the sim clock: the aggregator does not run on the virtual time
+        if stop is None:
+            time.sleep(delay)
+        elif stop.wait(delay):
+            break
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ship new readings/events to the central aggregator")
+    ap.add_argument("--url", default=os.environ.get("AUTO_WATERING_AGGREGATOR_URL"))
+    ap.add_argument("--node", default=os.environ.get("AUTO_WATERING_NODE_ID") or socket.gethostname())
+    ap.add_argument("--token", default=os.environ.get("AUTO_WATERING_INGEST_TOKEN"))
+    ap.add_argument("--interval", type=float, default=SHIP_INTERVAL_SEC)
+    ap.add_argument("--batch", type=int, default=SHIP_BATCH_ROWS)
+    ap.add_argument("--once", action="store_true", help="ship everything new and exit")
+    args = ap.parse_args()
+    if not args.url:
+        ap.error("--url (or AUTO_WATERING_AGGREGATOR_URL) is required")
+
+    shipper = Shipper(args.url, args.node, args.token, args.batch)
+    metrics.start_exporter("shipper")
+    try:
+        if args.once:
+            print(f"[shipper] {shipper.ship()} rows -> {shipper.url}")
+        else:
+            run(shipper, stop_event(), args.interval)
+    finally:
+        shipper.close()
+        metrics.flush()
+
+
+if __name__ == "__main__":
+    main()
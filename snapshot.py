@@ -0,0 +1,213 @@
+"""
+Shared-memory "latest reading" snapshot (memory-mapped αρχείο στο RUN_DIR).
+
+Ο collector γράφει κάθε νέα μέτρηση εδώ· controller/indicator τη διαβάζουν χωρίς
+να αγγίζουν τη βάση. Seqlock: ο writer κάνει το seq μονό πριν γράψει και ζυγό
+μετά· ο reader ξαναδοκιμάζει αν δει μονό seq ή αλλαγή seq κατά την ανάγνωση.
+
+Layout (little-endian):
+  0  magic b"AWS1" | u16 version | u16 capacity
+  8  u64 seq
+  16 i64 ts | u32 n_channels | u32 pad | f64 temp_c | f64 hum_pct
+  48 i32 raw[capacity] (-1 = NULL) | f64 pct[capacity] (NaN = NULL)
+"""
+import math
+import mmap
+import os
+import struct
+import time
+
+from config import config
+from db import connection, FIXED_SCALE
+from hardware import clock
+from runtime import run_path
+
+SNAPSHOT_NAME = "latest_reading.bin"
+CAPACITY = 64              # max soil channels στο snapshot
+SNAPSHOT_MAX_AGE_SEC = 120  # παλιότερο snapshot -> fallback σε SQLite (π.χ. ο collector δεν τρέχει)
+
+_MAGIC = b"AWS1"
+_VERSION = 1
+_HEAD = struct.Struct("<4sHH")
+_SEQ = struct.Struct("<Q")
+_FIXED = struct.Struct("<qIIdd")
+_RAW = struct.Struct(f"<{CAPACITY}i")
+_PCT = struct.Struct(f"<{CAPACITY}d")
+
+_SEQ_OFF = 8
+_FIXED_OFF = 16
+_RAW_OFF = _FIXED_OFF + _FIXED.size
+_PCT_OFF = _RAW_OFF + _RAW.size
+SIZE = _PCT_OFF + _PCT.size
+
+# τελευταίο publish αυτού του process (supervisor.py: collector και controller/indicator
+# στο ίδιο process -> ούτε καν mmap parse)
+_local: dict | None = None
+
+
+def _nan(v):
+    return math.nan if v is None else float(v)
+
+
+def _none(v):
+    return None if math.isnan(v) else v
+
+
+class SnapshotWriter:
+    """Μόνο ένας writer (ο collector)."""
+
+    def __init__(self, name: str = SNAPSHOT_NAME):
+        path = run_path(name)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, SIZE)
+            self._mm = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        _HEAD.pack_into(self._mm, 0, _MAGIC, _VERSION, CAPACITY)
+        (self._seq,) = _SEQ.unpack_from(self._mm, _SEQ_OFF)
+        self._seq += self._seq & 1  # αν έμεινε μονό από crash
+
+    def publish(self, ts: int, raws, pcts, temp_c=None, hum_pct=None):
+        n = min(len(raws), CAPACITY)
+        raw_vals = [(-1 if v is None else int(v)) for v in raws[:n]] + [-1] * (CAPACITY - n)
+        pct_vals = [_nan(v) for v in pcts[:n]] + [math.nan] * (CAPACITY - n)
+
+        mm = self._mm
+        _SEQ.pack_into(mm, _SEQ_OFF, self._seq + 1)  # odd: write in progress
+        _FIXED.pack_into(mm, _FIXED_OFF, int(ts), n, 0, _nan(temp_c), _nan(hum_pct))
+        _RAW.pack_into(mm, _RAW_OFF, *raw_vals)
+        _PCT.pack_into(mm, _PCT_OFF, *pct_vals)
+        self._seq += 2
+        _SEQ.pack_into(mm, _SEQ_OFF, self._seq)
+
+        global _local
+        _local = {
+            "seq": self._seq,
+            "ts": int(ts),
+            "raw": [None if v < 0 else v for v in raw_vals[:n]],
+            "pct": [None if v is None else float(v) for v in pcts[:n]],
+            "temp_c": temp_c,
+            "hum_pct": hum_pct,
+        }
+
+    def close(self):
+        self._mm.close()
+
+
+class SnapshotReader:
+    def __init__(self, name: str = SNAPSHOT_NAME):
+        self._name = name
+        self._mm = None
+
+    def _open(self) -> bool:
+        if self._mm is not None:
+            return True
+        try:
+            path = run_path(self._name)
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        magic, version, capacity = _HEAD.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION or capacity != CAPACITY:
+            self._mm.close()
+            self._mm = None
+            return False
+        return True
+
+    def seq(self) -> int:
+        """Τρέχον sequence number (αλλάζει σε κάθε publish) – φθηνός έλεγχος για νέα μέτρηση."""
+        if not self._open():
+            return 0
+        return _SEQ.unpack_from(self._mm, _SEQ_OFF)[0]
+
+    def read(self, max_age: float | None = None) -> dict | None:
+        """
+        Consistent ανάγνωση του snapshot ή None (δεν υπάρχει / παλιό / συνεχόμενα torn reads).
+        pct/raw είναι λίστες ανά κανάλι (index 0 = soil1).
+        """
+        if not self._open():
+            return None
+        mm = self._mm
+        for _ in range(100):
+            (s1,) = _SEQ.unpack_from(mm, _SEQ_OFF)
+            if s1 == 0:
+                return None  # never published
+            if s1 & 1:
+                time.sleep(0)  # writer in progress
+                continue
+            ts, n, _, temp, hum = _FIXED.unpack_from(mm, _FIXED_OFF)
+            raws = _RAW.unpack_from(mm, _RAW_OFF)[:n]
+            pcts = _PCT.unpack_from(mm, _PCT_OFF)[:n]
+            (s2,) = _SEQ.unpack_from(mm, _SEQ_OFF)
+            if s1 == s2:
+                break
+        else:
+            return None
+
+        if max_age is not None and clock.time() - ts > max_age:
+            # ο collector ίσως ξαναξεκίνησε με νέο αρχείο (π.χ. μετά από reboot) -> reopen next time
+            self._mm.close()
+            self._mm = None
+            return None
+        return {
+            "seq": s1,
+            "ts": ts,
+            "raw": [None if v < 0 else v for v in raws],
+            "pct": [_none(v) for v in pcts],
+            "temp_c": _none(temp),
+            "hum_pct": _none(hum),
+        }
+
+
+_reader = SnapshotReader()
+
+
+def latest_reading(max_age: float = SNAPSHOT_MAX_AGE_SEC) -> dict | None:
+    """
+    Η πιο πρόσφατη μέτρηση: από το in-process publish, το shared-memory snapshot,
+    ή από SQLite αν το snapshot λείπει/είναι παλιό. Ίδιο σχήμα dict παντού.
+    """
+    local = _local
+    if local is not None and clock.time() - local["ts"] <= max_age:
+        return local
+
+    snap = _reader.read(max_age=max_age)
+    if snap is not None:
+        return snap
+
+    with connection() as con:
+        row = con.execute(
+            """
+            SELECT ts, soil1_raw, soil2_raw, soil3_raw,
+                   soil1_pct, soil2_pct, soil3_pct, temp_c, hum_pct
+            FROM sensor_readings ORDER BY ts DESC LIMIT 1
+            """
+        ).fetchone()
+        if not row:
+            return None
+        extra = {}
+        if config.extra_pots:
+            extra = {
+                r["pot"]: (r["raw"], None if r["pct"] is None else r["pct"] / FIXED_SCALE)
+                for r in con.execute("SELECT pot, raw, pct FROM pot_readings WHERE ts = ?", (row["ts"],))
+            }
+
+    # same layout as the collector's snapshot: lists indexed by config Pot.index
+    raws = [None] * len(config.pots)
+    pcts = [None] * len(config.pots)
+    for n, i in enumerate(config.legacy_index, start=1):
+        if i is not None:
+            raws[i] = row[f"soil{n}_raw"]
+            pcts[i] = row[f"soil{n}_pct"]
+    for p in config.extra_pots:
+        raws[p.index], pcts[p.index] = extra.get(p.id, (None, None))
+    return {
+        "seq": None,
+        "ts": row["ts"],
+        "raw": raws,
+        "pct": pcts,
+        "temp_c": row["temp_c"],
+        "hum_pct": row["hum_pct"],
+    }
@@ -59,7 +59,10 @@ function fmt(ts, withDate = false) {
   return `${dd}/${mo} ${hh}:${mm}`;
 }
 
-function downsample(timestamps, seriesList, maxPoints = 600) {
+const MAX_POINTS = 600;
+
+// Safety net: ο server κάνει ήδη LTTB (max_points), οπότε εδώ συνήθως n <= maxPoints.
+function downsample(timestamps, seriesList, maxPoints = MAX_POINTS) {
   const n = timestamps.length;
   if (n <= maxPoints) return { timestamps, seriesList };
 
@@ -114,13 +117,13 @@ function buildView(data, hours) {
   const { timestamps: ts, seriesList } = downsample(
     originalTs,
     [data.soil1, data.soil2, data.soil3, data.temp, data.hum],
-    600
+    MAX_POINTS
   );
 
   const view = {
     hours,
     ts,
-    labels: ts.map(t => fmt(t, hours >= 24)),
+    labels: Array.from(ts, t => fmt(t, hours >= 24)),
     soil: {
       s1: seriesList[0],
       s2: seriesList[1],
@@ -237,23 +240,176 @@ function ensureEnvChart(view) {
   }
 }
 
+// Series keys του /api/history που έχουν ένα στοιχείο ανά timestamp.
+const SERIES_KEYS = [
+  "timestamps",
+  "soil1_raw", "soil2_raw", "soil3_raw",
+  "soil1", "soil2", "soil3",
+  "temp", "hum",
+];
+const FULL_RELOAD_MS = 10 * 60 * 1000; // periodic full reload (re-runs LTTB over the window)
+
+let history = null; // { hours, resolution, cursor, loadedAt, ...series, watering, manual }
+
+// --- binary columnar format (columnar.py): "AWC1" | u32 header_len | JSON header | 8-byte aligned columns ---
+const TYPED = { i2: Int16Array, i4: Int32Array, i8: BigInt64Array, f4: Float32Array, f8: Float64Array };
+
+function align8(n) { return n + ((8 - (n % 8)) % 8); }
+
+/**
+ * Decodes a ?format=bin response into the same shape as the JSON one, with TypedArray series
+ * (views over the buffer, no copy; NaN = null). Assumes a little-endian host, like every browser we target.
+ */
+function decodeColumnar(buf) {
+  const dv = new DataView(buf);
+  const magic = String.fromCharCode(dv.getUint8(0), dv.getUint8(1), dv.getUint8(2), dv.getUint8(3));
+  if (magic !== "AWC1") throw new Error("bad columnar magic");
+
+  const headerLen = dv.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 8, headerLen)));
+  const out = { ...header.meta };
+
+  let off = 8 + headerLen;
+  for (const col of header.columns) {
+    const T = TYPED[col.dtype];
+    out[col.name] = new T(buf, off, header.n);
+    off = align8(off + header.n * T.BYTES_PER_ELEMENT);
+  }
+  return out;
+}
+
+function historyUrl(hours, cursor) {
+  let url = `/api/history?hours=${hours}&max_points=${MAX_POINTS}`;
+  if (cursor && cursor.since !== null && cursor.since !== undefined) {
+    url += `&since=${cursor.since}&since_watering=${cursor.since_watering}&since_event=${cursor.since_event}`;
+  }
+  return url;
+}
+
+/**
+ * Append an incremental response to the in-memory history.
+ * Points with ts >= first new ts are replaced (rollup buckets can be re-sent while they fill up),
+ * then everything older than the selected window is trimmed from the head.
+ */
+function mergeHistory(state, inc) {
+  const newTs = inc.timestamps || [];
+  if (newTs.length) {
+    const first = newTs[0];
+    let cut = state.timestamps.length;
+    while (cut > 0 && state.timestamps[cut - 1] >= first) cut--;
+    for (const k of SERIES_KEYS) {
+      // Array.prototype.slice turns TypedArrays (binary full load) into plain arrays we can grow
+      state[k] = Array.prototype.slice.call(state[k], 0, cut).concat(Array.from(inc[k] || []));
+    }
+  }
+  state.watering = state.watering.concat(inc.watering || []);
+  state.manual = state.manual.concat(inc.manual || []);
+
+  const minTs = Date.now() / 1000 - state.hours * 3600;
+  let head = 0;
+  while (head < state.timestamps.length && state.timestamps[head] < minTs) head++;
+  if (head > 0) {
+    for (const k of SERIES_KEYS) state[k] = state[k].slice(head);
+  }
+  state.watering = state.watering.filter(w => w.ts >= minTs);
+  state.manual = state.manual.filter(e => e.ts >= minTs);
+
+  state.cursor = inc.cursor;
+}
+
+async function loadHistory(hours) {
+  const stale = !history
+    || history.hours !== hours
+    || Date.now() - history.loadedAt > FULL_RELOAD_MS;
+
+  if (stale) {
+    // full window: packed typed arrays (smaller + no JSON parse); increments stay JSON
+    const r = await fetch(historyUrl(hours, null) + "&format=bin");
+    const data = decodeColumnar(await r.arrayBuffer());
+    history = { ...data, hours, loadedAt: Date.now() };
+    return history;
+  }
+
+  const r = await fetch(historyUrl(hours, history.cursor));
+  const inc = await r.json();
+  if (inc.resolution !== history.resolution) {
+    history = null;
+    return loadHistory(hours);
+  }
+  mergeHistory(history, inc);
+  return history;
+}
+
 async function refresh() {
   const hours = getSelectedHours();
-  const r = await fetch(`/api/history?hours=${hours}`);
-  const data = await r.json();
+  const data = await loadHistory(hours);
 
   const view = buildView(data, hours);
   ensureSoilChart(view);
   ensureEnvChart(view);
 }
 
+// --- live stream (/api/stream, SSE). Polling μένει ως fallback όσο το stream είναι κάτω. ---
+const POLL_MS = 5000;
+let pollTimer = null;
+
+function startPolling() {
+  if (!pollTimer) pollTimer = setInterval(refresh, POLL_MS);
+}
+
+function stopPolling() {
+  if (pollTimer) { clearInterval(pollTimer); pollTimer = null; }
+}
+
+function redraw() {
+  const view = buildView(history, history.hours);
+  ensureSoilChart(view);
+  ensureEnvChart(view);
+}
+
+function onStreamReadings(data) {
+  // rollup tiers: the pushed raw rows don't match the series, fetch the updated buckets instead
+  if (!history || history.resolution !== "raw") { refresh(); return; }
+  const cursor = { ...history.cursor, since: data.timestamps[data.timestamps.length - 1] };
+  mergeHistory(history, { ...data, watering: [], manual: [], cursor });
+  redraw();
+}
+
+function onStreamWatering(events) {
+  if (!history) return;
+  const cursor = { ...history.cursor, since_watering: Math.max(...events.map(w => w.id)) };
+  mergeHistory(history, { watering: events, manual: [], cursor });
+  redraw();
+}
+
+function onStreamSystem(events) {
+  if (!history) return;
+  const manual = events.filter(e => e.code === "manual_water_start");
+  if (!manual.length) return;
+  const cursor = { ...history.cursor, since_event: Math.max(...manual.map(e => e.id)) };
+  mergeHistory(history, { watering: [], manual, cursor });
+  redraw();
+}
+
+function connectStream() {
+  if (!window.EventSource) { startPolling(); return; }
+
+  const es = new EventSource("/api/stream");
+  es.onopen = () => { stopPolling(); refresh(); }; // catch up on anything missed while down
+  es.onerror = () => startPolling();               // EventSource reconnects by itself
+  es.addEventListener("readings", ev => onStreamReadings(JSON.parse(ev.data)));
+  es.addEventListener("watering", ev => onStreamWatering(JSON.parse(ev.data)));
+  es.addEventListener("system", ev => onStreamSystem(JSON.parse(ev.data)));
+}
+
 document.addEventListener("DOMContentLoaded", () => {
   const sel = document.getElementById("hoursSelect");
   const btn = document.getElementById("refreshBtn");
 
   sel.addEventListener("change", refresh);
-  btn.addEventListener("click", refresh);
+  btn.addEventListener("click", () => { history = null; refresh(); });
 
   refresh();
-  setInterval(refresh, 5000); //5s για demo
+  startPolling();
+  connectStream();
 });
@@ -0,0 +1,176 @@
+"""
+Live push (Server-Sent Events) νέων μετρήσεων / watering / system events.
+
+Ένα μόνο background thread παρακολουθεί τη βάση (PRAGMA data_version, χωρίς I/O όσο
+δεν έχει γίνει commit από άλλο process) και κάνει fan-out σε όλους τους clients.
+Κάθε μήνυμα γίνεται format μία φορά· ανά client κοστίζει μόνο ένα queue.put.
+"""
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from db import get_conn, READING_COLUMNS_SQL
+
+POLL_SEC = 0.5          # πόσο συχνά κοιτάμε το data_version
+REPLAY_SIZE = 256       # μηνύματα που κρατάμε για clients που κάνουν reconnect
+CLIENT_QUEUE_MAX = 512  # αργός client -> αποσυνδέεται αντί να φουσκώνει η μνήμη
+HEARTBEAT_SEC = 15
+
+
+class StreamHub:
+    def __init__(self, poll_sec: float = POLL_SEC, replay_size: int = REPLAY_SIZE):
+        self.poll_sec = poll_sec
+        self._replay: deque[tuple[int, str]] = deque(maxlen=replay_size)
+        self._subscribers: set[queue.Queue] = set()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._thread: threading.Thread | None = None
+
+    # --- clients ---
+
+    def subscribe(self, last_event_id: int | None = None) -> queue.Queue:
+        """Νέος client. Με last_event_id (header Last-Event-ID) παίρνει replay όσων έχασε."""
+        q: queue.Queue = queue.Queue(maxsize=CLIENT_QUEUE_MAX)
+        with self._lock:
+            if last_event_id is not None:
+                for event_id, msg in self._replay:
+                    if event_id > last_event_id:
+                        q.put_nowait(msg)
+            self._subscribers.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stream-hub", daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event: str, data):
+        with self._lock:
+            self._seq += 1
+            msg = f"id: {self._seq}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+            self._replay.append((self._seq, msg))
+            dead = []
+            for q in self._subscribers:
+                try:
+                    q.put_nowait(msg)
+                except queue.Full:
+                    dead.append(q)
+            for q in dead:
+                self._subscribers.discard(q)
+                _close(q)
+
+    # --- db watcher ---
+
+    def _run(self):
+        con = get_conn()
+        try:
+            last_ts = con.execute("SELECT COALESCE(MAX(ts), 0) FROM readings").fetchone()[0]
+            last_wid = con.execute("SELECT COALESCE(MAX(id), 0) FROM watering_events").fetchone()[0]
+            last_eid = con.execute("SELECT COALESCE(MAX(id), 0) FROM system_events").fetchone()[0]
+            data_version = None
+
+            while True:
+                dv = con.execute("PRAGMA data_version").fetchone()[0]
+                if dv != data_version:
+                    data_version = dv
+                    last_ts = self._push_readings(con, last_ts)
+                    last_wid = self._push_watering(con, last_wid)
+                    last_eid = self._push_system(con, last_eid)
+                time.sleep(self.poll_sec)
+        except Exception as e:
+            print("[stream] watcher error:", e)
+        finally:
+            con.close()
+            with self._lock:
+                self._thread = None
+                for q in self._subscribers:
+                    _close(q)
+                self._subscribers.clear()
+
+    def _push_readings(self, con, last_ts: int) -> int:
+        rows = con.execute(
+            f"""
+            SELECT ts, {READING_COLUMNS_SQL}
+            FROM readings
+            WHERE ts > ?
+            ORDER BY ts ASC
+            """,
+            (last_ts,),
+        ).fetchall()
+        if not rows:
+            return last_ts
+        # same keys as the /api/history series
+        self.publish("readings", {
+            "timestamps": [r["ts"] for r in rows],
+            "soil1_raw":  [r["soil1_raw"] for r in rows],
+            "soil2_raw":  [r["soil2_raw"] for r in rows],
+            "soil3_raw":  [r["soil3_raw"] for r in rows],
+            "soil1":      [r["soil1_pct"] for r in rows],
+            "soil2":      [r["soil2_pct"] for r in rows],
+            "soil3":      [r["soil3_pct"] for r in rows],
+            "temp":       [r["temp_c"] for r in rows],
+            "hum":        [r["hum_pct"] for r in rows],
+        })
+        return rows[-1]["ts"]
+
+    def _push_watering(self, con, last_id: int) -> int:
+        rows = con.execute(
+            """
+            SELECT id, ts_start, trigger_pot, estimated_ml, result
+            FROM watering_events
+            WHERE id > ?
+            ORDER BY id ASC
+            """,
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            return last_id
+        self.publish("watering", [{
+            "id": w["id"],
+            "ts": w["ts_start"],
+            "pot": w["trigger_pot"],
+            "ml": w["estimated_ml"],
+            "result": w["result"],
+        } for w in rows])
+        return rows[-1]["id"]
+
+    def _push_system(self, con, last_id: int) -> int:
+        rows = con.execute(
+            "SELECT id, ts, level, code, message FROM system_events WHERE id > ? ORDER BY id ASC",
+            (last_id,),
+        ).fetchall()
+        if not rows:
+            return last_id
+        self.publish("system", [dict(e) for e in rows])
+        return rows[-1]["id"]
+
+
+def _close(q: queue.Queue):
+    """Αδειάζει το queue και βάζει None, που τερματίζει τον generator του client."""
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
+    q.put_nowait(None)
+
+
+def sse_messages(hub: StreamHub, q: queue.Queue, heartbeat_sec: float = HEARTBEAT_SEC):
+    """Generator για το Flask Response: μηνύματα του client + keepalive comments."""
+    try:
+        yield "retry: 2000\n\n"
+        while True:
+            try:
+                msg = q.get(timeout=heartbeat_sec)
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if msg is None:
+                return
+            yield msg
+    finally:
+        hub.unsubscribe(q)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Collector, controller και LED indicator σε ένα process (ένας Python interpreter αντί για τρεις).
+
+Κοινά: ένας DB writer (group commit για όλους), το settings cache και η τελευταία
+μέτρηση στη μνήμη. Κάθε task τρέχει σε δικό του thread και ξαναξεκινά με backoff
+αν σκάσει· SIGTERM/SIGINT -> stop, relay/LED off, τελικό commit.
+
+    python supervisor.py                      # όλα
+    python supervisor.py --only collector,controller
+"""
+import argparse
+import threading
+import traceback
+
+import db
+import metrics
+import tracing
+from hardware import clock
+from runtime import stop_event
+from writer import start_shared, stop_shared
+
+TASKS = ("collector", "controller", "indicator")
+
+RESTART_MIN_SEC = 1.0
+RESTART_MAX_SEC = 60.0
+HEALTHY_SEC = 300          # a task that ran this long restarts from the minimum backoff
+JOIN_TIMEOUT_SEC = 10.0
+
+
+def _task_fn(name: str):
+    # imported here so --only doesn't touch the hardware of the tasks left out
+    if name == "collector":
+        import collector
+        return collector.run
+    if name == "controller":
+        import controller
+        return controller.run
+    if name == "indicator":
+        import indicator
+        return indicator.run
+    raise ValueError(f"unknown task: {name}")
+
+
+def log_system(level: str, code: str, message: str):
+    row = (int(clock.time()), level, code, message)
+    db.write(lambda con: con.execute(
+        "INSERT INTO system_events(ts, level, code, message) VALUES (?, ?, ?, ?)", row
+    ))
+
+
+def supervise(name: str, fn, stop: threading.Event):
+    """Τρέχει fn(stop) ξανά και ξανά μέχρι το stop, με exponential backoff στα crashes."""
+    backoff = RESTART_MIN_SEC
+    while not stop.is_set():
+        started = clock.monotonic()
+        try:
+            fn(stop)
+            if stop.is_set():
+                break
+            print(f"[supervisor] {name} returned, restarting")
+        except Exception as e:
+            traceback.print_exc()
+            print(f"[supervisor] {name} crashed: {e}")
+            metrics.counter("aw_task_restarts_total", "Task crashes restarted by the supervisor", task=name).inc()
+            try:
+                log_system("error", "task_crash", f"{name} crashed: {e!r}, restart in {backoff:.0f}s")
+            except Exception:
+                pass
+        if clock.monotonic() - started >= HEALTHY_SEC:
+            backoff = RESTART_MIN_SEC
+        if clock.wait(stop, backoff):
+            break
+        backoff = min(backoff * 2, RESTART_MAX_SEC)
+
+
+def _safe_off():
+    # last line of defence: whatever happened in the tasks, the pump stays off
+    import sys
+    devices = []
+    if "controller" in sys.modules:
+        devices += [(f"relay pot{pid}", r) for pid, r in sys.modules["controller"].relays.items()]
+    if "indicator" in sys.modules and sys.modules["indicator"].led is not None:
+        devices.append(("led", sys.modules["indicator"].led))
+    for name, dev in devices:
+        try:
+            dev.off()
+        except Exception as e:
+            print(f"[supervisor] {name} off() failed: {e}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run collector/controller/indicator in one process")
+    ap.add_argument("--only", default=",".join(TASKS), help="comma separated subset of: " + ", ".join(TASKS))
+    args = ap.parse_args()
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()]
+    for n in names:
+        if n not in TASKS:
+            ap.error(f"unknown task: {n}")
+
+    db.init_db()
+    metrics.start_exporter("supervisor")
+    tracing.setup("supervisor")  # no-op unless AUTO_WATERING_TRACE is set
+    writer = start_shared("shared-writer")  # commit window/checkpoints: durability mode (config [storage])
+
+    stop = stop_event()
+
+    threads = []
+    for n in names:
+        t = threading.Thread(target=supervise, args=(n, _task_fn(n), stop), name=n, daemon=True)
+        t.start()
+        threads.append(t)
+    log_system("info", "supervisor_start", f"Supervisor started: {', '.join(names)}")
+    print(f"[supervisor] running: {', '.join(names)}")
+
+    try:
+        while not stop.wait(1.0):
+            pass
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(JOIN_TIMEOUT_SEC)
+            if t.is_alive():
+                print(f"[supervisor] {t.name} did not stop in {JOIN_TIMEOUT_SEC:.0f}s")
+        _safe_off()
+        log_system("info", "supervisor_stop", "Supervisor stopped")
+        tracing.flush()
+        stop_shared(writer)
+        metrics.flush()
+        print("[supervisor] stopped")
+
+
+if __name__ == "__main__":
+    main()
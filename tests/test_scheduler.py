@@ -0,0 +1,38 @@
+from scheduler import OK, PulsePlan
+
+
+class FakeOutput:
+    def __init__(self):
+        self.ons = 0
+        self.is_on = False
+
+    def on(self):
+        self.ons += 1
+        self.is_on = True
+
+    def off(self):
+        self.is_on = False
+
+
+def _run(plan: PulsePlan) -> float:
+    t = 0.0
+    while (nxt := plan.step(t)) is not None:
+        t = nxt
+    return t
+
+
+def test_all_pulses_run_with_fewer_pauses():
+    out = FakeOutput()
+    plan = PulsePlan("pot2", out, [1.0, 1.0, 1.5, 2.0], [5])
+    end = _run(plan)
+    assert out.ons == 4 and not out.is_on
+    assert plan.result == OK
+    assert plan.on_sec == 5.5
+    assert end == 5.5 + 5  # one pause, then back to back
+
+
+def test_pauses_between_pulses():
+    out = FakeOutput()
+    plan = PulsePlan("pot2", out, [1.0, 2.0, 1.0], [10, 20])
+    assert _run(plan) == 4.0 + 30
+    assert out.ons == 3 and plan.result == OK
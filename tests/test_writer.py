@@ -0,0 +1,107 @@
+import sqlite3
+import time
+
+import pytest
+
+import db
+import writer as writer_mod
+from writer import DbWriter
+
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "data.db")
+    db.init_db()
+    yield db.DB_PATH
+    db.close_pool()
+
+
+def _codes(path):
+    con = sqlite3.connect(path)
+    try:
+        return sorted(r[0] for r in con.execute("SELECT code FROM system_events"))
+    finally:
+        con.close()
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+def _event(code):
+    def job(con):
+        con.execute("INSERT INTO system_events(ts, level, code, message) VALUES (1, 'info', ?, '')", (code,))
+    return job
+
+
+def test_failed_job_is_rolled_back(tmp_db):
+    def broken(con):
+        _event("partial")(con)
+        raise RuntimeError("boom")
+
+    writer = DbWriter(commit_delay_sec=0, name="test-writer").start()
+    writer.submit(broken)
+    writer.submit(_event("good"))
+    writer.stop()
+
+    con = sqlite3.connect(tmp_db)
+    codes = [r[0] for r in con.execute("SELECT code FROM system_events")]
+    assert codes == ["good"]
+    assert writer.errors == 1
+
+
+def test_open_window_does_not_hold_the_write_lock(tmp_db):
+    writer = DbWriter(commit_delay_sec=60, name="test-writer").start()
+    writer.submit(_event("queued"))
+    time.sleep(0.1)
+
+    # the group waits in memory: another connection can write while the window is open
+    other = sqlite3.connect(tmp_db, timeout=0.5)
+    other.execute("INSERT INTO system_events(ts, level, code, message) VALUES (2, 'info', 'other', '')")
+    other.commit()
+    writer.stop()
+    codes = sorted(r[0] for r in other.execute("SELECT code FROM system_events"))
+    assert codes == ["other", "queued"]
+
+
+def test_locked_database_defers_the_job(tmp_db, monkeypatch):
+    monkeypatch.setattr(writer_mod, "RETRY_SEC", 0.05)
+    other = sqlite3.connect(tmp_db, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("INSERT INTO system_events(ts, level, code, message) VALUES (2, 'info', 'other', '')")
+
+    writer = DbWriter(commit_delay_sec=0, name="test-writer", busy_timeout_ms=20).start()
+    writer.submit(_event("queued"))
+    assert _wait_for(lambda: writer.busy >= 2)
+
+    # the lock is released: the job goes in on a later window, nothing counted as an error
+    other.execute("COMMIT")
+    assert _wait_for(lambda: _codes(tmp_db) == ["other", "queued"])
+    writer.stop()
+    other.close()
+    assert writer.errors == 0
+    assert writer.jobs == 1
+
+
+def test_busy_job_is_retried_without_its_partial_writes(tmp_db, monkeypatch):
+    monkeypatch.setattr(writer_mod, "RETRY_SEC", 0.05)
+    calls = []
+
+    def flaky(con):
+        calls.append(1)
+        _event(f"try{len(calls)}")(con)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+
+    writer = DbWriter(commit_delay_sec=0, name="test-writer").start()
+    writer.submit(flaky)
+    writer.submit(_event("good"))
+    assert _wait_for(lambda: len(calls) >= 2)
+    writer.stop()
+
+    assert _codes(tmp_db) == ["good", "try2"]
+    assert writer.errors == 0
+    assert writer.busy == 1
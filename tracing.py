@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Tracing spans ανά κύκλο (collector sample, pump pulses/pauses) για offline profiling.
+
+Off by default: με AUTO_WATERING_TRACE=db|chrome (και setup() στο main του daemon)
+τα spans γράφονται σε ring buffer (monotonic ns) και ένα flusher thread τα αδειάζει
+ανά TRACE_FLUSH_SEC:
+  db     -> πίνακας trace_spans (μέσω db.write, δηλ. στο group commit του writer)
+  chrome -> trace.<process>.<pid>.json στο RUN_DIR (Chrome trace / Perfetto, "X" events)·
+            το RUN_DIR είναι tmpfs (RAM), οπότε πάνω από TRACE_CHROME_MAX_BYTES το αρχείο γίνεται
+            .1.json (αντικαθιστά το προηγούμενο) και ξεκινά νέο -> το πολύ ~2x το όριο ανά process
+Off: span() επιστρέφει ένα κοινό no-op object, start() επιστρέφει 0 – χωρίς allocations.
+
+    with tracing.span("adc.read", adc="0.0"):
+        ...
+    t0 = tracing.start()
+    ...
+    tracing.finish("collector.sample", t0, ts=ts)
+
+Export από τη βάση σε Chrome trace:
+    python tracing.py --out trace.json [--minutes 60]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from db import connection, write
+from runtime import run_path
+
+TRACE_MODE = (os.environ.get("AUTO_WATERING_TRACE") or "off").lower()
+TRACE_MODES = ("off", "db", "chrome")
+TRACE_RING_SIZE = 20000      # spans στη μνήμη ανάμεσα σε flushes (τα παλιότερα πέφτουν)
+TRACE_FLUSH_SEC = 30.0
+TRACE_RETENTION_SEC = 7 * 86400
+TRACE_CHROME_MAX_BYTES = 8 * 1024 * 1024
+
+enabled = False
+_ring: deque = deque(maxlen=TRACE_RING_SIZE)
+_process = None
+_mode = "off"
+_flusher: threading.Thread | None = None
+_lock = threading.Lock()
+_dropped = 0
+_thread_names: dict[int, str] = {}
+_chrome_threads: set[int] = set()  # thread_name metadata already written
+
+# monotonic -> wall clock (ένα anchor ανά process)
+_MONO0 = time.monotonic_ns()
+_WALL0 = time.time()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "t0")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.t0 = time.monotonic_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _push(self.name, self.t0, time.monotonic_ns(), self.args)
+        return False
+
+    def set(self, **args):
+        """Επιπλέον args που είναι γνωστά μόνο μέσα στο span (π.χ. attempts)."""
+        self.args.update(args)
+
+
+def _push(name: str, t0: int, t1: int, args: dict | None):
+    global _dropped
+    if len(_ring) == TRACE_RING_SIZE:
+        _dropped += 1
+    tid = threading.get_native_id()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    _ring.append((name, t0, t1 - t0, tid, args or None))
+
+
+def span(name: str, **args):
+    """Context manager που καταγράφει ένα span (no-op όταν το tracing είναι off)."""
+    if not enabled:
+        return _NULL
+    return _Span(name, args)
+
+
+def start() -> int:
+    """Monotonic ns για finish()· 0 όταν το tracing είναι off."""
+    return time.monotonic_ns() if enabled else 0
+
+
+def finish(name: str, t0: int, **args):
+    """Καταγράφει span από το start() μέχρι τώρα (για blocks που δεν χωράνε σε ένα with)."""
+    if enabled and t0:
+        _push(name, t0, time.monotonic_ns(), args)
+
+
+def record(name: str, t0: int, t1: int, **args):
+    """Span με γνωστά άκρα (monotonic ns), π.χ. pulse ON -> OFF από διαφορετικά steps."""
+    if enabled and t0:
+        _push(name, t0, t1, args)
+
+
+def _wall(t_ns: int) -> float:
+    return _WALL0 + (t_ns - _MONO0) / 1e9
+
+
+def _drain() -> list:
+    out = []
+    while True:
+        try:
+            out.append(_ring.popleft())
+        except IndexError:
+            return out
+
+
+# --- sinks ---
+
+def _flush_db(spans: list):
+    rows = [
+        (_wall(t0), dur // 1000, _process, os.getpid(), _thread_names.get(tid, str(tid)), name,
+         json.dumps(args, separators=(",", ":")) if args else None)
+        for name, t0, dur, tid, args in spans
+    ]
+    cutoff = time.time() - TRACE_RETENTION_SEC
+
+    def job(con):
+        con.executemany(
+            "INSERT INTO trace_spans(ts, dur_us, process, pid, thread, name, args) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        con.execute("DELETE FROM trace_spans WHERE ts < ?", (cutoff,))
+
+    write(job)
+
+
+def _chrome_event(ts: float, dur_us: int, pid: int, tid: int, name: str, args) -> dict:
+    ev = {
+        "name": name, "cat": name.split(".", 1)[0], "ph": "X",
+        "ts": int(ts * 1e6), "dur": dur_us, "pid": pid, "tid": tid,
+    }
+    if args:
+        ev["args"] = args
+    return ev
+
+
+def _process_meta(pid: int, process: str) -> dict:
+    return {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": process}}
+
+
+def _thread_meta(pid: int, tid: int, thread: str) -> dict:
+    return {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}}
+
+
+def _flush_chrome(spans: list):
+    # JSON array without the closing "]" – Chrome/Perfetto accept it and we can keep appending
+    pid = os.getpid()
+    path = run_path(f"trace.{_process}.{pid}.json")
+    try:
+        if path.stat().st_size >= TRACE_CHROME_MAX_BYTES:
+            os.replace(path, path.with_suffix(".1.json"))  # each part is a complete trace on its own
+    except FileNotFoundError:
+        pass
+    new = not path.exists()
+    events = []
+    if new:
+        _chrome_threads.clear()
+        events.append(_process_meta(pid, _process))
+    for tid in {s[3] for s in spans} - _chrome_threads:
+        events.append(_thread_meta(pid, tid, _thread_names.get(tid, str(tid))))
+        _chrome_threads.add(tid)
+    events += [_chrome_event(_wall(t0), dur // 1000, pid, tid, name, args) for name, t0, dur, tid, args in spans]
+    with open(path, "a") as f:
+        if new:
+            f.write("[\n")
+        for ev in events:
+            f.write(json.dumps(ev, separators=(",", ":")) + ",\n")
+
+
+def flush():
+    """Αδειάζει το ring buffer στο sink (και σε shutdown, για να μη χαθούν τα τελευταία spans)."""
+    global _dropped
+    if _mode == "off":
+        return
+    spans = _drain()
+    if _dropped:
+        print(f"[tracing] ring buffer full, dropped {_dropped} span(s)")
+        _dropped = 0
+    if not spans:
+        return
+    try:
+        if _mode == "db":
+            _flush_db(spans)
+        else:
+            _flush_chrome(spans)
+    except Exception as e:
+        print("[tracing] flush error:", e)
+
+
+def setup(process: str, mode: str | None = None, flush_sec: float = TRACE_FLUSH_SEC):
+    """Ενεργοποιεί το tracing για το process (mode: AUTO_WATERING_TRACE αν δεν δοθεί)."""
+    global enabled, _process, _mode, _flusher
+    mode = (mode or TRACE_MODE).lower()
+    if mode not in TRACE_MODES:
+        raise ValueError(f"AUTO_WATERING_TRACE must be one of: {', '.join(TRACE_MODES)}")
+    with _lock:
+        _process = process
+        _mode = mode
+        enabled = mode != "off"
+        if enabled and _flusher is None:
+            def loop():
+                while True:
+                    time.sleep(flush_sec)
+                    flush()
+
+            _flusher = threading.Thread(target=loop, name="trace-flusher", daemon=True)
+            _flusher.start()
+    if enabled:
+        print(f"[tracing] {process}: spans -> {mode} every {flush_sec:.0f}s")
+
+
+def export_chrome(out_path: str, minutes: float | None = None) -> int:
+    """trace_spans -> Chrome trace JSON (chrome://tracing, ui.perfetto.dev)."""
+    where, params = "", ()
+    if minutes is not None:
+        where, params = "WHERE ts >= ?", (time.time() - minutes * 60,)
+    with connection() as con:
+        rows = con.execute(
+            f"SELECT ts, dur_us, process, pid, thread, name, args FROM trace_spans {where} ORDER BY ts", params
+        ).fetchall()
+    # one pid per process, thread names -> small integer tids
+    tids: dict[tuple[int, str], int] = {}
+    events = []
+    for r in rows:
+        tid = tids.setdefault((r["pid"], r["thread"]), len(tids) + 1)
+        args = json.loads(r["args"]) if r["args"] else None
+        events.append(_chrome_event(r["ts"], r["dur_us"], r["pid"], tid, r["name"], args))
+    events += [_process_meta(pid, process) for pid, process in {(r["pid"], r["process"]) for r in rows}]
+    events += [_thread_meta(pid, tid, thread) for (pid, thread), tid in tids.items()]
+    with open(out_path, "w") as f:
+        json.dump(events, f)
+    return len(rows)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Export trace_spans to a Chrome trace JSON file")
+    ap.add_argument("--out", default="trace.json")
+    ap.add_argument("--minutes", type=float, default=None, help="only the last N minutes")
+    args = ap.parse_args()
+    n = export_chrome(args.out, args.minutes)
+    print(f"{n} spans -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
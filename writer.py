@@ -0,0 +1,316 @@
+"""
+Shared DB writer: ένα thread με μία connection εκτελεί όλα τα writes (jobs fn(con))
+και κάνει group commit, αντί για ένα transaction ανά log_system / flush.
+
+Τα jobs μένουν στη μνήμη όσο είναι ανοιχτό το commit window και εφαρμόζονται όλα μαζί
+σε ένα σύντομο BEGIN IMMEDIATE … COMMIT όταν κλείσει, οπότε το write lock κρατιέται για
+ms και όχι για όλο το παράθυρο (τα άλλα processes γράφουν κανονικά και στο flash mode).
+Αν το BEGIN ή το COMMIT αποτύχει (π.χ. database locked), γίνεται rollback και τα jobs
+ξαναδοκιμάζονται στο επόμενο παράθυρο – δεν χάνονται δεδομένα. Το ίδιο και για ένα job
+που βρίσκει τη βάση locked/busy: γυρνάει μόνο το savepoint του και το job ξανατρέχει·
+πετιούνται μόνο τα jobs που σκάνε για άλλο λόγο (λάθος SQL/params).
+
+Commit window, checkpoints κλπ. έρχονται από το durability mode (config [storage]).
+Τα counters (commits, bytes, διάρκειες checkpoint) γράφονται ανά process σε
+storage.<name>.<pid>.json στο RUN_DIR (tmpfs) και τα διαβάζει το /api/storage.
+Fsyncs δεν μετριούνται: με synchronous=NORMAL το commit δεν κάνει sync και τα
+autocheckpoints (με τα δικά τους syncs) τρέχουν μέσα στο SQLite, αόρατα από εδώ·
+για τα writes στην SD κοίτα τα io_write_bytes / checkpoint_bytes.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+
+import db
+import metrics
+import tracing
+from db import get_conn, STORAGE
+from runtime import read_process_json, write_process_json
+
+_STOP = object()
+_RETRY = object()
+STATS_PREFIX = "storage."
+RETRY_SEC = 1.0  # minimum wait before retrying jobs that found the database locked
+
+
+def _is_busy(e: Exception) -> bool:
+    # SQLITE_BUSY / SQLITE_LOCKED: another connection holds the lock, the job itself is fine
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+
+def _io_write_bytes() -> int | None:
+    # bytes που έστειλε το process στο storage layer (Linux, tmpfs δεν μετράει)
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("write_bytes:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class DbWriter:
+    def __init__(
+        self,
+        commit_delay_sec: float | None = None,
+        max_pending: int | None = None,
+        name: str = "db-writer",
+        storage=STORAGE,
+        busy_timeout_ms: int | None = None,
+    ):
+        """
+        commit_delay_sec: πόσο περιμένει μετά το πρώτο uncommitted job για να μαζέψει κι άλλα
+          (0 = commit μόλις αδειάσει το queue, None = από το durability mode).
+        max_pending: commit νωρίτερα αν μαζευτούν τόσα jobs.
+        busy_timeout_ms: πόσο περιμένει το lock άλλου process πριν αφήσει το group για το
+          επόμενο παράθυρο (None = το busy_timeout των CONN_PRAGMAS).
+        """
+        self.busy_timeout_ms = busy_timeout_ms
+        self.storage = storage
+        self.commit_delay_sec = storage.commit_delay_sec if commit_delay_sec is None else commit_delay_sec
+        self.max_pending = storage.max_pending if max_pending is None else max_pending
+        self.name = name
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._wal_path = f"{db.DB_PATH}-wal"
+        self._page_size = 4096
+        self._started_at = time.time()
+        self._io_start = _io_write_bytes()
+        self._last_ckpt = time.monotonic()
+        self._next_stats = 0.0
+        self._job_sec = metrics.histogram(
+            "aw_db_job_seconds", "One write job (inserts + rollups) inside the group", writer=name)
+        self._commit_sec = metrics.histogram("aw_db_commit_seconds", "Group transaction (BEGIN IMMEDIATE .. COMMIT) duration", writer=name)
+        self._ckpt_sec = metrics.histogram(
+            "aw_db_checkpoint_seconds", "Writer-driven WAL checkpoint duration", writer=name)
+        self._job_errors = metrics.counter("aw_db_errors_total", "Failed write jobs, commits and checkpoints", writer=name)
+        self._busy_total = metrics.counter(
+            "aw_db_busy_total", "Groups/jobs deferred to the next window (database locked)", writer=name)
+
+        self.commits = 0
+        self.jobs = 0
+        self.errors = 0
+        self.busy = 0
+        self.commit_sec_total = 0.0
+        self.commit_sec_max = 0.0
+        self.checkpoints = 0
+        self.checkpoint_busy = 0
+        self.checkpoint_sec_total = 0.0
+        self.checkpoint_sec_max = 0.0
+        self.checkpoint_sec_last = None
+        self.checkpoint_pages = 0   # pages copied WAL -> data.db by our checkpoints
+
+    def start(self) -> "DbWriter":
+        self._thread.start()
+        return self
+
+    def submit(self, fn):
+        """fn(con) – τρέχει στο writer thread, μέσα στο group transaction του παραθύρου."""
+        self._q.put(fn)
+
+    def stop(self, timeout: float | None = 10.0):
+        """Τελικό commit (και checkpoint) όσων εκκρεμούν και τερματισμός."""
+        self._q.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        con = get_conn()
+        if self.busy_timeout_ms is not None:
+            con.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        self._page_size = con.execute("PRAGMA page_size").fetchone()[0]
+        pending = []          # submitted jobs, applied in one transaction when the window closes
+        first_at = None
+        stopping = False
+        try:
+            while not stopping:
+                now = time.monotonic()
+                wait = max(0.0, self._next_stats - now)
+                if pending:
+                    wait = min(wait, max(0.0, self.commit_delay_sec - (now - first_at)))
+                elif self.storage.checkpoint_sec > 0:
+                    wait = min(wait, max(0.0, self._last_ckpt + self.storage.checkpoint_sec - now))
+                try:
+                    fn = self._q.get(timeout=wait) if wait != 0.0 else self._q.get_nowait()
+                except queue.Empty:
+                    fn = None
+
+                if fn is _STOP:
+                    stopping = True
+                elif fn is not None:
+                    pending.append(fn)
+                    first_at = first_at or time.monotonic()
+                    if len(pending) < self.max_pending and not self._q.empty():
+                        continue  # keep filling the group
+
+                if pending and (
+                    stopping
+                    or len(pending) >= self.max_pending
+                    or time.monotonic() - first_at >= self.commit_delay_sec
+                ):
+                    pending = self._flush(con, pending)
+                    if pending and stopping:
+                        pending = self._flush(con, pending)  # one more try before exiting
+                    # leftovers (database locked): next window, but not sooner than RETRY_SEC
+                    first_at = time.monotonic() + max(0.0, RETRY_SEC - self.commit_delay_sec) if pending else None
+
+                if not pending:
+                    self._maybe_checkpoint(con, force=stopping)
+                if stopping or time.monotonic() >= self._next_stats:
+                    self._write_stats()
+            if pending:
+                print(f"[writer] {len(pending)} jobs not committed at stop")
+        finally:
+            con.close()
+
+    def _flush(self, con, jobs: list) -> list:
+        """Όλο το group σε ένα transaction· επιστρέφει τα jobs που μένουν για το επόμενο παράθυρο."""
+        t0 = time.perf_counter()
+        results = None
+        try:
+            with tracing.span("db.commit", writer=self.name, jobs=len(jobs)):
+                # IMMEDIATE: the write lock is taken (or refused) up front, not halfway through the group
+                con.execute("BEGIN IMMEDIATE")
+                results = [self._apply(con, fn) for fn in jobs]
+                con.commit()
+        except Exception as e:
+            if _is_busy(e):
+                self.busy += 1
+                self._busy_total.inc()
+                print("[writer] database busy, group deferred:", e)
+            else:
+                self.errors += 1
+                self._job_errors.inc()
+                print("[writer] commit error:", e)
+            try:
+                con.rollback()
+            except Exception:
+                pass
+            # nothing was written: retry the group (minus the broken jobs) on the next window
+            return jobs if results is None else [fn for fn, r in zip(jobs, results) if r]
+        dt = time.perf_counter() - t0
+        self._commit_sec.observe(dt)
+        self.commits += 1
+        self.jobs += sum(r is True for r in results)
+        self.commit_sec_total += dt
+        self.commit_sec_max = max(self.commit_sec_max, dt)
+        return [fn for fn, r in zip(jobs, results) if r is _RETRY]
+
+    def _apply(self, con, fn):
+        """True, False (broken job, dropped) ή _RETRY (database locked: ξανά στο επόμενο παράθυρο)."""
+        # each job in its own savepoint inside the group transaction
+        con.execute("SAVEPOINT job")
+        try:
+            with self._job_sec.time(), tracing.span("db.job", writer=self.name):
+                fn(con)
+            con.execute("RELEASE job")
+            return True
+        except Exception as e:
+            if _is_busy(e):
+                self.busy += 1
+                self._busy_total.inc()
+                print("[writer] database busy, job deferred:", e)
+                con.execute("ROLLBACK TO job")
+                con.execute("RELEASE job")
+                return _RETRY
+            # a broken job (bad SQL/params) is dropped with its partial writes, the rest of the group stays
+            self.errors += 1
+            self._job_errors.inc()
+            print("[writer] job error:")
+            traceback.print_exc()
+            con.execute("ROLLBACK TO job")
+            con.execute("RELEASE job")
+            return False
+
+    def _maybe_checkpoint(self, con, force: bool = False):
+        st = self.storage
+        if st.checkpoint_sec <= 0 and st.checkpoint_wal_mb <= 0:
+            return  # wal_autocheckpoint does it inside the commits
+        due = force or (st.checkpoint_sec > 0 and time.monotonic() - self._last_ckpt >= st.checkpoint_sec)
+        if not due and st.checkpoint_wal_mb > 0:
+            try:
+                due = os.path.getsize(self._wal_path) > st.checkpoint_wal_mb * 1024 * 1024
+            except OSError:
+                pass
+        if due:
+            self.checkpoint(con)
+
+    def checkpoint(self, con, mode: str = "PASSIVE"):
+        """wal_checkpoint (PASSIVE: δεν περιμένει readers) + μέτρηση διάρκειας."""
+        self._last_ckpt = time.monotonic()
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("db.checkpoint", writer=self.name, mode=mode):
+                busy, log_frames, copied = con.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        except Exception as e:
+            self.errors += 1
+            self._job_errors.inc()
+            print("[writer] checkpoint error:", e)
+            return None
+        dt = time.perf_counter() - t0
+        self._ckpt_sec.observe(dt)
+        self.checkpoints += 1
+        self.checkpoint_busy += 1 if busy or (log_frames > 0 and copied < log_frames) else 0
+        self.checkpoint_sec_total += dt
+        self.checkpoint_sec_max = max(self.checkpoint_sec_max, dt)
+        self.checkpoint_sec_last = dt
+        if copied > 0:
+            self.checkpoint_pages += copied
+        return busy, log_frames, copied
+
+    def stats(self) -> dict:
+        io_now = _io_write_bytes()
+        try:
+            wal_bytes = os.path.getsize(self._wal_path)
+        except OSError:
+            wal_bytes = None
+        return {
+            "name": self.name,
+            "pid": os.getpid(),
+            "started": int(self._started_at),
+            "updated": int(time.time()),
+            "durability": self.storage.durability,
+            "commit_delay_sec": self.commit_delay_sec,
+            "jobs": self.jobs,
+            "commits": self.commits,
+            "errors": self.errors,
+            "busy": self.busy,
+            "queued": self._q.qsize(),
+            "commit_sec_total": round(self.commit_sec_total, 6),
+            "commit_sec_max": round(self.commit_sec_max, 6),
+            "checkpoints": self.checkpoints,
+            "checkpoint_busy": self.checkpoint_busy,
+            "checkpoint_sec_total": round(self.checkpoint_sec_total, 6),
+            "checkpoint_sec_max": round(self.checkpoint_sec_max, 6),
+            "checkpoint_sec_last": None if self.checkpoint_sec_last is None else round(self.checkpoint_sec_last, 6),
+            "checkpoint_bytes": self.checkpoint_pages * self._page_size,
+            "io_write_bytes": None if io_now is None or self._io_start is None else io_now - self._io_start,
+            "wal_bytes": wal_bytes,
+        }
+
+    def _write_stats(self):
+        self._next_stats = time.monotonic() + self.storage.stats_sec
+        try:
+            write_process_json(STATS_PREFIX, self.name, self.stats())
+        except OSError as e:
+            print("[writer] stats write error:", e)
+
+
+def start_shared(name: str = "shared-writer", **kwargs) -> DbWriter:
+    """Ξεκινά writer με το durability mode και τον ορίζει ως db.write() του process."""
+    writer = DbWriter(name=name, **kwargs).start()
+    db.set_writer(writer)
+    return writer
+
+
+def stop_shared(writer: DbWriter):
+    db.set_writer(None)
+    writer.stop()
+
+
+def read_stats() -> list[dict]:
+    """Τα counters όλων των writers (όλα τα processes) από το RUN_DIR."""
+    return read_process_json(STATS_PREFIX)